@@ -4,12 +4,19 @@ import _agentworkbook as api  # type: ignore
 # doesn't correctly detect the host OS. Instead, we use api.getPlatform() which 
 # returns the actual VS Code host platform ('win32' for Windows, 'darwin' for macOS, 'linux' for Linux).
 
+import codecs
+import collections
+import contextlib
+import contextvars
+import copy
 import functools
 import inspect
 import json
 import pyodide
+import sys
 import time
-from typing import Any, Callable, Coroutine, Dict, Optional, TypeVar, Union, cast, TYPE_CHECKING
+from collections.abc import AsyncIterator, Awaitable, Iterator, Mapping, Sequence
+from typing import Any, Callable, Coroutine, Dict, NamedTuple, Optional, TypeVar, Union, cast, TYPE_CHECKING
 
 T = TypeVar('T')
 def track_api_call(func: Callable[..., T]) -> Callable[..., T]:
@@ -69,6 +76,11 @@ def track_api_call(func: Callable[..., T]) -> Callable[..., T]:
     
     return cast(Callable[..., T], wrapper)
 
+def _to_js(value: Any) -> Any:
+    """Convert a Python value to plain JS data (dicts become JS objects, not Maps)."""
+    import js  # type: ignore
+    return pyodide.ffi.to_js(value, dict_converter=js.Object.fromEntries)
+
 class Task:
     def __init__(self, task):
         self._task = task
@@ -98,6 +110,69 @@ class Task:
     def client(self):
         return self._task.client
 
+    @property
+    @track_api_call
+    def priority(self) -> int:
+        return self._task.priority
+
+    @property
+    @track_api_call
+    def retries(self) -> int:
+        """Times the task was queued again by its retry policy since it was last submitted."""
+        return self._task.retries
+
+    @property
+    @track_api_call
+    def from_cache(self) -> bool:
+        """Whether the task was completed with a cached result instead of running."""
+        return self._task.fromCache
+
+    @property
+    @track_api_call
+    def depends_on(self) -> list[str]:
+        """Ids of the tasks that have to complete before this one runs."""
+        return list(self._task.dependsOn)
+
+    @track_api_call
+    def result(self) -> Optional[str]:
+        """
+        The final answer of the task: the text of its last completion result, or of the last
+        text it said if it did not get to one. None if it said nothing yet.
+
+        Only this text is transferred, not the conversation.
+        """
+        return self._task.result()
+
+    @track_api_call
+    def last_message(self) -> Optional[dict]:
+        """The last message with text, as a dict with 'type', 'say' or 'ask', and 'text'."""
+        message = self._task.lastMessage()
+        return None if message is None else message.to_py()
+
+    @track_api_call
+    def messages(self, index: Optional[slice | int] = None) -> list[dict] | dict:
+        """
+        Messages of the conversation, transferring only the requested ones.
+
+            task.messages(slice(-10, None))   # the last ten
+            task.messages(0)                  # the first one
+
+        Args:
+            index: A slice of the messages, or the index of one; None for all of them
+        """
+        count = self._task.messageCount()
+        if isinstance(index, int):
+            if not -count <= index < count:
+                raise IndexError(f"Message index {index} out of range for {count} messages")
+            index %= count
+            return self._task.messages(index, index + 1).to_py()[0]
+
+        start, stop, step = (index or slice(None)).indices(count)
+        if step < 0:
+            start, stop = stop + 1, start + 1
+        messages = self._task.messages(start, max(start, stop)).to_py()
+        return messages[::step]
+
     @track_api_call
     def __repr__(self):
         return f"Task(id={repr(self.id)}, prompt={repr(self.prompt)}, client={repr(self.client)}, status={repr(self.status)})"
@@ -119,11 +194,100 @@ class Task:
         self._task.unarchive()
 
 
-def _create_hook_proxy(hook: Optional[str] | Callable[[Task], Optional[str]]):
-    return pyodide.ffi.create_proxy((lambda task: hook) if hook is None or isinstance(hook, str) else (lambda task: hook(Task(task))))
+# What a hook runs: a shell command, a list of commands run in parallel, or
+# {'parallel': [...]} / {'sequential': [...]} (sequential ones stop at the first failure).
+# These nest, e.g. {'sequential': ['make', ['make test', 'make docs'], 'make upload']}.
+HookCommands = Optional[str | list | dict]
+HookType = HookCommands | Callable[[Task], HookCommands | Awaitable[HookCommands]]
+BatchHookType = HookCommands | Callable[[dict], HookCommands | Awaitable[HookCommands]]
+
+# The run of the hook being called, to which execute_shell() adds its commands. A context
+# variable rather than a global, since async and non-blocking hooks run concurrently.
+_hook_run: contextvars.ContextVar[Any] = contextvars.ContextVar('_hook_run', default=None)
+
+def _batch_stats(stats) -> dict:
+    stats = stats.to_py()
+    return {
+        'tasks': stats['tasks'],
+        'counts': stats['counts'],
+        'deleted': stats['deleted'],
+        'cancelled': stats['cancelled'],
+        'duration': stats['duration'],
+        'task_duration': stats['taskDuration'],
+    }
+
+def _hook_commands(commands: HookCommands) -> Any:
+    """Lists and dicts of commands as plain JS data, for the extension to run."""
+    return _to_js(commands) if isinstance(commands, (list, tuple, dict)) else commands
+
+def _hook_function(hook: HookType | BatchHookType, batch: bool = False) -> Callable:
+    if not callable(hook):
+        return lambda task, run=None: _hook_commands(hook)
+
+    def call_hook(arg, run=None):
+        import asyncio
+        token = _hook_run.set(run)
+        try:
+            result = hook(_batch_stats(arg) if batch else Task(arg))
+            if inspect.isawaitable(result):
+                async def commands():
+                    return _hook_commands(await result)
+                # The new asyncio task copies the context, and so keeps the hook run.
+                return asyncio.ensure_future(commands())
+            return _hook_commands(result)
+        finally:
+            _hook_run.reset(token)
+
+    return call_hook
+
+def _unwrap_proxy(value: Any) -> Any:
+    return value.unwrap() if isinstance(value, pyodide.ffi.JsDoubleProxy) else value
+
+class _HookProxies:
+    """
+    One proxy per hook callable (or command string), shared by all hooks using it.
+
+    The extension counts who holds each proxy (the global hooks, Hooks objects, tasks) and
+    destroys it once nobody does, after calling forget() so that the callable can be freed.
+    """
+    def __init__(self):
+        self._proxies: dict[Any, Any] = {}
+        self._keys: dict[int, Any] = {}
 
-def _clone_hook_proxy(hook: Optional[pyodide.ffi.JsDoubleProxy]) -> Optional[pyodide.ffi.JsDoubleProxy]:
-    return None if hook is None else pyodide.ffi.create_proxy(hook.unwrap())
+    def get(self, hook: HookType | BatchHookType, batch: bool = False) -> Any:
+        """The proxy of a task hook, or of a batch hook (which is called with the batch statistics)."""
+        if hook is None or isinstance(hook, str):
+            key = ('command', hook)
+        else:
+            try:
+                hash(hook)
+                key = ('batch', hook) if batch else hook
+            except TypeError:
+                # Not hashable: only the same object is the same hook.
+                key = ('batch' if batch else 'object', id(hook))
+        proxy = self._proxies.get(key)
+        if proxy is None:
+            function = _hook_function(hook, batch)
+            proxy = pyodide.ffi.create_proxy(function)
+            self._proxies[key] = proxy
+            self._keys[id(function)] = key
+        return proxy
+
+    def proxy_of(self, hook: Any) -> Any:
+        """The proxy of a hook function read back from the extension."""
+        key = self._keys.get(id(_unwrap_proxy(hook)))
+        return hook if key is None else self._proxies[key]
+
+    def forget(self, function: Any):
+        key = self._keys.pop(id(_unwrap_proxy(function)), None)
+        if key is not None:
+            del self._proxies[key]
+
+    def __len__(self):
+        return len(self._proxies)
+
+_hook_proxies = _HookProxies()
+api.setHookProxyDestroyed(pyodide.ffi.create_proxy(_hook_proxies.forget))
 
 
 class Hooks:
@@ -131,52 +295,105 @@ class Hooks:
     def __init__(self, hooks):
         self._hooks = hooks
 
+    def __del__(self):
+        # Lets the extension destroy the proxies that no task holds any more
+        api.releaseHooks(self._hooks)
+
     @track_api_call
-    def override(self, onstart = None, oncomplete = None, onpause = None, onresume = None):
+    def override(self, onstart = None, oncomplete = None, onpause = None, onresume = None, blocking: Optional[Mapping[str, bool]] = None):
+        """
+        Hooks with some of these replaced.
+
+        Args:
+            blocking: Per hook kind ('onstart', 'oncomplete', ...), whether the worker waits for
+                it; hooks not mentioned keep their mode
+        """
         def make_hook(hook, default):
-            if hook is None:
-                return _clone_hook_proxy(default)
-            else:
-                return _create_hook_proxy(hook)
+            if hook is not None:
+                return _hook_proxies.get(hook)
+            return None if default is None else _hook_proxies.proxy_of(default)
 
         onstart = make_hook(onstart, self._hooks.onstart)
         oncomplete = make_hook(oncomplete, self._hooks.oncomplete)
         onpause = make_hook(onpause, self._hooks.onpause)
         onresume = make_hook(onresume, self._hooks.onresume)
 
-        return Hooks(api.createHooks(onstart, oncomplete, onpause, onresume))
+        non_blocking = [] if self._hooks.nonBlocking is None else list(self._hooks.nonBlocking)
+        for kind, block in (blocking or {}).items():
+            if kind not in ('onstart', 'oncomplete', 'onpause', 'onresume'):
+                raise ValueError(f"Unknown hook kind: {kind}")
+            non_blocking = [k for k in non_blocking if k != kind] + ([] if block else [kind])
+
+        return Hooks(api.createHooks(onstart, oncomplete, onpause, onresume, _to_js(non_blocking)))
+
+
+class RetryPolicy:
+    """
+    When a failed task is queued again by itself.
+
+    Args:
+        max_attempts: Attempts in total, the first one included
+        base_delay: Seconds before the first retry; doubled for each further one, with jitter
+        max_delay: Longest delay in seconds
+        retry_on: Statuses that are retried ('error' and/or 'aborted'; note that cancelling
+            a running task ends it as 'aborted')
+    """
+    def __init__(self, max_attempts: int = 3, base_delay: float = 30.0, max_delay: float = 900.0, retry_on: Sequence[str] = ('error',)):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = tuple(retry_on)
+
+    def __repr__(self):
+        return f"RetryPolicy(max_attempts={self.max_attempts}, base_delay={self.base_delay}, max_delay={self.max_delay}, retry_on={self.retry_on})"
+
+    def _to_dict(self) -> dict:
+        return {
+            'maxAttempts': self.max_attempts,
+            'baseDelayMs': self.base_delay * 1000,
+            'maxDelayMs': self.max_delay * 1000,
+            'retryOn': list(self.retry_on),
+        }
 
 @track_api_call
 def working_directory(path: str):
     api.workingDirectory = path
 
 @track_api_call
-def onstart(hook: Optional[str] | Callable[[Task], Optional[str]]):
-    if api.globalHooks.onstart is not None:
-        api.globalHooks.onstart.destroy()
-    api.globalHooks.onstart = _create_hook_proxy(hook)
+def onstart(hook: HookType, blocking: bool = True):
+    api.setGlobalHook('onstart', None if hook is None else _hook_proxies.get(hook), blocking)
 
 @track_api_call
-def oncomplete(hook: Optional[str] | Callable[[Task], Optional[str]]):
-    if api.globalHooks.oncomplete is not None:
-        api.globalHooks.oncomplete.destroy()
-    api.globalHooks.oncomplete = _create_hook_proxy(hook)
+def oncomplete(hook: HookType, blocking: bool = True):
+    api.setGlobalHook('oncomplete', None if hook is None else _hook_proxies.get(hook), blocking)
 
 @track_api_call
-def onpause(hook: Optional[str] | Callable[[Task], Optional[str]]):
-    if api.globalHooks.onpause is not None:
-        api.globalHooks.onpause.destroy()
-    api.globalHooks.onpause = _create_hook_proxy(hook)
+def onpause(hook: HookType, blocking: bool = True):
+    api.setGlobalHook('onpause', None if hook is None else _hook_proxies.get(hook), blocking)
 
 @track_api_call
-def onresume(hook: Optional[str] | Callable[[Task], Optional[str]]):
-    if api.globalHooks.onresume is not None:
-        api.globalHooks.onresume.destroy()
-    api.globalHooks.onresume = _create_hook_proxy(hook)
+def onresume(hook: HookType, blocking: bool = True):
+    api.setGlobalHook('onresume', None if hook is None else _hook_proxies.get(hook), blocking)
 
 @track_api_call
 def current_hooks() -> Hooks:
-    return Hooks(api.globalHooks)
+    return Hooks(api.copyHooks(api.globalHooks))
+
+@track_api_call
+def proxy_stats() -> dict:
+    """
+    How many hook proxies are alive, to check that hooks created in a loop are freed.
+
+    A proxy is shared by all hooks using the same callable, and destroyed once neither the
+    global hooks, nor a Hooks object, nor a task that is not deleted or archived holds it.
+
+    Returns:
+        dict: 'alive' proxies, their holders added up ('references'), and the Python
+            'callables' behind them
+    """
+    stats = api.hookProxyStats().to_py()
+    stats['callables'] = len(_hook_proxies)
+    return stats
 
 @track_api_call
 def live_preview():
@@ -211,7 +428,7 @@ async def build_prompts(prompts: list[str], workspace_root: Optional[str] = None
     return await api.buildPrompts(prompts, workspace_root)
 
 @track_api_call
-def create_task(prompt: str, mode: str = 'code', hooks: Optional[Hooks] = None, client: str = 'roo', supercode_url: Optional[str] = None, build_prompt: bool = True) -> Task:
+def create_task(prompt: str, mode: str = 'code', hooks: Optional[Hooks] = None, client: str = 'roo', supercode_url: Optional[str] = None, build_prompt: bool = True, depends_on: Optional[list[Task]] = None, on_dependency_failure: str = 'abort', priority: int = 0, retry: Optional[RetryPolicy] = None, cache: bool = False) -> Task:
     """
     Create a single task from a prompt.
     
@@ -222,15 +439,22 @@ def create_task(prompt: str, mode: str = 'code', hooks: Optional[Hooks] = None,
         client: Client type ('roo', 'copilot', 'supercode')
         supercode_url: Optional SuperCode URL
         build_prompt: Whether to build prompt by processing flags (True for backward compatibility, False for pre-processed prompts)
+        depends_on: Tasks that have to complete before the created ones run
+        on_dependency_failure: When a dependency fails: 'abort' the task, 'skip' it (take it out of the queue),
+            or 'run' it anyway once the dependency has finished
+        priority: Queued tasks with a higher priority run first; tasks gain priority as they wait
+        retry: Queue the task again by itself when it fails (see RetryPolicy)
+        cache: Reuse the result of a completed task with the same built prompt, mode and client
+            instead of running again (hooks do not run then), and keep this task's result for later ones
     
     Returns:
         Created Task object
     """
-    tasks = create_tasks([prompt], mode, hooks, client, supercode_url, build_prompt)
+    tasks = create_tasks([prompt], mode, hooks, client, supercode_url, build_prompt, depends_on, on_dependency_failure, priority, retry, cache)
     return tasks[0]
 
 @track_api_call
-def create_tasks(prompts: list[str], mode: str = 'code', hooks: Optional[Hooks] = None, client: str = 'roo', supercode_url: Optional[str] = None, build_prompt: bool = True) -> list[Task]:
+def create_tasks(prompts: list[str], mode: str = 'code', hooks: Optional[Hooks] = None, client: str = 'roo', supercode_url: Optional[str] = None, build_prompt: bool = True, depends_on: Optional[list[Task]] = None, on_dependency_failure: str = 'abort', priority: int = 0, retry: Optional[RetryPolicy] = None, cache: bool = False, onbatchstart: BatchHookType = None, onbatchcomplete: BatchHookType = None) -> list[Task]:
     """
     Create tasks from prompts.
     
@@ -241,16 +465,31 @@ def create_tasks(prompts: list[str], mode: str = 'code', hooks: Optional[Hooks]
         client: Client type ('roo', 'copilot', 'supercode')
         supercode_url: Optional SuperCode URL
         build_prompt: Whether to build prompts by processing flags (True for backward compatibility, False for pre-processed prompts)
+        depends_on: Tasks that have to complete before the created ones run
+        on_dependency_failure: When a dependency fails: 'abort' the task, 'skip' it (take it out of the queue),
+            or 'run' it anyway once the dependency has finished
+        priority: Queued tasks with a higher priority run first; tasks gain priority as they wait
+        retry: Queue the task again by itself when it fails (see RetryPolicy)
+        cache: Reuse the result of a completed task with the same built prompt, mode and client
+            instead of running again (hooks do not run then), and keep this task's result for later ones
+        onbatchstart: Hook run once, when the first of these tasks starts
+        onbatchcomplete: Hook run once, when all of these tasks have finished (or were cancelled
+            before they ran). Batch hooks run in the background and get a dict with the number
+            of 'tasks', the 'counts' per status, the tasks 'deleted' and 'cancelled' meanwhile,
+            the 'duration' from the first start to the last finish and the 'task_duration' of
+            all tasks added up, both in seconds
     
     Returns:
         List of created Task objects
     """
     hooks = None if hooks is None else hooks._hooks
-    tasks = api.createTasks(prompts, mode, hooks, client, supercode_url, build_prompt)
+    dependencies = _to_js([task.id for task in depends_on or []])
+    batch_hooks = [None if hook is None else _hook_proxies.get(hook, batch=True) for hook in (onbatchstart, onbatchcomplete)]
+    tasks = api.createTasks(prompts, mode, hooks, client, supercode_url, build_prompt, dependencies, on_dependency_failure, priority, None if retry is None else _to_js(retry._to_dict()), cache, *batch_hooks)
     return [Task(task) for task in tasks]
 
 @track_api_call
-def submit_task(prompt: str, mode: str = 'code', hooks: Optional[Hooks] = None, client: str = 'roo', supercode_url: Optional[str] = None, build_prompt: bool = True) -> Task:
+def submit_task(prompt: str, mode: str = 'code', hooks: Optional[Hooks] = None, client: str = 'roo', supercode_url: Optional[str] = None, build_prompt: bool = True, depends_on: Optional[list[Task]] = None, on_dependency_failure: str = 'abort', priority: int = 0, retry: Optional[RetryPolicy] = None, cache: bool = False) -> Task:
     """
     Create and submit a single task from a prompt.
     
@@ -261,15 +500,22 @@ def submit_task(prompt: str, mode: str = 'code', hooks: Optional[Hooks] = None,
         client: Client type ('roo', 'copilot', 'supercode')
         supercode_url: Optional SuperCode URL
         build_prompt: Whether to build prompt by processing flags (True for backward compatibility, False for pre-processed prompts)
+        depends_on: Tasks that have to complete before the created ones run
+        on_dependency_failure: When a dependency fails: 'abort' the task, 'skip' it (take it out of the queue),
+            or 'run' it anyway once the dependency has finished
+        priority: Queued tasks with a higher priority run first; tasks gain priority as they wait
+        retry: Queue the task again by itself when it fails (see RetryPolicy)
+        cache: Reuse the result of a completed task with the same built prompt, mode and client
+            instead of running again (hooks do not run then), and keep this task's result for later ones
     
     Returns:
         Submitted Task object
     """
-    tasks = submit_tasks([prompt], mode, hooks, client, supercode_url, build_prompt)
+    tasks = submit_tasks([prompt], mode, hooks, client, supercode_url, build_prompt, depends_on, on_dependency_failure, priority, retry, cache)
     return tasks[0]
 
 @track_api_call
-def submit_tasks(prompts: list[str], mode: str = 'code', hooks: Optional[Hooks] = None, client: str = 'roo', supercode_url: Optional[str] = None, build_prompt: bool = True) -> list[Task]:
+def submit_tasks(prompts: list[str], mode: str = 'code', hooks: Optional[Hooks] = None, client: str = 'roo', supercode_url: Optional[str] = None, build_prompt: bool = True, depends_on: Optional[list[Task]] = None, on_dependency_failure: str = 'abort', priority: int = 0, retry: Optional[RetryPolicy] = None, cache: bool = False, onbatchstart: BatchHookType = None, onbatchcomplete: BatchHookType = None) -> list[Task]:
     """
     Create and submit tasks from prompts.
     
@@ -280,11 +526,20 @@ def submit_tasks(prompts: list[str], mode: str = 'code', hooks: Optional[Hooks]
         client: Client type ('roo', 'copilot', 'supercode')
         supercode_url: Optional SuperCode URL
         build_prompt: Whether to build prompts by processing flags (True for backward compatibility, False for pre-processed prompts)
+        depends_on: Tasks that have to complete before the created ones run
+        on_dependency_failure: When a dependency fails: 'abort' the task, 'skip' it (take it out of the queue),
+            or 'run' it anyway once the dependency has finished
+        priority: Queued tasks with a higher priority run first; tasks gain priority as they wait
+        retry: Queue the task again by itself when it fails (see RetryPolicy)
+        cache: Reuse the result of a completed task with the same built prompt, mode and client
+            instead of running again (hooks do not run then), and keep this task's result for later ones
+        onbatchstart: Hook run once, when the first of these tasks starts (see create_tasks)
+        onbatchcomplete: Hook run once, when all of these tasks have finished (see create_tasks)
     
     Returns:
         List of submitted Task objects
     """
-    tasks = create_tasks(prompts, mode, hooks, client, supercode_url, build_prompt)
+    tasks = create_tasks(prompts, mode, hooks, client, supercode_url, build_prompt, depends_on, on_dependency_failure, priority, retry, cache, onbatchstart, onbatchcomplete)
     for task in tasks:
         task.submit()
     return tasks
@@ -297,123 +552,729 @@ def pause_task_flow():
 def resume_task_flow():
     api.resumeWorker()
 
+@track_api_call
+@contextlib.contextmanager
+def batch():
+    """
+    Make many task changes as one: the task list is repainted (and the worker woken up)
+    once when the block ends, instead of after every change.
+
+        with awb.batch():
+            for prompt in prompts:
+                awb.submit_task(prompt)
+
+    Batches nest. Do not wait for tasks inside a batch: the worker does not see new
+    tasks until it ends.
+    """
+    api.beginTaskBatch()
+    try:
+        yield
+    finally:
+        api.endTaskBatch()
+
+@track_api_call
+def set_rate_limit(client: str, per_minute: Optional[float] = None, burst: Optional[int] = None, budget: Optional[int] = None):
+    """
+    Limit how fast the worker starts tasks of a client ('roo', 'copilot' or 'supercode').
+
+    While a client is held back, queued tasks of the other clients run. Calling it
+    without limits removes the client's limits.
+
+    Args:
+        client: Client whose tasks are limited
+        per_minute: Tasks started per minute
+        burst: Tasks that may start at once after an idle period (default 1)
+        budget: Tasks that may still be started in total
+    """
+    limit = {key: value for key, value in (('perMinute', per_minute), ('burst', burst), ('budget', budget)) if value is not None}
+    api.setRateLimit(client, _to_js(limit))
+
+@track_api_call
+def rate_limits() -> dict:
+    """
+    Limits of the clients that have any.
+
+    Returns:
+        dict: client -> perMinute, burst, budget, started (tasks started since the limit
+              was set) and waitMs (until the next task may start; inf when the budget is spent).
+    """
+    return api.rateLimits().to_py()
+
+@track_api_call
+def tasks_table(fields: Optional[Sequence[str]] = None, status: Optional[str | Sequence[str]] = None):
+    """
+    Metadata of all tasks, one column per field, fetched in a single call.
+
+    Fields: id, prompt, summary, mode, client, status, archived, from_cache, depends_on,
+    priority, retries, attempts, created_at, started_at, finished_at and duration.
+    Timestamps are seconds since the epoch and durations are seconds. Missing ones are NaN.
+
+        df = awb.tasks_table(['mode', 'status', 'duration'], status=['completed', 'error'])
+        df.groupby('mode').status.value_counts()
+
+    Args:
+        fields: Columns to return (default: id, status, mode, client, archived, priority,
+            attempts, created_at, duration and summary)
+        status: Only tasks in this status (or any of these statuses)
+
+    Returns:
+        A pandas DataFrame if pandas is loaded; otherwise a dict of columns, where numeric
+        columns are NumPy arrays if NumPy is loaded, and lists otherwise.
+    """
+    statuses = [status] if isinstance(status, str) else status
+    table = api.tasksTable(
+        None if fields is None else _to_js(list(fields)),
+        None if statuses is None else _to_js(list(statuses)),
+    ).to_py()
+
+    numpy = sys.modules.get('numpy')
+    columns = {}
+    for name, column in table.items():
+        # Numeric columns come as a buffer of doubles.
+        if isinstance(column, memoryview):
+            column = numpy.asarray(column) if numpy is not None else column.tolist()
+        columns[name] = column
+
+    pandas = sys.modules.get('pandas')
+    if pandas is not None:
+        return pandas.DataFrame(columns)
+    return columns
+
+def _task_query(status, client, mode, prompt_contains, prompt_regex, archived) -> Any:
+    """The query object of find_tasks/iter_tasks; single values stand for one-element lists."""
+    def as_list(value):
+        return None if value is None else [value] if isinstance(value, str) else list(value)
+
+    query = {
+        'status': as_list(status),
+        'client': as_list(client),
+        'mode': as_list(mode),
+        'promptContains': prompt_contains,
+        'promptRegex': prompt_regex,
+        'archived': archived,
+    }
+    return _to_js({key: value for key, value in query.items() if value is not None})
+
+@track_api_call
+def find_tasks(status: Optional[str | Sequence[str]] = None, client: Optional[str | Sequence[str]] = None,
+               mode: Optional[str | Sequence[str]] = None, prompt_contains: Optional[str] = None,
+               prompt_regex: Optional[str] = None, archived: Optional[bool] = None,
+               limit: Optional[int] = None, offset: int = 0) -> list[Task]:
+    """
+    Tasks matching all the given conditions, in list order.
+
+    The tasks are filtered in the extension; only the matching ones are transferred.
+
+        failed = awb.find_tasks(status=['error', 'aborted'], client='copilot', limit=20)
+
+    Args:
+        status: Task status, or any of a list of statuses
+        client: Client, or any of a list of clients
+        mode: Mode, or any of a list of modes
+        prompt_contains: Substring of the prompt (case-sensitive)
+        prompt_regex: Regular expression searched in the prompt (JavaScript syntax)
+        archived: Only archived (True) or only unarchived (False) tasks
+        limit: Return at most this many tasks
+        offset: Skip this many matching tasks first
+
+    Returns:
+        list[Task]: The matching tasks
+    """
+    options = {'offset': offset} if limit is None else {'offset': offset, 'limit': limit}
+    page = api.findTasks(_task_query(status, client, mode, prompt_contains, prompt_regex, archived), _to_js(options))
+    return [Task(task) for task in page.tasks]
+
+@track_api_call
+def iter_tasks(status: Optional[str | Sequence[str]] = None, client: Optional[str | Sequence[str]] = None,
+               mode: Optional[str | Sequence[str]] = None, prompt_contains: Optional[str] = None,
+               prompt_regex: Optional[str] = None, archived: Optional[bool] = None,
+               page_size: int = 1000) -> Iterator[Task]:
+    """
+    Iterate over the tasks matching the conditions (as in find_tasks), fetching them a page at a time.
+
+    Each page continues after the last task of the previous one, so tasks added or deleted
+    meanwhile do not make it skip or repeat tasks. Moving tasks while iterating does.
+
+    Args:
+        page_size: Tasks fetched per call
+    """
+    query = _task_query(status, client, mode, prompt_contains, prompt_regex, archived)
+    cursor = None
+    while True:
+        options = {'limit': page_size} if cursor is None else {'limit': page_size, 'cursor': cursor}
+        page = api.findTasks(query, _to_js(options))
+        for task in page.tasks:
+            yield Task(task)
+        cursor = page.cursor
+        if cursor is None:
+            return
+
+class TaskEvent(NamedTuple):
+    """A status change of a task, as yielded by watch()."""
+    task_id: str
+    old_status: str
+    new_status: str
+    timestamp: float
+    """Seconds since the epoch"""
+    removed: bool = False
+    """The task was deleted; both statuses are then its last one"""
+
+@track_api_call
+async def watch(filter: Optional[Callable[[TaskEvent], bool]] = None, tasks: Optional[Sequence[Task]] = None,
+                status: Optional[str | Sequence[str]] = None, client: Optional[str | Sequence[str]] = None,
+                mode: Optional[str | Sequence[str]] = None, max_queue: int = 1000) -> AsyncIterator[TaskEvent]:
+    """
+    Yield the status changes of tasks as they happen.
+
+    The extension queues the events for this watcher as tasks change status, without waiting
+    for it. If more than max_queue events pile up before they are taken, the oldest ones are
+    dropped. Deleting a watched task yields a last event for it with removed set, whatever
+    its status.
+
+        async for event in awb.watch(status=['completed', 'error']):
+            print(event.task_id, event.old_status, '->', event.new_status)
+
+    Args:
+        filter: Only yield the events for which this returns True
+        tasks: Only changes of these tasks
+        status: Only changes to this status, or any of a list of statuses
+        client: Only changes of tasks of this client, or any of a list of clients
+        mode: Only changes of tasks in this mode, or any of a list of modes
+        max_queue: Events kept for this watcher until it takes them
+    """
+    query = _task_query(status, client, mode, None, None, None).to_py()
+    if tasks is not None:
+        query['taskIds'] = [task.id for task in tasks]
+    watcher = api.watchTasks(_to_js(query), max_queue)
+    try:
+        while True:
+            event = await watcher.next()
+            if event is None:
+                return
+            event = TaskEvent(event.taskId, event.oldStatus, event.newStatus, event.timestamp / 1000,
+                              bool(getattr(event, 'removed', False)))
+            if filter is None or filter(event):
+                yield event
+    finally:
+        watcher.close()
+
+@track_api_call
+def status_counts(include_archived: bool = False) -> dict[str, int]:
+    """
+    Number of tasks in each status.
+
+    The counts are kept up to date as tasks change, so polling them is cheap however
+    many tasks there are.
+
+    Args:
+        include_archived: Also count archived tasks
+
+    Returns:
+        dict: status -> number of tasks, for every status
+    """
+    return api.statusCounts(include_archived).to_py()
+
+@track_api_call
+def reprioritize(task: Task, priority: int):
+    """
+    Change the priority of a task. If it is queued, it moves in the queue accordingly,
+    keeping the time it has already waited.
+    """
+    api.reprioritize(task._task, priority)
+
+@track_api_call
+def dag_status() -> dict:
+    """
+    Where the tasks with dependencies (or dependents) stand.
+
+    Returns:
+        dict: ready (queued, dependencies met), waiting (queued task id -> ids of the
+              dependencies it waits for), running, completed, failed, and blocked
+              (task id -> the dependency it was aborted or skipped for).
+    """
+    return api.dagStatus().to_py()
+
+@track_api_call
+def task_store_stats() -> dict:
+    """
+    Memory and disk usage of the task store.
+
+    Conversations and hook runs of finished or archived tasks are written to disk and,
+    beyond the `tasks.memoryBudgetMB` setting, dropped from memory until accessed again.
+
+    Returns:
+        dict: residentTasks/residentBytes (held in memory), evictedTasks (on disk only),
+              segments, diskBytes and deadBytes (superseded records awaiting compaction).
+    """
+    return api.taskStoreStats().to_py()
+
+@track_api_call
+def task_cache_stats() -> dict:
+    """
+    Usage of the result cache of tasks created with `cache=True`.
+
+    Results expire after the `tasks.resultCacheTtlMinutes` setting; beyond
+    `tasks.resultCacheMaxEntries` (or 64 MB), the least recently used ones are dropped.
+
+    Returns:
+        dict: entries, bytes (estimated), hits, misses, evictions (dropped for the limits)
+              and expired.
+    """
+    return api.taskCacheStats().to_py()
+
+@track_api_call
+def clear_task_cache():
+    """Forget all cached task results."""
+    api.clearTaskCache()
+
+@track_api_call
+async def restore_session() -> int:
+    """
+    Wait for the tasks of the previous session to be restored, and return how many were.
+
+    The task queue is kept on disk and restored when VS Code starts (unless the
+    `session.restoreOnStartup` setting is off, in which case this restores it, as long
+    as no tasks were created yet). Restored tasks have no hooks; tasks that were
+    running come back as aborted. If any tasks were queued, the worker is paused.
+    """
+    return await api.restoreSession()
+
+@track_api_call
+def snapshot_session() -> dict:
+    """
+    Write the task queue to disk now.
+
+    Changes are otherwise written shortly after they happen; this also folds the
+    change log into a fresh snapshot.
+
+    Returns:
+        dict: tasks, logEntries, snapshotBytes and logBytes.
+    """
+    return api.snapshotSession().to_py()
+
 @track_api_call
 def execute_shell(command: str) -> Coroutine[None, None, Any]:
-    return api.executeShell(command)
+    return api.executeShell(command, _hook_run.get())
 
 @track_api_call
 def get_extension_path() -> str:
     """Get the VS Code extension directory path."""
     return api.getExtensionPath()
 
+class _ConfigSnapshot(Mapping):
+    """
+    Read-only mapping view of the extension settings (keys without the `agentworkbook.` prefix).
+
+    All settings are fetched with a single `api.getConfigurations()` call on first access and
+    kept until the TypeScript side reports a configuration change, so repeated lookups do not
+    cross the Python/JS boundary. Lists and dicts are returned as copies, so a caller changing
+    one does not change the snapshot.
+    """
+
+    def __init__(self):
+        self._values: Optional[dict] = None
+        self._listener = None
+        self._subscription = None
+
+    def _load(self) -> dict:
+        if self._values is None:
+            if self._listener is None:
+                # Register before loading, so a change during the load invalidates the fresh snapshot.
+                self._listener = pyodide.ffi.create_proxy(self.invalidate)
+                self._subscription = api.onConfigurationChanged(self._listener)
+            self._values = api.getConfigurations().to_py()
+        return self._values
+
+    def invalidate(self, *args) -> None:
+        """Drop the snapshot; the next access reloads all settings."""
+        self._values = None
+
+    def close(self) -> None:
+        """Stop listening for configuration changes and drop the snapshot."""
+        if self._subscription is not None:
+            self._subscription.dispose()
+            self._subscription = None
+        if self._listener is not None:
+            self._listener.destroy()
+            self._listener = None
+        self._values = None
+
+    def __getitem__(self, key: str) -> Any:
+        return _copy_container(self._load()[key])
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    def __repr__(self) -> str:
+        return f"config({self._load()!r})"
+
+def _copy_container(value: Any) -> Any:
+    return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+config = _ConfigSnapshot()
+
+def _teardown() -> None:
+    """Called by the extension before it drops this interpreter: releases what it registered there."""
+    config.close()
+
+def _config_value(key: str) -> Any:
+    """Internal, untracked configuration lookup backed by the snapshot."""
+    values = config._load()
+    if key in values:
+        return _copy_container(values[key])
+    # Keys not contributed by the extension (e.g. whole sections) are not part of the snapshot.
+    return api.getConfiguration(key)
+
 @track_api_call
 def get_configuration(key: str) -> Any:
     """Get VS Code extension configuration value."""
-    return api.getConfiguration(key)
+    return _config_value(key)
 
 @track_api_call
 def develop():
     api.develop()
     return api.livePreview()
 
+_FINISHED_STATUSES = ('completed', 'aborted', 'error')
+
+def _task_ids(tasks: Optional[Sequence[Union[Task, str]]]) -> list[str]:
+    """Ids of the given tasks, or of all prepared, queued and running tasks if None."""
+    if tasks is None:
+        task_ids = [task.id for task in api.queued_tasks()]
+        task_ids += [task.id for task in api.prepared_tasks()]
+        running = api.running_task()
+        if running:
+            task_ids.append(running.id)
+        return task_ids
+
+    task_ids = []
+    for t in tasks:
+        if isinstance(t, Task):
+            task_ids.append(t.id)
+        elif isinstance(t, str):
+            task_ids.append(t)
+        else:
+            raise TypeError(f"Expected Task or str, got {type(t)}")
+    return task_ids
+
+def _task_status(task_id: str) -> Optional[str]:
+    task = api.getTask(task_id)
+    return None if task is None else task.status
+
+async def _as_finished(task_ids: list[str], timeout: Optional[float]) -> AsyncIterator[tuple[str, str]]:
+    """
+    Yield (task id, final status) as the tasks finish, with 'not_found' for unknown ids.
+    Raises TimeoutError if they have not all finished within timeout seconds.
+    """
+    import asyncio
+
+    deadline = None if timeout is None else time.monotonic() + timeout
+    remaining = set(task_ids)
+    # Subscribe before looking at the statuses, so that no change in between is missed.
+    # A task that is retried goes on from 'error' to 'queued' in the same step, so the
+    # current status is looked up instead of trusting the event. The watcher also tells
+    # when one of the tasks is deleted, which is then not found.
+    watcher = api.watchTasks(_to_js({'taskIds': list(remaining), 'status': list(_FINISHED_STATUSES)}), max(len(remaining), 1))
+    try:
+        to_check = list(remaining)
+        dropped = 0
+        while True:
+            for task_id in to_check:
+                if task_id not in remaining:
+                    continue
+                status = _task_status(task_id)
+                if status is None or status in _FINISHED_STATUSES:
+                    remaining.discard(task_id)
+                    yield task_id, status or 'not_found'
+            if not remaining:
+                return
+
+            wait = None if deadline is None else deadline - time.monotonic()
+            if wait is not None and wait <= 0:
+                raise TimeoutError()
+            try:
+                event = await asyncio.wait_for(watcher.next(), wait)
+            except asyncio.TimeoutError:
+                raise TimeoutError() from None
+            if watcher.dropped != dropped:
+                dropped = watcher.dropped
+                to_check = list(remaining)
+            else:
+                to_check = [] if event is None else [event.taskId]
+    finally:
+        watcher.close()
+
+_RETURN_WHEN = ('ALL_COMPLETED', 'FIRST_COMPLETED', 'FIRST_ERROR')
+
 @track_api_call
 async def wait_for_tasks(
     tasks: list[Union[Task, str]] = None,
     timeout: float = None,
-    poll_interval: float = 0.1
+    poll_interval: float = 0.1,
+    return_when: str = 'ALL_COMPLETED'
 ) -> dict[str, str]:
     """
     Wait for tasks to complete without blocking the UI.
-    
+
+    Wakes up on the status changes of the tasks instead of polling them.
+
     Args:
         tasks: List of Task objects or task IDs. If None, waits for all active tasks.
         timeout: Maximum seconds to wait. None means wait indefinitely.
-        poll_interval: Seconds between status checks (default: 0.1)
-    
+        poll_interval: Unused, kept for compatibility
+        return_when: When to return, as in asyncio.wait:
+            'ALL_COMPLETED' once all tasks have finished,
+            'FIRST_COMPLETED' once any task has finished,
+            'FIRST_ERROR' once any task has failed (error or aborted), or all have finished.
+
     Returns:
-        Dictionary mapping task IDs to their final status.
+        Dictionary mapping task IDs to their final status. Tasks that have not finished map
+        to 'timeout' if the timeout passed, and to their current status otherwise.
     """
-    import asyncio
-    
-    start_time = time.time()
-    
-    # Normalize input to task IDs
-    if tasks is None:
-        # Get all active tasks
-        task_ids = []
-        for task in api.queued_tasks():
-            task_ids.append(task.id)
-        for task in api.prepared_tasks():
-            task_ids.append(task.id)
-        running = api.running_task()
-        if running:
-            task_ids.append(running.id)
-    else:
-        # Convert Task objects to IDs
-        task_ids = []
-        for t in tasks:
-            if isinstance(t, Task):
-                task_ids.append(t.id)
-            elif isinstance(t, str):
-                task_ids.append(t)
-            else:
-                raise TypeError(f"Expected Task or str, got {type(t)}")
-    
+    if return_when not in _RETURN_WHEN:
+        raise ValueError(f"return_when must be one of {', '.join(_RETURN_WHEN)}, got {return_when!r}")
+
+    task_ids = _task_ids(tasks)
     results = {}
-    remaining_ids = set(task_ids)
-    
-    while remaining_ids:
-        # Check timeout
-        if timeout is not None:
-            elapsed = time.time() - start_time
-            if elapsed > timeout:
-                # Mark remaining tasks as timeout
-                for tid in remaining_ids:
-                    results[tid] = 'timeout'
+    try:
+        async for task_id, status in _as_finished(task_ids, timeout):
+            results[task_id] = status
+            if return_when == 'FIRST_COMPLETED' or (return_when == 'FIRST_ERROR' and status in ('error', 'aborted')):
                 break
-        
-        # Check each remaining task
-        completed_ids = set()
-        for tid in remaining_ids:
-            task = _find_task_by_id(tid)
-            
-            if task is None:
-                results[tid] = 'not_found'
-                completed_ids.add(tid)
-            elif task.status in ['completed', 'aborted', 'error']:
-                results[tid] = task.status
-                completed_ids.add(tid)
-        
-        # Remove completed tasks
-        remaining_ids -= completed_ids
-        
-        # Sleep to avoid blocking UI
-        if remaining_ids:
-            await asyncio.sleep(poll_interval)
-    
-    return results
+    except TimeoutError:
+        return {task_id: results.get(task_id, 'timeout') for task_id in task_ids}
+    return {task_id: results.get(task_id) or _task_status(task_id) or 'not_found' for task_id in task_ids}
 
 @track_api_call
-def _find_task_by_id(task_id: str) -> Task:
-    """Internal helper to find a task by ID."""
-    # Check all task lists
-    for task in api.queued_tasks():
-        if task.id == task_id:
-            return Task(task)
-    
-    for task in api.prepared_tasks():
-        if task.id == task_id:
-            return Task(task)
-    
-    for task in api.completed_tasks():
-        if task.id == task_id:
-            return Task(task)
-    
-    running = api.running_task()
-    if running and running.id == task_id:
-        return Task(running)
-    
-    return None
+async def as_completed(tasks: Optional[Sequence[Union[Task, str]]] = None, timeout: Optional[float] = None) -> AsyncIterator[Task]:
+    """
+    Yield the tasks as they finish (completed, aborted or error), to process each result
+    while the others still run.
+
+        async for task in awb.as_completed(tasks):
+            print(task.id, task.status)
+
+    Args:
+        tasks: List of Task objects or task IDs. If None, all active tasks. Unknown IDs are skipped.
+        timeout: Maximum seconds to wait for all of them. None means wait indefinitely.
+
+    Raises:
+        TimeoutError: If the tasks have not all finished within the timeout
+    """
+    async for task_id, status in _as_finished(_task_ids(tasks), timeout):
+        if status != 'not_found':
+            yield Task(api.getTask(task_id))
+
+class TaskFailedError(Exception):
+    """Raised when a TaskGroup with fail_fast ends because one of its tasks failed."""
+    def __init__(self, task: Task, status: str):
+        super().__init__(f"Task {task.id} ended with status '{status}'")
+        self.task = task
+        self.status = status
+
+class TaskGroup:
+    """
+    Tasks submitted together and waited for at the end of an `async with` block.
+
+        async with awb.TaskGroup(concurrency=4, fail_fast=True) as group:
+            for prompt in prompts:
+                group.submit(prompt)
+        print(group.results())
+
+    If the block raises or is interrupted, the tasks of the group that have not finished
+    are cancelled, so none of them is left in the queue.
+
+    Args:
+        concurrency: At most this many tasks of the group are queued or running at a time;
+            the others are submitted as these finish. None submits them all right away.
+        fail_fast: Cancel the other tasks as soon as one ends in 'error' or 'aborted', and
+            raise TaskFailedError at the end of the block.
+    """
+    def __init__(self, concurrency: Optional[int] = None, fail_fast: bool = False):
+        if concurrency is not None and concurrency < 1:
+            raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+        self.concurrency = concurrency
+        self.fail_fast = fail_fast
+        self._tasks: dict[str, Task] = {}
+        self._pending: collections.deque[Task] = collections.deque()
+        self._active: dict[str, Task] = {}
+        self._results: dict[str, str] = {}
+        self._failure: Optional[tuple[Task, str]] = None
+        self._watcher = None
+        self._driver = None
+        self._done = None
+        self._exiting = False
+
+    @track_api_call
+    def submit(self, prompt: str, **options: Any) -> Task:
+        """
+        Create a task in the group and submit it, or hold it back until the concurrency allows.
+
+        Args:
+            prompt: The prompt
+            options: Further arguments as for create_task (mode, client, hooks, ...)
+        """
+        if self._watcher is None:
+            raise RuntimeError("TaskGroup.submit() is only available inside 'async with'")
+        task = create_task(prompt, **options)
+        self._tasks[task.id] = task
+        if self._failure is not None:
+            self._results[task.id] = 'cancelled'
+        else:
+            self._pending.append(task)
+            self._fill()
+        return task
+
+    @property
+    def tasks(self) -> list[Task]:
+        return list(self._tasks.values())
+
+    @track_api_call
+    def results(self) -> dict[str, str]:
+        """
+        Status of each task of the group in submission order: the final one, 'cancelled' for
+        tasks the group cancelled, 'not_found' for tasks deleted meanwhile, or the current one
+        while a task has not finished.
+        """
+        return {task_id: self._results.get(task_id) or _task_status(task_id) or 'not_found' for task_id in self._tasks}
+
+    @track_api_call
+    def progress(self) -> dict[str, int]:
+        """
+        Number of tasks of the group that are held back ('pending'), queued or running ('active'),
+        'completed', 'failed' (error or aborted) and 'cancelled', and in 'total'.
+        """
+        finished = list(self._results.values())
+        return {
+            'total': len(self._tasks),
+            'pending': len(self._pending),
+            'active': len(self._active),
+            'completed': finished.count('completed'),
+            'failed': finished.count('error') + finished.count('aborted'),
+            'cancelled': finished.count('cancelled'),
+        }
+
+    @track_api_call
+    def cancel(self):
+        """Cancel the tasks of the group that have not finished."""
+        for task in self._pending:
+            self._results[task.id] = 'cancelled'
+        self._pending.clear()
+        for task_id, task in self._active.items():
+            task._task.cancel(False)
+            self._results[task_id] = 'cancelled'
+        self._active.clear()
+        self._update_done()
+
+    async def __aenter__(self) -> 'TaskGroup':
+        import asyncio
+        if self._watcher is not None:
+            raise RuntimeError("TaskGroup is already in use")
+        self._watcher = api.watchTasks(_to_js({'status': list(_FINISHED_STATUSES)}))
+        self._done = asyncio.get_event_loop().create_future()
+        self._driver = asyncio.ensure_future(self._drive())
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        import asyncio
+        try:
+            self._exiting = True
+            if exc_type is None:
+                self._update_done()
+                await asyncio.wait([self._done, self._driver], return_when=asyncio.FIRST_COMPLETED)
+                # A driver that stopped early failed `_done` with the reason.
+                await self._done
+        except BaseException:
+            self.cancel()
+            raise
+        else:
+            if exc_type is not None:
+                self.cancel()
+        finally:
+            self._watcher.close()
+            self._driver.cancel()
+            if self._done.done() and not self._done.cancelled():
+                # Seen, even when the block raised its own exception
+                self._done.exception()
+
+        if exc_type is None and self.fail_fast and self._failure is not None:
+            raise TaskFailedError(*self._failure)
+        return False
+
+    async def _drive(self):
+        """
+        Follows the finished and deleted tasks of the group and submits the held back ones.
+        Fails the group if it stops before all of them have finished.
+        """
+        try:
+            await self._follow()
+        except Exception as error:
+            self._stop(error)
+        else:
+            self._stop(RuntimeError("Stopped receiving task events before the tasks of the group finished"))
+
+    async def _follow(self):
+        dropped = 0
+        while True:
+            event = await self._watcher.next()
+            if event is None:
+                return
+            if self._watcher.dropped != dropped:
+                dropped = self._watcher.dropped
+                task_ids = list(self._active) + [task.id for task in self._pending]
+            else:
+                task_ids = [event.taskId]
+            for task_id in task_ids:
+                self._check(task_id)
+
+    def _check(self, task_id: str):
+        if task_id not in self._active:
+            self._drop_deleted(task_id)
+            return
+        if self._finish(task_id):
+            self._fill()
+            self._update_done()
+
+    def _finish(self, task_id: str) -> bool:
+        """Records the result of an active task if it has finished."""
+        status = _task_status(task_id)
+        if status is not None and status not in _FINISHED_STATUSES:
+            # Not started yet, or queued again by its retry policy
+            return False
+
+        task = self._active.pop(task_id)
+        self._results[task_id] = status or 'not_found'
+        if self.fail_fast and status in ('error', 'aborted') and self._failure is None:
+            self._failure = (task, status)
+            self.cancel()
+        return True
+
+    def _drop_deleted(self, task_id: str):
+        """Stops holding back a task that was deleted meanwhile."""
+        task = next((task for task in self._pending if task.id == task_id), None)
+        if task is not None and _task_status(task_id) is None:
+            self._pending.remove(task)
+            self._results[task_id] = 'not_found'
+            self._update_done()
+
+    def _fill(self):
+        while self._pending and (self.concurrency is None or len(self._active) < self.concurrency):
+            task = self._pending.popleft()
+            self._active[task.id] = task
+            task.submit()
+            # Completed right away from the result cache
+            self._finish(task.id)
+
+    def _stop(self, error: Exception):
+        if not self._done.done():
+            self._done.set_exception(error)
+
+    def _update_done(self):
+        if self._exiting and not self._done.done() and not self._pending and not self._active:
+            self._done.set_result(None)
 
 # Prompt variable support has been completely removed
 
@@ -506,6 +1367,130 @@ async def send_to_copilot(prompt: str) -> Any:
     """
     return await execute_vscode_command('workbench.action.chat.open', prompt)
 
+class HttpResponse:
+    """
+    Response of an `awb.http` request, returned as soon as the headers arrive.
+
+    The body is streamed from the extension: read it whole with `text()`, `json()` or
+    `read()`, or chunk by chunk with `iter_bytes()` / `iter_text()`. A response whose
+    body is not read to the end should be closed (or used with `async with`), so its
+    connection is released.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.status: int = stream.statusCode
+        self.headers: dict = stream.headers.to_py()
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    def __repr__(self):
+        return f"HttpResponse(status={self.status})"
+
+    async def iter_bytes(self):
+        """Yield the body in chunks as they arrive."""
+        while True:
+            chunk = await self._stream.read()
+            if chunk is None:
+                return
+            yield chunk.to_bytes()
+
+    async def iter_text(self, encoding: str = 'utf-8'):
+        """Yield the body as decoded text chunks."""
+        decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        async for chunk in self.iter_bytes():
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+
+    async def read(self) -> bytes:
+        """Read the rest of the body."""
+        return (await self._stream.bytes()).to_bytes()
+
+    async def text(self) -> str:
+        return await self._stream.text()
+
+    async def json(self) -> Any:
+        return json.loads(await self.text())
+
+    def close(self) -> None:
+        """Discard the unread rest of the body."""
+        self._stream.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+class _HttpClient:
+    """
+    Async HTTP client backed by the extension's shared keep-alive connection pool,
+    available as `awb.http`. Repeated requests to the same server reuse open connections.
+
+    Examples:
+        resp = await awb.http.get('https://api.github.com/repos/python/cpython')
+        info = await resp.json()
+
+        resp = await awb.http.post('http://localhost:8080/hook', json_data={'done': True})
+
+        async with await awb.http.get('https://example.com/big.log') as resp:
+            async for line in resp.iter_text():
+                print(line, end='')
+    """
+
+    @track_api_call
+    async def request(self, method: str, url: str, headers: Optional[dict] = None, data: Union[str, bytes, None] = None,
+                      json_data: Any = None, timeout: Optional[float] = None) -> HttpResponse:
+        """
+        Send an HTTP request.
+
+        Args:
+            method: HTTP method, e.g. 'GET'
+            url: Request URL
+            headers: Optional request headers
+            data: Optional request body (str or bytes)
+            json_data: Optional value sent as a JSON body (instead of `data`)
+            timeout: Seconds of inactivity after which the request fails (default 10)
+
+        Returns:
+            HttpResponse: The response; non-2xx statuses are returned, not raised.
+
+        Raises:
+            ConnectionError: If the server cannot be reached or the request times out.
+        """
+        request_headers = dict(headers or {})
+        if json_data is not None:
+            data = json.dumps(json_data)
+            request_headers.setdefault('Content-Type', 'application/json')
+        options = {'method': method.upper(), 'url': url, 'headers': request_headers}
+        if data is not None:
+            options['body'] = data
+        if timeout is not None:
+            options['timeout'] = int(timeout * 1000)
+        try:
+            stream = await api.httpStream(_to_js(options))
+        except pyodide.ffi.JsException as error:
+            raise ConnectionError(f"{method.upper()} {url} failed: {error}") from error
+        return HttpResponse(stream)
+
+    async def get(self, url: str, **kwargs) -> HttpResponse:
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, data: Union[str, bytes, None] = None, json_data: Any = None, **kwargs) -> HttpResponse:
+        return await self.request('POST', url, data=data, json_data=json_data, **kwargs)
+
+    def stats(self) -> dict:
+        """Connection pool statistics (requests sent, reused/active/idle sockets, queued requests)."""
+        return api.httpStats().to_py()
+
+http = _HttpClient()
+
 # TTS Configuration and Provider Classes
 class _TTSError(Exception):
     """Exception raised for TTS-related errors."""
@@ -521,7 +1506,7 @@ class _TTSProvider:
     def get_config_value(self, key: str):
         """Get configuration value for this provider."""
         config_key = self.config['config_keys'].get(key)
-        return get_configuration(config_key) if config_key else None
+        return _config_value(config_key) if config_key else None
     
     def build_command(self, message: str, **kwargs) -> list:
         """Build the command to execute TTS. Must be implemented by subclasses."""
@@ -691,7 +1676,8 @@ def _talk_web(msg: str) -> bool:
         return False
 
 @track_api_call
-async def ntfy(message: str, topic: str = None, server: str = None, priority: int = None, tags: list = None, title: str = None, **kwargs) -> bool:
+async def ntfy(message: str, topic: str = None, server: str = None, priority: int = None, tags: list = None, title: str = None, coalesce: Optional[str] = None,
+               attach_path: Optional[str] = None, filename: Optional[str] = None, progress: Optional[Callable[[int, int], Any]] = None, **kwargs) -> bool:
     """
     Send notifications using ntfy (https://ntfy.sh).
     
@@ -705,7 +1691,15 @@ async def ntfy(message: str, topic: str = None, server: str = None, priority: in
         priority (int, optional): Message priority (1=min, 2=low, 3=default, 4=high, 5=max).
         tags (list, optional): List of tags for the notification (e.g., ["warning", "server"]).
         title (str, optional): Notification title. Uses message preview if None.
-        **kwargs: Additional ntfy parameters (delay, click, attach, etc.).
+        coalesce (str, optional): Digest key. Messages to the same topic with the same key sent within
+                                  the coalescing window are delivered as one notification titled
+                                  "<count> <coalesce>", e.g. coalesce="tasks completed".
+        attach_path (str, optional): Local file uploaded as an attachment (relative paths are resolved
+                                     against the working directory). The extension streams the file
+                                     from disk, so large logs or screenshots are not loaded into Python.
+        filename (str, optional): Attachment name shown in the notification. Defaults to the file name.
+        progress (callable, optional): Called as progress(sent_bytes, total_bytes) during the upload.
+        **kwargs: Additional ntfy parameters (delay, click, attach (URL), etc.).
     
     Returns:
         bool: True if notification sent successfully, False otherwise.
@@ -716,6 +1710,10 @@ async def ntfy(message: str, topic: str = None, server: str = None, priority: in
         - notification.ntfy.topic: Default topic/channel  
         - notification.ntfy.priority: Default priority level
         - notification.ntfy.tags: Default tags as comma-separated string
+        - notification.ntfy.rateLimitPerMinute / burst: Per-topic rate limit
+        - notification.ntfy.maxRetries: Retries (with exponential backoff) before spooling
+        - notification.ntfy.coalesceWindowSeconds: Window for `coalesce` digests
+        - notification.ntfy.maxAttachmentMB: Upload size limit for `attach_path`
     
     Examples:
         import agentworkbook as awb
@@ -742,10 +1740,24 @@ async def ntfy(message: str, topic: str = None, server: str = None, priority: in
             click="https://dashboard.example.com",
             delay="5m"  # Delay 5 minutes
         )
+        
+        # One "12 tasks completed" digest instead of 12 notifications
+        for task in finished:
+            await awb.ntfy(f"Task {task.id} done", coalesce="tasks completed")
+        
+        # Attach a build log, reporting upload progress
+        await awb.ntfy(
+            "Build finished, log attached",
+            attach_path="build/output.log",
+            progress=lambda sent, total: print(f"{sent * 100 // total}%")
+        )
     
     Note:
         - Compatible with ntfy.sh and self-hosted ntfy servers
         - Uses HTTP POST requests for reliability
+        - Messages are rate limited per topic and retried on network/server errors
+        - Undeliverable messages are spooled to disk and replayed once the server is reachable
+        - Attachments are sent with HTTP PUT and are never coalesced into digests
         - Supports all ntfy features: priorities, tags, delays, attachments, etc.
         - Falls back gracefully with error messages if server unavailable
     """
@@ -756,10 +1768,10 @@ async def ntfy(message: str, topic: str = None, server: str = None, priority: in
     
     try:
         # Get configuration values
-        config_server = get_configuration('notification.ntfy.server') or "https://ntfy.sh"
-        config_topic = get_configuration('notification.ntfy.topic')
-        config_priority = get_configuration('notification.ntfy.priority') or 3
-        config_tags_str = get_configuration('notification.ntfy.tags') or ""
+        config_server = _config_value('notification.ntfy.server') or "https://ntfy.sh"
+        config_topic = _config_value('notification.ntfy.topic')
+        config_priority = _config_value('notification.ntfy.priority') or 3
+        config_tags_str = _config_value('notification.ntfy.tags') or ""
         
         # Parse config tags from comma-separated string
         config_tags = [tag.strip() for tag in config_tags_str.split(',') if tag.strip()] if config_tags_str else []
@@ -815,30 +1827,53 @@ async def ntfy(message: str, topic: str = None, server: str = None, priority: in
             print(f"   [TAGS] {', '.join(final_tags)}")
         if final_title:
             print(f"   [TITLE] {final_title}")
+        if attach_path:
+            print(f"   [ATTACH] {attach_path}")
         
         # Use TypeScript layer for HTTP request instead of shell curl
-        # This is more reliable across different platforms and environments
+        # This is more reliable across different platforms and environments.
+        # The dispatcher rate limits, retries and spools undeliverable messages.
         try:
-            result = await api.makeHttpRequest({
-                'method': 'POST',
+            request = {
                 'url': ntfy_url,
                 'headers': headers,
                 'body': message,
-                'timeout': 10000  # 10 second timeout
-            })
+            }
+            if coalesce:
+                request['coalesceKey'] = coalesce
+            if attach_path:
+                request['attachPath'] = attach_path
+                if filename:
+                    request['filename'] = filename
+            progress_proxy = pyodide.ffi.create_proxy(progress) if progress is not None else None
+            try:
+                result = (await api.publishNtfy(_to_js(request), progress_proxy)).to_py()
+            finally:
+                if progress_proxy is not None:
+                    progress_proxy.destroy()
             
             # Check if the request was successful
             if result.get('success', False):
-                print("[OK] ntfy: Notification sent successfully!")
+                if result.get('queued', False):
+                    print(f"[OK] ntfy: Notification queued for the '{coalesce}' digest ({result.get('messages', 1)} pending)")
+                else:
+                    print("[OK] ntfy: Notification sent successfully!")
                 return True
             else:
                 error_msg = result.get('error', 'Unknown error')
                 status_code = result.get('statusCode', 'unknown')
-                print(f"[ERROR] ntfy: Failed to send notification (status: {status_code})")
+                print(f"[ERROR] ntfy: Failed to send notification (status: {status_code}, attempts: {result.get('attempts', 1)})")
                 print(f"   Error details: {error_msg}")
+                if result.get('spooled', False):
+                    print("   [SPOOLED] Message saved and will be delivered when the server is reachable again")
                 return False
                 
         except Exception as http_error:
+            if attach_path:
+                # The fallback below can only send the message text
+                print(f"[ERROR] ntfy: Failed to send attachment - {str(http_error)}")
+                return False
+
             # Fallback to fetch API if makeHttpRequest is not available
             print("[INFO] ntfy: Using fetch API fallback...")
             
@@ -903,6 +1938,21 @@ async def ntfy(message: str, topic: str = None, server: str = None, priority: in
         return False
 
 
+@track_api_call
+async def ntfy_replay() -> int:
+    """
+    Deliver ntfy messages spooled after failed deliveries.
+
+    Spooled messages are also replayed automatically after the next successful
+    notification and periodically in the background. The replay stops at the
+    first message the server still fails to accept; the rest stay spooled.
+
+    Returns:
+        int: Number of messages delivered.
+    """
+    return await api.replayNtfySpool()
+
+
 @track_api_call
 async def talk(msg, voice=None, model=None, provider=None):
     """
@@ -945,7 +1995,7 @@ async def talk(msg, voice=None, model=None, provider=None):
         import shlex
         
         # Get provider configuration
-        config_provider = get_configuration('tts.provider') or 'elevenlabs'
+        config_provider = _config_value('tts.provider') or 'elevenlabs'
         final_provider = provider if provider is not None else config_provider
         
         # Create provider instance
@@ -1092,10 +2142,10 @@ def setup_ntfy():
     print("=" * 50)
     
     # Get current configuration
-    config_server = get_configuration('notification.ntfy.server') or "https://ntfy.sh"
-    config_topic = get_configuration('notification.ntfy.topic')
-    config_priority = get_configuration('notification.ntfy.priority') or 3
-    config_tags_str = get_configuration('notification.ntfy.tags') or ""
+    config_server = _config_value('notification.ntfy.server') or "https://ntfy.sh"
+    config_topic = _config_value('notification.ntfy.topic')
+    config_priority = _config_value('notification.ntfy.priority') or 3
+    config_tags_str = _config_value('notification.ntfy.tags') or ""
     
     # Parse tags
     config_tags = [tag.strip() for tag in config_tags_str.split(',') if tag.strip()] if config_tags_str else []
@@ -1177,7 +2227,7 @@ def setup_tts(provider=None):
     print("=" * 40)
     
     # Get current provider
-    current_provider = get_configuration('tts.provider') or 'elevenlabs'
+    current_provider = _config_value('tts.provider') or 'elevenlabs'
     target_provider = provider if provider is not None else current_provider
     
     print(f"[INFO] Current Provider: {current_provider}")
@@ -1,20 +1,32 @@
 import * as vscode from 'vscode';
+import * as path from 'path';
 import { IClineController } from './ai/controller';
 import { processPromptsWithFlags, parseFlags, processPromptWithFlags } from './utils/flagProcessor';
 import { processPromptsWithAll } from './utils/commandProcessor';
-import { Hooks, HookRun } from './utils/hooks';
+import { BatchHookFunction, BatchHookKind, BatchHooks, DEFAULT_BACKGROUND_HOOK_CONCURRENCY, DEFAULT_HOOK_COMMAND_CONCURRENCY, HookContext, HookFunction, HookKind, HookPool, HookProxyStats, Hooks, HookRun, executeHook, setHookBlocking } from './utils/hooks';
+import { BatchStats, BatchTracker } from './tasks/batchHooks';
 import { MessageFromRenderer, MessageToRenderer, RendererInitializationData, RendererTask } from './renderer/interface';
+import { RendererTaskPublisher } from './renderer/taskDelta';
 import { CommandRun, shell_command } from './utils/shellCommand';
-import { Task, Tasks } from './tasks/manager';
+import { ALL_TASK_STATUSES, DagStatus, DependencyFailurePolicy, DEPENDENCY_FAILURE_POLICIES, DEFAULT_RETRY_POLICY, RETRYABLE_TASK_STATUSES, RetryPolicy, StatusCount, Task, TaskClient, TaskStatus, Tasks } from './tasks/manager';
+import { ClientLimitStatus, ClientRateLimit } from './tasks/clientLimits';
+import { TaskStoreStats } from './tasks/taskStore';
+import { tasksTable } from './tasks/taskTable';
+import { TaskPage, TaskPageOptions, TaskQuery } from './tasks/taskQuery';
+import { DEFAULT_WATCH_QUEUE_SIZE, TaskWatchFilter, TaskWatcher } from './tasks/taskWatch';
+import { DEFAULT_RESULT_CACHE_OPTIONS, ResultCacheOptions, ResultCacheStats, resultCacheKey } from './tasks/resultCache';
+import { SessionJournal, SessionJournalStats, SessionRestoreResult } from './tasks/sessionJournal';
 import { ICommandExecutor } from './tasks/interfaces';
 import * as telemetry from './utils/telemetry';
 import { Worker } from './tasks/worker';
-import { COMMANDS, UI_REPAINT_TIMEOUTS, TIMEOUTS } from './core/constants';
+import { COMMANDS, UI_REPAINT_TIMEOUTS, TIMEOUTS, NTFY_SPOOL_FILE } from './core/constants';
 import { ClientFactory } from './ai/clientFactory';
+import { HttpClientOptions, HttpClientStats, HttpRequestOptions, HttpResponseStream, HttpResult, DEFAULT_HTTP_CLIENT_OPTIONS, httpClient } from './utils/http';
+import { NtfyDispatcher, NtfyDispatcherOptions, NtfyDelivery, NtfyMessage, NtfyUploadProgress, DEFAULT_NTFY_DISPATCHER_OPTIONS } from './utils/ntfyDispatcher';
 
 export class AgentWorkbookStatus implements RendererInitializationData {
     public mime_type = 'application/x-agentworkbook-status';
-    constructor(public tasks: RendererTask[], public workerActive: boolean) {}
+    constructor(public tasks: RendererTask[], public version: number, public workerActive: boolean) {}
 }
 
 let agentworkbook: AgentWorkbook | undefined;
@@ -32,20 +44,31 @@ export class AgentWorkbook implements ICommandExecutor {
         oncomplete: undefined,
         onpause: undefined,
         onresume: undefined,
+        nonBlocking: [],
     };
 
     private rendererMessaging: vscode.NotebookRendererMessaging;
+    /** The task list as last sent to the renderers, which get only the changes */
+    private rendererTasks = new RendererTaskPublisher();
 
-    currentHookRun?: HookRun;
+    /** Runs the non-blocking hooks */
+    backgroundHooks = new HookPool();
+    /** Runs the shell commands returned by hooks */
+    hookCommands = new HookPool(DEFAULT_HOOK_COMMAND_CONCURRENCY);
 
     private worker: Worker;
     public workingDirectory?: string;
 
+    private configurationListeners: Set<() => void> = new Set();
+    private _ntfyDispatcher?: NtfyDispatcher;
+    private sessionRestore?: Promise<SessionRestoreResult | undefined>;
+
     constructor(
         private readonly extensionContext: vscode.ExtensionContext,
         readonly outputChannel: vscode.OutputChannel,
         readonly clineController: IClineController,
         public readonly tasks: Tasks,
+        private readonly session: SessionJournal,
     ) {
         this.worker = new Worker(this.tasks, this.clineController, this.outputChannel, this);
         this.rendererMessaging = vscode.notebooks.createRendererMessaging('agentworkbook-status-renderer');
@@ -60,6 +83,67 @@ export class AgentWorkbook implements ICommandExecutor {
         });
         this.worker.run();
 
+        if (vscode.workspace.getConfiguration('agentworkbook.session').get<boolean>('restoreOnStartup', true)) {
+            // Restored after activation, so a large session does not delay startup
+            this.sessionRestore = new Promise(resolve => setImmediate(() => resolve(this.restorePreviousSession())));
+        } else {
+            // The previous session is kept until restored on demand, or until this session has tasks of its own
+            const discardPrevious = () => {
+                if (this.sessionRestore === undefined) {
+                    this.session.discard();
+                }
+                this.tasks.off('update', discardPrevious);
+            };
+            this.tasks.on('update', discardPrevious);
+        }
+
+        this.tasks.resultCache.configure(this.resultCacheOptions());
+        this.backgroundHooks.concurrency = this.backgroundHookConcurrency();
+        this.hookCommands.concurrency = this.hookCommandConcurrency();
+        httpClient.configure(this.httpClientOptions());
+        this.extensionContext.subscriptions.push({ dispose: () => httpClient.dispose() });
+
+        this.extensionContext.subscriptions.push(vscode.workspace.onDidChangeConfiguration(evt => {
+            if (!evt.affectsConfiguration('agentworkbook')) {
+                return;
+            }
+            if (evt.affectsConfiguration('agentworkbook.tasks.memoryBudgetMB')) {
+                const budgetMB = vscode.workspace.getConfiguration('agentworkbook.tasks').get<number>('memoryBudgetMB', 256);
+                this.tasks.store.configure({ memoryBudgetBytes: budgetMB * 1024 * 1024 });
+            }
+            if (evt.affectsConfiguration('agentworkbook.tasks.priorityAgingMinutes')) {
+                const agingMinutes = vscode.workspace.getConfiguration('agentworkbook.tasks').get<number>('priorityAgingMinutes', 10);
+                this.tasks.configurePriorityAging(agingMinutes * 60 * 1000);
+            }
+            if (evt.affectsConfiguration('agentworkbook.tasks.resultCacheTtlMinutes') || evt.affectsConfiguration('agentworkbook.tasks.resultCacheMaxEntries')) {
+                this.tasks.resultCache.configure(this.resultCacheOptions());
+            }
+            if (evt.affectsConfiguration('agentworkbook.hooks.backgroundConcurrency')) {
+                this.backgroundHooks.concurrency = this.backgroundHookConcurrency();
+            }
+            if (evt.affectsConfiguration('agentworkbook.hooks.commandConcurrency')) {
+                this.hookCommands.concurrency = this.hookCommandConcurrency();
+            }
+            if (evt.affectsConfiguration('agentworkbook.http')) {
+                httpClient.configure(this.httpClientOptions());
+            }
+            if (evt.affectsConfiguration('agentworkbook.notification.ntfy')) {
+                try {
+                    this._ntfyDispatcher?.configure(this.ntfyDispatcherOptions());
+                } catch (error) {
+                    // The previous limits stay in effect.
+                    this.outputChannel.appendLine(`ntfy: ${error instanceof Error ? error.message : error}`);
+                }
+            }
+            for (const listener of this.configurationListeners) {
+                try {
+                    listener();
+                } catch (error) {
+                    this.outputChannel.appendLine(`Error in configuration listener: ${error}`);
+                }
+            }
+        }));
+
         this.rendererMessaging.onDidReceiveMessage(evt => {
             const msg = evt.message as MessageFromRenderer;
             
@@ -72,6 +156,16 @@ export class AgentWorkbook implements ICommandExecutor {
                 case 'pauseWorker':
                     this.pauseWorker();
                     return;
+                case 'requestSnapshot': {
+                    const { version, tasks } = this.rendererTasks.snapshot();
+                    this.rendererMessaging.postMessage({
+                        type: 'statusSnapshot',
+                        tasks,
+                        version,
+                        workerActive: this.worker.active,
+                    } as MessageToRenderer, evt.editor);
+                    return;
+                }
                 default:
                     break;
             }
@@ -124,9 +218,10 @@ export class AgentWorkbook implements ICommandExecutor {
     async schedule_ui_repaint() {
         for (const timeout of UI_REPAINT_TIMEOUTS) {
             await new Promise<void>(resolve => setTimeout(async () => {
+                // Sent on every timeout, even without changes: renderers that missed a delta notice and ask for a snapshot.
                 await this.rendererMessaging.postMessage({
                     type: 'statusUpdated',
-                    tasks: this.tasks.getRendererTasks(),
+                    delta: this.rendererTasks.publish(this.tasks.getRendererTasks()),
                     workerActive: this.worker.active,
                 } as MessageToRenderer);
                 resolve();
@@ -168,14 +263,43 @@ export class AgentWorkbook implements ICommandExecutor {
      * @param client Client type ('roo', 'copilot', 'supercode')
      * @param supercodeUrl Optional SuperCode URL
      * @param buildPrompt Whether to build prompt by processing flags (True for backward compatibility, False for pre-processed prompts)
+     * @param dependsOn Ids of tasks that have to complete before this one runs
+     * @param onDependencyFailure What happens to the task when a dependency fails ('abort', 'skip' or 'run')
+     * @param priority Queued tasks with a higher priority run first
+     * @param retryPolicy Queue the task again when it ends with a retryable status (missing fields take the defaults)
+     * @param cache Complete the task with the result of a completed task with the same prompt, mode and client
+     *   instead of running it, and keep its own result for later ones
      * @returns Created Task object
      */
-    createTask(prompt: string, mode: string, hooks?: Hooks, client: string = 'roo', supercodeUrl?: string, buildPrompt: boolean = true): Task {
-        const tasks = this.createTasks([prompt], mode, hooks, client, supercodeUrl, buildPrompt);
+    createTask(prompt: string, mode: string, hooks?: Hooks, client: string = 'roo', supercodeUrl?: string, buildPrompt: boolean = true, dependsOn: string[] = [], onDependencyFailure: string = 'abort', priority: number = 0, retryPolicy?: Partial<RetryPolicy>, cache: boolean = false): Task {
+        const tasks = this.createTasks([prompt], mode, hooks, client, supercodeUrl, buildPrompt, dependsOn, onDependencyFailure, priority, retryPolicy, cache);
         return tasks[0];
     }
 
-    createTasks(prompts: string[], mode: string, hooks?: Hooks, client: string = 'roo', supercodeUrl?: string, buildPrompt: boolean = true): Task[] {
+    /**
+     * `onBatchStart` runs once when the first of the tasks starts, `onBatchComplete` once when
+     * all of them have finished; both in the background, like non-blocking hooks.
+     */
+    createTasks(prompts: string[], mode: string, hooks?: Hooks, client: string = 'roo', supercodeUrl?: string, buildPrompt: boolean = true, dependsOn: string[] = [], onDependencyFailure: string = 'abort', priority: number = 0, retryPolicy?: Partial<RetryPolicy>, cache: boolean = false, onBatchStart?: BatchHookFunction, onBatchComplete?: BatchHookFunction): Task[] {
+        const retry = retryPolicy !== undefined ? { ...DEFAULT_RETRY_POLICY, ...retryPolicy } : undefined;
+        if (retry !== undefined) {
+            if (!(retry.maxAttempts >= 1)) {
+                throw new Error(`Invalid retry policy: maxAttempts must be at least 1, got ${retry.maxAttempts}`);
+            }
+            const invalidStatuses = retry.retryOn.filter(status => !RETRYABLE_TASK_STATUSES.includes(status));
+            if (invalidStatuses.length > 0) {
+                throw new Error(`Invalid retry policy: cannot retry on ${invalidStatuses.join(', ')}, expected any of: ${RETRYABLE_TASK_STATUSES.join(', ')}`);
+            }
+        }
+
+        const unknownDependencies = dependsOn.filter(id => this.tasks.getTaskById(id) === undefined);
+        if (unknownDependencies.length > 0) {
+            throw new Error(`Cannot depend on unknown tasks: ${unknownDependencies.map(id => `#${id}`).join(', ')}`);
+        }
+        if (!DEPENDENCY_FAILURE_POLICIES.includes(onDependencyFailure as DependencyFailurePolicy)) {
+            throw new Error(`Invalid dependency failure policy '${onDependencyFailure}', expected one of: ${DEPENDENCY_FAILURE_POLICIES.join(', ')}`);
+        }
+
         this.showRooCodeSidebar();
 
         // Process prompts with flags only if requested (for backward compatibility)
@@ -191,20 +315,95 @@ export class AgentWorkbook implements ICommandExecutor {
             clientTyped = 'roo'; // Default fallback
         }
         
-        const tasks = finalPrompts.map(prompt => new Task(prompt, mode, hooks, clientTyped, supercodeUrl));
+        // A copy, so that the tasks keep the hooks they were created with (and release those).
+        const taskHooks = hooks !== undefined ? { ...hooks } : undefined;
+        const tasks = finalPrompts.map(prompt => new Task(prompt, mode, taskHooks, clientTyped, supercodeUrl));
+        for (const task of tasks) {
+            task.dependsOn = [...dependsOn];
+            task.onDependencyFailure = onDependencyFailure as DependencyFailurePolicy;
+            task.priority = priority;
+            task.retryPolicy = retry;
+            if (cache) {
+                task.cacheKey = resultCacheKey(task.prompt, task.mode, task.client);
+            }
+        }
+        if (onBatchStart !== undefined || onBatchComplete !== undefined) {
+            this.trackBatch(tasks, { onbatchstart: onBatchStart, onbatchcomplete: onBatchComplete });
+        }
+        // Pushing emits 'update', which repaints (once the batch ends, in a batch).
         this.tasks.push(...tasks);
-        this.schedule_ui_repaint();
 
         return tasks;
     }
 
-    createHooks(onstart: any, oncomplete: any, onpause: any, onresume: any): Hooks {
-        return {
+    /** Runs the batch hooks of the tasks, then releases them */
+    private trackBatch(tasks: Task[], hooks: BatchHooks) {
+        const proxies = this.tasks.hookProxies;
+        proxies.retainHook(hooks.onbatchstart);
+        proxies.retainHook(hooks.onbatchcomplete);
+        const release = () => {
+            proxies.releaseHook(hooks.onbatchstart);
+            proxies.releaseHook(hooks.onbatchcomplete);
+        };
+
+        const run = (kind: BatchHookKind, stats: BatchStats) => {
+            const hook = hooks[kind];
+            if (hook === undefined) {
+                return Promise.resolve();
+            }
+            const hookRun = new HookRun(kind);
+            hookRun.background = true;
+            return executeHook(hookRun, () => hook(stats, hookRun), this.hookContext());
+        };
+
+        let started: Promise<void> = Promise.resolve();
+        new BatchTracker(this.tasks, tasks, {
+            onStart: stats => this.backgroundHooks.run(() => started = run('onbatchstart', stats)),
+            // After the start hook, which the pool may still be running
+            onComplete: stats => this.backgroundHooks.run(() => started.then(() => run('onbatchcomplete', stats)).finally(release)),
+        });
+    }
+
+    /** Hooks for a Python Hooks object, which releases them when it is garbage collected */
+    createHooks(onstart: any, oncomplete: any, onpause: any, onresume: any, nonBlocking: HookKind[] = []): Hooks {
+        const hooks: Hooks = {
             onstart: onstart,
             oncomplete: oncomplete,
             onpause: onpause,
             onresume: onresume,
+            nonBlocking: nonBlocking,
         };
+        this.tasks.hookProxies.retain(hooks);
+        return hooks;
+    }
+
+    /** A copy of the hooks for a Python Hooks object, as createHooks */
+    copyHooks(hooks: Hooks): Hooks {
+        return this.createHooks(hooks.onstart, hooks.oncomplete, hooks.onpause, hooks.onresume, [...hooks.nonBlocking ?? []]);
+    }
+
+    releaseHooks(hooks: Hooks) {
+        this.tasks.hookProxies.release(hooks);
+    }
+
+    /**
+     * Replaces the global hook of this kind, and sets whether it holds up the worker until
+     * it has finished.
+     */
+    setGlobalHook(kind: HookKind, hook: HookFunction | undefined, blocking: boolean) {
+        this.tasks.hookProxies.retainHook(hook);
+        this.tasks.hookProxies.releaseHook(this.globalHooks[kind]);
+        this.globalHooks[kind] = hook;
+        setHookBlocking(this.globalHooks, kind, blocking);
+    }
+
+    /** Lets Python forget its proxy of a hook function before the proxy is destroyed */
+    setHookProxyDestroyed(callback: (hook: HookFunction | BatchHookFunction) => void) {
+        this.tasks.hookProxies.onDestroy = callback;
+    }
+
+    hookProxyStats(): HookProxyStats {
+        return this.tasks.hookProxies.stats();
     }
 
     queued_tasks(): Task[] {
@@ -219,10 +418,145 @@ export class AgentWorkbook implements ICommandExecutor {
         return this.tasks.completed;
     }
 
+    /**
+     * Limits how fast the worker starts tasks of a client. While a client is held back,
+     * tasks of the other clients run. Without any limit, removes the client's limits.
+     */
+    setRateLimit(client: string, limit: ClientRateLimit) {
+        if (!['roo', 'copilot', 'supercode'].includes(client)) {
+            throw new Error(`Unknown client '${client}', expected one of: roo, copilot, supercode`);
+        }
+        this.worker.limits.configure(client as TaskClient, limit);
+        this.worker.limitsChanged();
+    }
+
+    rateLimits(): Partial<Record<TaskClient, ClientLimitStatus>> {
+        return this.worker.limits.status();
+    }
+
+    /**
+     * Defers the task updates (renderer repaint, telemetry, worker wakeup) until the matching
+     * `endTaskBatch`, then sends one. Batches nest.
+     */
+    beginTaskBatch() {
+        this.tasks.beginBatch();
+    }
+
+    endTaskBatch() {
+        this.tasks.endBatch();
+    }
+
+    reprioritize(task: Task, priority: number) {
+        this.tasks.reprioritize(task, priority);
+    }
+
+    dagStatus(): DagStatus {
+        return this.tasks.dagStatus();
+    }
+
+    taskStoreStats(): TaskStoreStats {
+        return this.tasks.store.stats();
+    }
+
+    taskCacheStats(): ResultCacheStats {
+        return this.tasks.resultCache.stats();
+    }
+
+    clearTaskCache() {
+        this.tasks.resultCache.clear();
+    }
+
+    /**
+     * Waits for the tasks of the previous session to be restored (restoring them now if
+     * `session.restoreOnStartup` is off and this session has no tasks yet).
+     * Returns the number of restored tasks.
+     */
+    async restoreSession(): Promise<number> {
+        if (this.sessionRestore === undefined && !this.session.isStarted) {
+            this.sessionRestore = Promise.resolve(this.restorePreviousSession());
+        }
+        return (await this.sessionRestore)?.tasks ?? 0;
+    }
+
+    /** Writes the task queue to disk now, as a fresh snapshot. */
+    snapshotSession(): SessionJournalStats {
+        this.session.flush(true);
+        return this.session.stats();
+    }
+
+    private restorePreviousSession(): SessionRestoreResult | undefined {
+        let result: SessionRestoreResult;
+        try {
+            result = this.session.restore();
+        } catch (error) {
+            this.outputChannel.appendLine(`Could not restore the previous session: ${error}`);
+            this.session.discard();
+            return undefined;
+        }
+        if (result.tasks === 0) {
+            return result;
+        }
+
+        this.outputChannel.appendLine(`Restored ${result.tasks} tasks of the previous session in ${result.durationMs.toFixed(0)} ms`);
+        if (result.queued > 0) {
+            // Hooks are Python callables and cannot be restored; let the user decide when to continue.
+            this.pauseWorker();
+            vscode.window.showInformationMessage(
+                `Restored ${result.queued} queued tasks of the previous session without their hooks. Resume the worker to run them.`
+            );
+        }
+        return result;
+    }
+
     prepared_tasks(): Task[] {
         return this.tasks.prepared;
     }
 
+    /**
+     * Metadata of the tasks as one array per field (see `tasksTable`), in list order.
+     * With `statuses`, only the tasks in those statuses.
+     */
+    tasksTable(fields?: string[], statuses?: string[]): Record<string, unknown> {
+        if (statuses === undefined) {
+            return tasksTable([...this.tasks], fields);
+        }
+        const unknown = statuses.filter(status => !ALL_TASK_STATUSES.includes(status as TaskStatus));
+        if (unknown.length > 0) {
+            throw new Error(`Unknown task statuses: ${unknown.join(', ')}, expected any of: ${ALL_TASK_STATUSES.join(', ')}`);
+        }
+        return tasksTable(this.tasks.withStatus(...statuses as TaskStatus[]), fields);
+    }
+
+    /** Tasks matching the query, a page at a time (see `Tasks.find`) */
+    findTasks(query: TaskQuery, options: TaskPageOptions = {}): TaskPage {
+        const unknownStatuses = (query.status ?? []).filter(status => !ALL_TASK_STATUSES.includes(status));
+        if (unknownStatuses.length > 0) {
+            throw new Error(`Unknown task statuses: ${unknownStatuses.join(', ')}, expected any of: ${ALL_TASK_STATUSES.join(', ')}`);
+        }
+        return this.tasks.find(query, options);
+    }
+
+    getTask(id: string): Task | undefined {
+        return this.tasks.getTaskById(id);
+    }
+
+    /**
+     * Subscribes to the status changes of the tasks matching the filter. The caller takes
+     * them with `next()` and has to `close()` the watcher when done.
+     */
+    watchTasks(filter: TaskWatchFilter = {}, maxQueue: number = DEFAULT_WATCH_QUEUE_SIZE): TaskWatcher {
+        return new TaskWatcher(this.tasks, filter, maxQueue);
+    }
+
+    /** Number of tasks in each status, without the archived ones unless `includeArchived` */
+    statusCounts(includeArchived: boolean = false): Record<TaskStatus, number> {
+        const counts = {} as Record<TaskStatus, number>;
+        for (const [status, count] of Object.entries(this.tasks.statusCounts()) as [TaskStatus, StatusCount][]) {
+            counts[status] = includeArchived ? count.total : count.total - count.archived;
+        }
+        return counts;
+    }
+
     resumeWorker() {
         this.worker.active = true;
         this.schedule_ui_repaint();
@@ -233,15 +567,15 @@ export class AgentWorkbook implements ICommandExecutor {
         this.schedule_ui_repaint();
     }
 
-    async executeShell(command: string): Promise<CommandRun> {
+    /** Runs a shell command; commands run by a hook are added to its run. */
+    async executeShell(command: string, hookRun?: HookRun): Promise<CommandRun> {
         let cmdRun: CommandRun;
         const options = { cwd: this.workingDirectory, timeout: TIMEOUTS.SHELL_COMMAND };
 
-        const currentHookRun = this.currentHookRun;
-        if (currentHookRun === undefined) {
+        if (hookRun === undefined) {
             cmdRun = await shell_command(command, options);
         } else {
-            cmdRun = await currentHookRun.command(command, options);
+            cmdRun = await hookRun.command(command, options);
         }
 
         this.outputChannel.append('--------\n' + cmdRun.toString() + '\n--------\n');
@@ -256,6 +590,31 @@ export class AgentWorkbook implements ICommandExecutor {
         return vscode.workspace.getConfiguration('agentworkbook').get(key);
     }
 
+    /**
+     * Returns all settings contributed by the extension in a single call,
+     * keyed the same way as `getConfiguration` (without the `agentworkbook.` prefix).
+     * Python uses this to build its configuration snapshot.
+     */
+    getConfigurations(): Record<string, any> {
+        const config = vscode.workspace.getConfiguration('agentworkbook');
+        const properties = this.extensionContext.extension.packageJSON.contributes?.configuration?.properties ?? {};
+        const values: Record<string, any> = {};
+        for (const fullKey of Object.keys(properties)) {
+            const key = fullKey.slice('agentworkbook.'.length);
+            values[key] = config.get(key);
+        }
+        return values;
+    }
+
+    /**
+     * Registers a listener called whenever any `agentworkbook.*` setting changes.
+     * Python uses it to invalidate its configuration snapshot.
+     */
+    onConfigurationChanged(listener: () => void): vscode.Disposable {
+        this.configurationListeners.add(listener);
+        return new vscode.Disposable(() => this.configurationListeners.delete(listener));
+    }
+
     /**
      * Returns the platform the extension is running on
      * This is exposed to Python code to properly detect Windows vs other platforms
@@ -280,93 +639,107 @@ export class AgentWorkbook implements ICommandExecutor {
      * Make HTTP requests from the TypeScript layer
      * This is more reliable than using shell curl commands across different platforms
      */
-    async makeHttpRequest(options: {
-        method: string;
-        url: string;
-        headers?: Record<string, string>;
-        body?: string;
-        timeout?: number;
-    }): Promise<{success: boolean; statusCode?: number; error?: string; response?: string}> {
-        try {
-            this.outputChannel.appendLine(`Making HTTP request: ${options.method} ${options.url}`);
-            
-            // Use Node.js fetch (available in Node 18+) or fall back to https module
-            const https = require('https');
-            const http = require('http');
-            const url = require('url');
-            
-            const parsedUrl = url.parse(options.url);
-            const isHttps = parsedUrl.protocol === 'https:';
-            const client = isHttps ? https : http;
-            
-            const requestOptions = {
-                hostname: parsedUrl.hostname,
-                port: parsedUrl.port || (isHttps ? 443 : 80),
-                path: parsedUrl.path,
-                method: options.method,
-                headers: {
-                    'Content-Type': 'text/plain; charset=utf-8',
-                    ...options.headers
-                },
-                timeout: options.timeout || 10000
-            };
-            
-            return new Promise((resolve) => {
-                const req = client.request(requestOptions, (res: any) => {
-                    let data = '';
-                    
-                    res.on('data', (chunk: any) => {
-                        data += chunk;
-                    });
-                    
-                    res.on('end', () => {
-                        const success = res.statusCode >= 200 && res.statusCode < 300;
-                        this.outputChannel.appendLine(`HTTP request completed: ${res.statusCode}`);
-                        
-                        resolve({
-                            success,
-                            statusCode: res.statusCode,
-                            response: data,
-                            error: success ? undefined : `HTTP ${res.statusCode}: ${data}`
-                        });
-                    });
-                });
-                
-                req.on('error', (error: any) => {
-                    this.outputChannel.appendLine(`HTTP request error: ${error.message}`);
-                    resolve({
-                        success: false,
-                        error: error.message
-                    });
-                });
-                
-                req.on('timeout', () => {
-                    req.destroy();
-                    this.outputChannel.appendLine(`HTTP request timeout`);
-                    resolve({
-                        success: false,
-                        error: 'Request timeout'
-                    });
-                });
-                
-                // Send the body if provided
-                if (options.body) {
-                    req.write(options.body);
-                }
-                req.end();
-            });
-            
-        } catch (error) {
-            this.outputChannel.appendLine(`HTTP request exception: ${error}`);
-            return {
-                success: false,
-                error: String(error)
-            };
+    async makeHttpRequest(options: HttpRequestOptions): Promise<HttpResult> {
+        this.outputChannel.appendLine(`Making HTTP request: ${options.method} ${options.url}`);
+        const result = await httpClient.request(options);
+        if (result.statusCode !== undefined) {
+            this.outputChannel.appendLine(`HTTP request completed: ${result.statusCode}`);
+        } else {
+            this.outputChannel.appendLine(`HTTP request error: ${result.error}`);
         }
+        return result;
+    }
+
+    /**
+     * Send an HTTP request through the shared keep-alive pool and return the response
+     * as soon as its headers arrive; the body is read incrementally by the caller.
+     */
+    async httpStream(options: HttpRequestOptions): Promise<HttpResponseStream> {
+        return await httpClient.stream(options);
+    }
+
+    httpStats(): HttpClientStats {
+        return httpClient.stats();
+    }
+
+    /** Where and how hooks run their commands */
+    hookContext(): HookContext {
+        return { cwd: this.workingDirectory, commands: this.hookCommands, log: text => this.outputChannel.append(text) };
+    }
+
+    private hookCommandConcurrency(): number {
+        return vscode.workspace.getConfiguration('agentworkbook.hooks').get<number>('commandConcurrency', DEFAULT_HOOK_COMMAND_CONCURRENCY);
+    }
+
+    private backgroundHookConcurrency(): number {
+        return vscode.workspace.getConfiguration('agentworkbook.hooks').get<number>('backgroundConcurrency', DEFAULT_BACKGROUND_HOOK_CONCURRENCY);
+    }
+
+    private resultCacheOptions(): Partial<ResultCacheOptions> {
+        const config = vscode.workspace.getConfiguration('agentworkbook.tasks');
+        return {
+            ttlMs: config.get<number>('resultCacheTtlMinutes', DEFAULT_RESULT_CACHE_OPTIONS.ttlMs / 60_000) * 60_000,
+            maxEntries: config.get<number>('resultCacheMaxEntries', DEFAULT_RESULT_CACHE_OPTIONS.maxEntries),
+        };
+    }
+
+    private httpClientOptions(): Partial<HttpClientOptions> {
+        const config = vscode.workspace.getConfiguration('agentworkbook.http');
+        return {
+            maxSocketsPerOrigin: config.get<number>('maxSocketsPerOrigin', DEFAULT_HTTP_CLIENT_OPTIONS.maxSocketsPerOrigin),
+            keepAliveMs: config.get<number>('keepAliveSeconds', DEFAULT_HTTP_CLIENT_OPTIONS.keepAliveMs / 1000) * 1000,
+        };
+    }
+
+    /**
+     * Publish an ntfy notification through the rate-limited, retrying dispatcher.
+     * Undeliverable messages are spooled to disk and replayed later.
+     * A relative `attachPath` is resolved against the working directory.
+     */
+    async publishNtfy(message: NtfyMessage, onProgress?: NtfyUploadProgress): Promise<NtfyDelivery> {
+        if (message.attachPath !== undefined) {
+            const baseDirectory = this.workingDirectory ?? vscode.workspace.workspaceFolders?.[0]?.uri.fsPath ?? '';
+            message = { ...message, attachPath: path.resolve(baseDirectory, message.attachPath) };
+        }
+        const delivery = await this.ntfyDispatcher.publish(message, onProgress);
+        if (delivery.spooled) {
+            this.outputChannel.appendLine(`ntfy: delivery to ${message.url} failed after ${delivery.attempts} attempts, message spooled`);
+        }
+        return delivery;
+    }
+
+    /**
+     * Try to deliver spooled ntfy messages now.
+     * @returns Number of delivered messages
+     */
+    async replayNtfySpool(): Promise<number> {
+        return await this.ntfyDispatcher.replaySpool();
+    }
+
+    private get ntfyDispatcher(): NtfyDispatcher {
+        if (this._ntfyDispatcher === undefined) {
+            this._ntfyDispatcher = new NtfyDispatcher(options => this.makeHttpRequest(options), this.ntfyDispatcherOptions());
+            this.extensionContext.subscriptions.push({ dispose: () => this._ntfyDispatcher?.dispose() });
+        }
+        return this._ntfyDispatcher;
+    }
+
+    private ntfyDispatcherOptions(): Partial<NtfyDispatcherOptions> {
+        const config = vscode.workspace.getConfiguration('agentworkbook.notification.ntfy');
+        return {
+            ratePerMinute: config.get<number>('rateLimitPerMinute', DEFAULT_NTFY_DISPATCHER_OPTIONS.ratePerMinute),
+            burst: config.get<number>('burst', DEFAULT_NTFY_DISPATCHER_OPTIONS.burst),
+            maxRetries: config.get<number>('maxRetries', DEFAULT_NTFY_DISPATCHER_OPTIONS.maxRetries),
+            coalesceWindowMs: config.get<number>('coalesceWindowSeconds', DEFAULT_NTFY_DISPATCHER_OPTIONS.coalesceWindowMs / 1000) * 1000,
+            maxAttachmentBytes: config.get<number>('maxAttachmentMB', DEFAULT_NTFY_DISPATCHER_OPTIONS.maxAttachmentBytes / (1024 * 1024)) * 1024 * 1024,
+            spoolFile: path.join(this.extensionContext.globalStorageUri.fsPath, NTFY_SPOOL_FILE),
+        };
     }
 
     livePreview(): AgentWorkbookStatus {
-        return new AgentWorkbookStatus(this.tasks.getRendererTasks(), this.worker.active);
+        // The published list: changes since are on their way to the renderers as deltas.
+        const { version, tasks } = this.rendererTasks.snapshot();
+        return new AgentWorkbookStatus(tasks, version, this.worker.active);
     }
 
     async showRooCodeSidebar(): Promise<void> {
@@ -224,15 +224,7 @@ export class ClientFactory {
             const testClient = new SuperCodeClient(testUrl, 5000, 1); // Short timeout for testing
             
             // Try to get status to test connection
-            const response = await fetch(`${testUrl}/tui/status`, {
-                method: 'GET',
-                headers: { 'Content-Type': 'application/json' },
-                signal: AbortSignal.timeout(5000)
-            });
-
-            if (!response.ok) {
-                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
-            }
+            await testClient.getClientStatus();
 
             await testClient.dispose();
             return true;
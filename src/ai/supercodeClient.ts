@@ -4,16 +4,51 @@
 
 import { ITaskClient, ClientError } from './clientTypes';
 import { Task, TaskStatus } from '../tasks/manager';
+import { HttpResponseStream, httpClient } from '../utils/http';
+import { ServerSentEventParser } from '../utils/sse';
 
 /**
  * Response from SuperCode TUI API status endpoint
  */
-interface TUIStatusResponse {
+export interface TUIStatusResponse {
     busy: boolean;
     status: 'ready' | 'processing' | 'error';
     message?: string;
 }
 
+/**
+ * Server-Sent Events stream of status changes. Each event carries a status object
+ * (same shape as `/tui/status`); servers without it are polled instead.
+ */
+const STATUS_EVENTS_PATH = '/tui/status/events';
+
+export interface SuperCodeStatusOptions {
+    /** Status polling interval, used when the server has no event stream */
+    pollIntervalMs: number;
+    /** Delay before reconnecting an event stream that was dropped */
+    reconnectDelayMs: number;
+    /** How long to keep polling before probing a server without event stream again */
+    eventStreamRetryMs: number;
+    /** While the event stream is quiet this long, the status is requested to check on the server */
+    heartbeatMs: number;
+    /** An event stream that stays silent this long is reconnected */
+    eventStreamIdleMs: number;
+    /**
+     * A task that was never seen busy is considered complete once the server is ready
+     * this long after submission (the task may have finished before the first status update)
+     */
+    completionGraceMs: number;
+}
+
+export const DEFAULT_SUPERCODE_STATUS_OPTIONS: SuperCodeStatusOptions = {
+    pollIntervalMs: 1000,
+    reconnectDelayMs: 1000,
+    eventStreamRetryMs: 5 * 60_000,
+    heartbeatMs: 30_000,
+    eventStreamIdleMs: 5 * 60_000,
+    completionGraceMs: 5000,
+};
+
 /**
  * SuperCode client that communicates via TUI API
  */
@@ -21,11 +56,16 @@ export class SuperCodeClient implements ITaskClient {
     private readonly baseUrl: string;
     private readonly timeout: number;
     private readonly maxRetries: number;
+    private readonly statusOptions: SuperCodeStatusOptions;
+
+    /** Set when the server turned out to have no status event stream: the time to probe it again */
+    private eventStreamUnsupportedUntil?: number;
 
-    constructor(baseUrl: string, timeout: number = 30000, maxRetries: number = 3) {
+    constructor(baseUrl: string, timeout: number = 30000, maxRetries: number = 3, statusOptions: Partial<SuperCodeStatusOptions> = {}) {
         this.baseUrl = baseUrl.endsWith('/') ? baseUrl.slice(0, -1) : baseUrl;
         this.timeout = timeout;
         this.maxRetries = maxRetries;
+        this.statusOptions = { ...DEFAULT_SUPERCODE_STATUS_OPTIONS, ...statusOptions };
     }
 
     /**
@@ -36,25 +76,78 @@ export class SuperCodeClient implements ITaskClient {
             // Step 1: Wait for TUI to be ready
             await this.waitForReady();
 
-            // Step 2: Clear any existing prompt
-            await this.makeRequest('POST', '/tui/clear-prompt', {});
+            await this.submitPrompt(task);
+        } catch (error) {
+            throw new ClientError(
+                `Failed to submit task ${task.id}`,
+                'supercode',
+                error instanceof Error ? error : new Error(String(error))
+            );
+        }
+    }
 
-            // Step 3: Append the new prompt
-            await this.makeRequest('POST', '/tui/append-prompt', {
-                text: task.prompt
-            });
+    /**
+     * Submit a task and wait until SuperCode has finished it.
+     * Status changes are pushed through the server's event stream when it has one (polling otherwise),
+     * and the watch starts before the prompt is submitted, so completion is noticed as soon as it happens.
+     * @returns The final status ('ready', or 'error' if SuperCode reported an error)
+     */
+    async runTask(task: Task, timeoutMs: number): Promise<TUIStatusResponse> {
+        try {
+            await this.waitForReady();
+        } catch (error) {
+            throw new ClientError(
+                `Failed to submit task ${task.id}`,
+                'supercode',
+                error instanceof Error ? error : new Error(String(error))
+            );
+        }
 
-            // Step 4: Submit the prompt for processing
-            await this.makeRequest('POST', '/tui/submit-prompt', {});
+        const submittedAt = Date.now();
+        let sawBusy = false;
+        const submission = new AbortController();
+        const completion = this.waitForStatus(status => {
+            if (status.status === 'error') {
+                return true;
+            }
+            if (status.busy) {
+                sawBusy = true;
+                return false;
+            }
+            return status.status === 'ready' && (sawBusy || Date.now() - submittedAt >= this.statusOptions.completionGraceMs);
+        }, timeoutMs, { recheckAfterMs: this.statusOptions.completionGraceMs, signal: submission.signal });
+        // Rejections are observed below; avoid an unhandled rejection if the submission fails first.
+        completion.catch(() => undefined);
 
-            console.log(`SuperCode task ${task.id} submitted successfully`);
+        try {
+            await this.submitPrompt(task);
         } catch (error) {
+            submission.abort();
             throw new ClientError(
                 `Failed to submit task ${task.id}`,
                 'supercode',
                 error instanceof Error ? error : new Error(String(error))
             );
         }
+        return await completion;
+    }
+
+    /**
+     * Replace the TUI prompt with the task prompt and submit it
+     */
+    private async submitPrompt(task: Task): Promise<void> {
+        // Clear any existing prompt
+        await this.makeRequest('POST', '/tui/clear-prompt', {});
+
+        // Append the new prompt
+        await this.makeRequest('POST', '/tui/append-prompt', {
+            text: task.prompt
+        });
+
+        // Submit the prompt for processing
+        await this.makeRequest('POST', '/tui/submit-prompt', {});
+
+        console.log(`SuperCode task ${task.id} submitted successfully`);
     }
 
     /**
@@ -102,20 +195,200 @@ export class SuperCodeClient implements ITaskClient {
      * Wait for the TUI API to be ready (not busy)
      */
     private async waitForReady(): Promise<void> {
-        let attempts = 0;
-        const maxAttempts = this.timeout / 1000; // Check every second
+        // The first check fails fast (after retries) when the server is unreachable.
+        const status = await this.getStatus();
+        if (!status.busy && status.status === 'ready') {
+            return;
+        }
 
-        while (attempts < maxAttempts) {
-            const status = await this.getStatus();
-            if (!status.busy && status.status === 'ready') {
+        try {
+            await this.waitForStatus(status => !status.busy && status.status === 'ready', this.timeout);
+        } catch {
+            throw new Error(`TUI API not ready after ${this.timeout}ms`);
+        }
+    }
+
+    /**
+     * Resolve with the first status `accept` returns true for.
+     * `accept` is called for every status change, and once more with the latest status after `recheckAfterMs`.
+     */
+    private waitForStatus(
+        accept: (status: TUIStatusResponse) => boolean,
+        timeoutMs: number,
+        options: { recheckAfterMs?: number, signal?: AbortSignal } = {},
+    ): Promise<TUIStatusResponse> {
+        return new Promise((resolve, reject) => {
+            let latest: TUIStatusResponse | undefined;
+            let done = false;
+            const timers: NodeJS.Timeout[] = [];
+            const finish = (settle: () => void) => {
+                if (done) {
+                    return;
+                }
+                done = true;
+                stop();
+                timers.forEach(clearTimeout);
+                options.signal?.removeEventListener('abort', onAbort);
+                settle();
+            };
+            const check = () => {
+                const status = latest;
+                if (status !== undefined && accept(status)) {
+                    finish(() => resolve(status));
+                }
+            };
+            const onAbort = () => finish(() => reject(new Error('Cancelled')));
+
+            const stop = this.watchStatus(status => {
+                latest = status;
+                check();
+            });
+            timers.push(setTimeout(() => finish(() => reject(new Error(`SuperCode status wait timed out after ${timeoutMs}ms`))), timeoutMs));
+            if (options.recheckAfterMs !== undefined) {
+                timers.push(setTimeout(check, options.recheckAfterMs));
+            }
+            options.signal?.addEventListener('abort', onAbort);
+        });
+    }
+
+    /**
+     * Call `listener` with the current status and every change until the returned function is called.
+     * Follows the server's status event stream when it has one, and polls otherwise
+     * (or while a dropped stream is reconnected).
+     */
+    watchStatus(listener: (status: TUIStatusResponse) => void): () => void {
+        let stopped = false;
+        let stream: HttpResponseStream | undefined;
+        let wake: (() => void) | undefined;
+        let lastReported: string | undefined;
+
+        const report = (status: TUIStatusResponse) => {
+            const key = JSON.stringify(status);
+            if (!stopped && key !== lastReported) {
+                lastReported = key;
+                listener(status);
+            }
+        };
+        const pause = (ms: number) => new Promise<void>(resolve => {
+            const timer = setTimeout(resolve, ms);
+            wake = () => {
+                clearTimeout(timer);
+                resolve();
+            };
+        });
+
+        const run = async () => {
+            while (!stopped) {
+                if (this.eventStreamAvailable()) {
+                    const outcome = await this.followStatusEvents(report, opened => { stream = opened; }, () => stopped);
+                    stream = undefined;
+                    if (stopped) {
+                        return;
+                    }
+                    if (outcome === 'ended') {
+                        // Catch up on changes missed while disconnected, then reconnect.
+                        await this.pollStatus(report);
+                        await pause(this.statusOptions.reconnectDelayMs);
+                        continue;
+                    }
+                }
+                await this.pollStatus(report);
+                if (!stopped) {
+                    await pause(this.statusOptions.pollIntervalMs);
+                }
+            }
+        };
+        run().catch(error => console.error('SuperCode status watch failed:', error));
+
+        return () => {
+            stopped = true;
+            stream?.close();
+            wake?.();
+        };
+    }
+
+    private eventStreamAvailable(): boolean {
+        return this.eventStreamUnsupportedUntil === undefined || Date.now() >= this.eventStreamUnsupportedUntil;
+    }
+
+    /**
+     * Read status events until the stream ends or the watch is stopped.
+     * @returns 'unsupported' if the server has no event stream, 'failed' if it could not be reached,
+     * 'ended' after a stream was followed
+     */
+    private async followStatusEvents(
+        report: (status: TUIStatusResponse) => void,
+        onOpen: (stream: HttpResponseStream) => void,
+        isStopped: () => boolean,
+    ): Promise<'unsupported' | 'failed' | 'ended'> {
+        let response: HttpResponseStream;
+        try {
+            response = await httpClient.stream({
+                method: 'GET',
+                url: `${this.baseUrl}${STATUS_EVENTS_PATH}`,
+                headers: { 'Accept': 'text/event-stream' },
+                timeout: this.timeout,
+                // The stream is quiet while a task runs; the request timeout only applies until the headers.
+                idleTimeout: this.statusOptions.eventStreamIdleMs,
+            });
+        } catch {
+            return 'failed';
+        }
+
+        if (!response.ok || !(response.headers['content-type'] ?? '').includes('text/event-stream')) {
+            response.close();
+            this.eventStreamUnsupportedUntil = Date.now() + this.statusOptions.eventStreamRetryMs;
+            return 'unsupported';
+        }
+        this.eventStreamUnsupportedUntil = undefined;
+
+        onOpen(response);
+        const parser = new ServerSentEventParser();
+        let lastActivity = Date.now();
+        const heartbeat = setInterval(async () => {
+            if (Date.now() - lastActivity < this.statusOptions.heartbeatMs) {
                 return;
             }
-            
-            await this.sleep(1000);
-            attempts++;
+            lastActivity = Date.now();
+            // Catches changes the stream missed; a server that does not answer gets a new stream.
+            if (!await this.pollStatus(report)) {
+                response.close();
+            }
+        }, this.statusOptions.heartbeatMs);
+        try {
+            let chunk: Uint8Array | undefined;
+            while (!isStopped() && (chunk = await response.read()) !== undefined) {
+                lastActivity = Date.now();
+                for (const data of parser.push(chunk)) {
+                    try {
+                        report(JSON.parse(data) as TUIStatusResponse);
+                    } catch {
+                        // Ignore events that are not status objects (e.g. keep-alive pings).
+                    }
+                }
+            }
+        } catch {
+            // Connection dropped or timed out
+        } finally {
+            clearInterval(heartbeat);
+            response.close();
         }
+        return 'ended';
+    }
 
-        throw new Error(`TUI API not ready after ${this.timeout}ms`);
+    /** @returns Whether the server answered */
+    private async pollStatus(report: (status: TUIStatusResponse) => void): Promise<boolean> {
+        const result = await httpClient.request({ method: 'GET', url: `${this.baseUrl}/tui/status`, timeout: this.timeout });
+        if (!result.success) {
+            console.warn(`SuperCode status request failed: ${result.error}`);
+            return false;
+        }
+        try {
+            report(JSON.parse(result.response || '{}') as TUIStatusResponse);
+        } catch {
+            console.warn(`SuperCode status response is not JSON: ${result.response}`);
+        }
+        return true;
     }
 
     /**
@@ -134,36 +407,32 @@ export class SuperCodeClient implements ITaskClient {
     }
 
     /**
-     * Make an HTTP request to the TUI API with retry logic
+     * Make an HTTP request to the TUI API with retry logic.
+     * Requests go through the shared keep-alive pool, so status polls reuse one connection.
      */
     private async makeRequest(method: 'GET' | 'POST', path: string, body?: any): Promise<any> {
         let lastError: Error | undefined;
 
         for (let attempt = 0; attempt < this.maxRetries; attempt++) {
             try {
-                const url = `${this.baseUrl}${path}`;
-                const options: RequestInit = {
+                const result = await httpClient.request({
                     method,
+                    url: `${this.baseUrl}${path}`,
                     headers: {
                         'Content-Type': 'application/json',
                     },
-                    signal: AbortSignal.timeout(this.timeout),
-                };
-
-                if (method === 'POST' && body) {
-                    options.body = JSON.stringify(body);
-                }
-
-                const response = await fetch(url, options);
+                    body: method === 'POST' && body ? JSON.stringify(body) : undefined,
+                    timeout: this.timeout,
+                });
 
-                if (!response.ok) {
-                    throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+                if (!result.success) {
+                    throw new Error(result.error);
                 }
 
                 // Handle empty responses (common for POST endpoints)
-                const contentType = response.headers.get('content-type');
+                const contentType = result.headers?.['content-type'];
                 if (contentType && contentType.includes('application/json')) {
-                    return await response.json();
+                    return JSON.parse(result.response || '{}');
                 } else {
                     return {};
                 }
@@ -40,10 +40,26 @@ export const COMMANDS = {
  */
 export const TIMEOUTS = {
     TELEMETRY_INIT: 5000,
-    SHELL_COMMAND: 300_000
+    SHELL_COMMAND: 300_000,
+    SUPERCODE_TASK: 300_000
 } as const;
 
 /**
  * UI repaint schedule timeouts (in milliseconds)
  */
-export const UI_REPAINT_TIMEOUTS = [100, 400, 1000] as const;
\ No newline at end of file
+export const UI_REPAINT_TIMEOUTS = [100, 400, 1000] as const;
+
+/**
+ * File (in the extension's global storage) holding ntfy messages that could not be delivered
+ */
+export const NTFY_SPOOL_FILE = 'ntfy-spool.jsonl';
+
+/**
+ * Directory (in the extension's workspace storage) holding the conversations of finished tasks
+ */
+export const TASK_STORE_DIR = 'task-store';
+
+/**
+ * Directory (in the extension's workspace storage) holding the task queue of the session
+ */
+export const SESSION_DIR = 'session';
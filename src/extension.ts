@@ -1,4 +1,5 @@
 import { compareVersions } from 'compare-versions';
+import * as path from 'path';
 import * as vscode from 'vscode';
 
 import { IClineController, ClineController } from './ai/controller';
@@ -7,11 +8,13 @@ import { AgentWorkbookSerializer } from './notebook/serializer';
 import { PyNotebookController } from './python/controller';
 import { AgentWorkbook } from './agentworkbook';
 import { Task, Tasks } from './tasks/manager';
+import { TaskStore } from './tasks/taskStore';
+import { SessionJournal } from './tasks/sessionJournal';
 import { TemplateManager } from './notebook/templates/templateManager';
 import { ResourceInstaller } from './resources/installer';
 import * as telemetry from './utils/telemetry';
 import { timeout } from './utils/asyncUtils';
-import { EXTENSION_IDS, MIN_ROO_CODE_VERSION, COMMANDS, TIMEOUTS } from './core/constants';
+import { EXTENSION_IDS, MIN_ROO_CODE_VERSION, COMMANDS, TIMEOUTS, TASK_STORE_DIR, SESSION_DIR } from './core/constants';
 import { createNewNotebook } from './notebook/creation';
 import { FlagDiscoveryService } from './utils/flagDiscovery';
 import { FlagCompletionProvider, FlagParameterCompletionProvider } from './utils/flagCompletionProvider';
@@ -31,13 +34,20 @@ export async function activate(context: vscode.ExtensionContext): Promise<AgentW
 
     // Initialize core components
     const clineController = await initializeClineController();
-    const tasks = new Tasks();
+    const storageUri = context.storageUri ?? context.globalStorageUri;
+    const taskStore = new TaskStore(path.join(storageUri.fsPath, TASK_STORE_DIR), {
+        memoryBudgetBytes: vscode.workspace.getConfiguration('agentworkbook.tasks').get<number>('memoryBudgetMB', 256) * 1024 * 1024,
+    });
+    context.subscriptions.push({ dispose: () => taskStore.dispose() });
+    const tasks = new Tasks(taskStore, vscode.workspace.getConfiguration('agentworkbook.tasks').get<number>('priorityAgingMinutes', 10) * 60 * 1000);
+    const sessionJournal = new SessionJournal(tasks, path.join(storageUri.fsPath, SESSION_DIR));
+    context.subscriptions.push({ dispose: () => sessionJournal.dispose() });
 
     // Initialize client factory with RooCode controller
     const clientFactory = ClientFactory.getInstance();
     clientFactory.setRooController(clineController);
 
-    const agentWorkbook = new AgentWorkbook(context, outputChannel, clineController, tasks);
+    const agentWorkbook = new AgentWorkbook(context, outputChannel, clineController, tasks, sessionJournal);
     const notebookController = new PyNotebookController(context, outputChannel, agentWorkbook);
 
     // Register notebook serializer
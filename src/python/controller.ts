@@ -156,6 +156,16 @@ export class PyNotebookController extends EventEmitter implements INotebookContr
             clearInterval(this._cleanupInterval);
         }
 
+        // Let the agentworkbook module drop the listeners it registered with the extension
+        if (this._state.pyodideInstance) {
+            try {
+                this._state.pyodideInstance.runPython(
+                    "import sys\nif 'agentworkbook' in sys.modules:\n    sys.modules['agentworkbook']._teardown()");
+            } catch (error) {
+                this.outputChannel.appendLine(`Error tearing down the agentworkbook module: ${error}`);
+            }
+        }
+
         // Cleanup Pyodide instance
         if (this._state.pyodideInstance && this._config.resources.enableGarbageCollection) {
             try {
@@ -485,6 +495,7 @@ export class PyNotebookController extends EventEmitter implements INotebookContr
         if (result instanceof AgentWorkbookStatus) {
             const data: RendererInitializationData = { 
                 tasks: result.tasks, 
+                version: result.version,
                 workerActive: result.workerActive 
             };
             const outputItem = vscode.NotebookCellOutputItem.json(data, result.mime_type);
@@ -31,7 +31,7 @@ export const activate: ActivationFunction = (context: RendererContext<void>) =>
             throw new Error('Could not find root element');
         }
 
-        ReactDOM.createRoot(root).render(<TaskList tasks={initializationData.tasks} workerActive={initializationData.workerActive} context={context} />);
+        ReactDOM.createRoot(root).render(<TaskList tasks={initializationData.tasks} version={initializationData.version ?? 0} workerActive={initializationData.workerActive} context={context} />);
     },
 
     disposeOutputItem(id: string) {
@@ -1,4 +1,5 @@
 import { TaskStatus, TaskClient } from "../tasks/manager";
+import type { RendererTaskDelta } from "./taskDelta";
 
 export interface RendererTask {
     id: string;
@@ -12,6 +13,8 @@ export interface RendererTask {
 
 export interface RendererInitializationData {
     tasks: RendererTask[];
+    /** Version of the task list, which later deltas build on */
+    version: number;
     workerActive: boolean;
 }
 
@@ -20,6 +23,9 @@ export type MessageFromRenderer = {
     taskIds: string[],
 } | {
     type: 'pauseWorker' | 'resumeWorker'
+} | {
+    // The renderer missed a delta and needs the whole task list
+    type: 'requestSnapshot'
 } | {
     type: 'moveSelectedTasks',
     selectedTasks: string[],
@@ -29,6 +35,11 @@ export type MessageFromRenderer = {
 
 export type MessageToRenderer = {
     type: 'statusUpdated',
+    delta: RendererTaskDelta,
+    workerActive: boolean,
+} | {
+    type: 'statusSnapshot',
     tasks: RendererTask[],
+    version: number,
     workerActive: boolean,
 };
@@ -0,0 +1,153 @@
+import type { RendererTask } from './interface';
+
+/**
+ * Changes of the task list from one version to the next.
+ */
+export interface RendererTaskDelta {
+    /** Version the changes apply to */
+    baseVersion: number;
+    version: number;
+    removed: string[];
+    /** New tasks, with their index in the new list */
+    added: { task: RendererTask, index: number }[];
+    /** Tasks whose fields changed */
+    changed: RendererTask[];
+    /** Tasks that moved, with their index in the new list */
+    moved: { id: string, index: number }[];
+}
+
+export function isEmptyDelta(delta: RendererTaskDelta): boolean {
+    return delta.removed.length === 0 && delta.added.length === 0 && delta.changed.length === 0 && delta.moved.length === 0;
+}
+
+/**
+ * Keeps the task list as last sent to the renderers, and what changed since.
+ *
+ * Versions start at the creation time, so an output saved by an earlier session
+ * never looks current to a new one.
+ */
+export class RendererTaskPublisher {
+    private published: RendererTask[] = [];
+
+    constructor(private version: number = Date.now()) {}
+
+    /** Publishes the tasks. Returns the changes; when there are none, the version stays the same. */
+    publish(tasks: RendererTask[]): RendererTaskDelta {
+        const delta = diffRendererTasks(this.published, tasks, this.version);
+        if (!isEmptyDelta(delta)) {
+            this.version = delta.version;
+            this.published = tasks;
+        } else {
+            delta.version = this.version;
+        }
+        return delta;
+    }
+
+    /** The published tasks, for renderers that are out of step */
+    snapshot(): { version: number, tasks: RendererTask[] } {
+        return { version: this.version, tasks: this.published };
+    }
+}
+
+/**
+ * The changes from `previous` to `current`. Tasks that kept their relative order do not count
+ * as moved, so inserting, removing or moving a few tasks sends only those.
+ */
+export function diffRendererTasks(previous: RendererTask[], current: RendererTask[], baseVersion: number): RendererTaskDelta {
+    const previousIndex = new Map<string, number>();
+    previous.forEach((task, i) => previousIndex.set(task.id, i));
+    const currentIds = new Set(current.map(task => task.id));
+
+    const delta: RendererTaskDelta = { baseVersion, version: baseVersion + 1, removed: [], added: [], changed: [], moved: [] };
+    for (const task of previous) {
+        if (!currentIds.has(task.id)) {
+            delta.removed.push(task.id);
+        }
+    }
+
+    // Kept tasks, in their new order, with their old positions
+    const kept: number[] = [];
+    const keptOldPositions: number[] = [];
+    current.forEach((task, index) => {
+        const old = previousIndex.get(task.id);
+        if (old === undefined) {
+            delta.added.push({ task, index });
+            return;
+        }
+        if (!sameRendererTask(previous[old], task)) {
+            delta.changed.push(task);
+        }
+        kept.push(index);
+        keptOldPositions.push(old);
+    });
+
+    const staying = longestIncreasingSubsequence(keptOldPositions);
+    kept.forEach((index, i) => {
+        if (!staying.has(i)) {
+            delta.moved.push({ id: current[index].id, index });
+        }
+    });
+    return delta;
+}
+
+/** Applies a delta to the task list it was computed from, in O(n). */
+export function applyRendererTaskDelta(tasks: RendererTask[], delta: RendererTaskDelta): RendererTask[] {
+    const removed = new Set(delta.removed);
+    const changed = new Map(delta.changed.map(task => [task.id, task]));
+    const byId = new Map(tasks.map(task => [task.id, task]));
+
+    const placed = new Map<number, RendererTask>();
+    for (const { task, index } of delta.added) {
+        placed.set(index, task);
+    }
+    for (const { id, index } of delta.moved) {
+        placed.set(index, changed.get(id) ?? byId.get(id)!);
+    }
+    const moved = new Set(delta.moved.map(move => move.id));
+
+    const staying = tasks.filter(task => !removed.has(task.id) && !moved.has(task.id));
+    const result: RendererTask[] = new Array(staying.length + placed.size);
+    let next = 0;
+    for (let i = 0; i < result.length; i++) {
+        const task = placed.get(i) ?? staying[next++];
+        result[i] = changed.get(task.id) ?? task;
+    }
+    return result;
+}
+
+function sameRendererTask(a: RendererTask, b: RendererTask): boolean {
+    return a.status === b.status
+        && a.archived === b.archived
+        && a.prompt === b.prompt
+        && a.mode === b.mode
+        && a.client === b.client
+        && a.summary.length === b.summary.length
+        && a.summary.every((part, i) => b.summary[i] === part);
+}
+
+/** Indices of a longest strictly increasing subsequence, in O(n log n) */
+function longestIncreasingSubsequence(values: number[]): Set<number> {
+    // tails[k]: index of the smallest last value of an increasing subsequence of length k + 1
+    const tails: number[] = [];
+    const predecessors: number[] = new Array(values.length);
+    values.forEach((value, i) => {
+        let low = 0;
+        let high = tails.length;
+        while (low < high) {
+            const middle = (low + high) >> 1;
+            if (values[tails[middle]] < value) {
+                low = middle + 1;
+            } else {
+                high = middle;
+            }
+        }
+        predecessors[i] = low > 0 ? tails[low - 1] : -1;
+        tails[low] = i;
+    });
+
+    const indices = new Set<number>();
+    for (let i = tails.length > 0 ? tails[tails.length - 1] : -1; i !== -1; i = predecessors[i]) {
+        indices.add(i);
+    }
+    return indices;
+}
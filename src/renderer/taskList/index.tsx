@@ -1,21 +1,52 @@
 import '../css.d.ts';  // ts langserver needs this, not needed to compile without errors
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useLayoutEffect, useRef } from 'react';
 import { RendererTask, MessageFromRenderer, MessageToRenderer } from '../interface';
+import { applyRendererTaskDelta } from '../taskDelta';
 import { useSelectionState, SelectionState } from '../selectionState';
 import { RendererContext } from 'vscode-notebook-renderer';
 import style from '../task/style.css';
 import Task from '../task';
+import { TileSize, Viewport, virtualWindow } from './virtualWindow';
 
+/** Longer lists scroll in a box of their own and only the visible tasks are rendered */
+const VIRTUALIZE_ABOVE = 200;
+/** Size of a task with its wrapper, until one is measured */
+const ESTIMATED_TILE_SIZE: TileSize = { width: 200, height: 104 };
+/** A snapshot that has not arrived by then (the reply was lost) is asked for again */
+const SNAPSHOT_RETRY_MS = 2000;
 
-export default function TaskList({tasks: initialTasks, workerActive: initialWorkerActive, context}: {tasks: RendererTask[], workerActive: boolean, context: RendererContext<void>}) {
+
+export default function TaskList({tasks: initialTasks, version: initialVersion, workerActive: initialWorkerActive, context}: {tasks: RendererTask[], version: number, workerActive: boolean, context: RendererContext<void>}) {
     let [tasks, setTasks] = useState<RendererTask[]>(initialTasks);
     let [workerActive, setWorkerActive] = useState<boolean>(initialWorkerActive);
+    const version = useRef(initialVersion);
+    /** When the whole list was last asked for, until it arrives */
+    const snapshotRequestedAt = useRef<number | undefined>(undefined);
 
     let selectionState = useSelectionState();
 
     useEffect(() => {
         const disposable = context.onDidReceiveMessage?.((event: MessageToRenderer) => {
             if (event.type === 'statusUpdated') {
+                setWorkerActive(event.workerActive);
+                const delta = event.delta;
+                if (delta.version === version.current) {
+                    return;
+                }
+                if (delta.baseVersion !== version.current) {
+                    // Missed a change (or rendered from a saved output): get the whole list.
+                    const requestedAt = snapshotRequestedAt.current;
+                    if (requestedAt === undefined || Date.now() - requestedAt >= SNAPSHOT_RETRY_MS) {
+                        snapshotRequestedAt.current = Date.now();
+                        context.postMessage?.({ type: 'requestSnapshot' } as MessageFromRenderer);
+                    }
+                    return;
+                }
+                version.current = delta.version;
+                setTasks(tasks => applyRendererTaskDelta(tasks, delta));
+            } else if (event.type === 'statusSnapshot') {
+                snapshotRequestedAt.current = undefined;
+                version.current = event.version;
                 setTasks(event.tasks);
                 setWorkerActive(event.workerActive);
             }
@@ -23,6 +54,40 @@ export default function TaskList({tasks: initialTasks, workerActive: initialWork
         return () => disposable?.dispose();
     }, [context]);
 
+    const virtualized = tasks.length > VIRTUALIZE_ABOVE;
+    const container = useRef<HTMLDivElement>(null);
+    const [viewport, setViewport] = useState<Viewport>({ width: 0, height: 0, scrollTop: 0 });
+    const [tile, setTile] = useState<TileSize>(ESTIMATED_TILE_SIZE);
+
+    useLayoutEffect(() => {
+        const element = container.current;
+        if (!virtualized || !element) {
+            return;
+        }
+        const measure = () => setViewport({ width: element.clientWidth, height: element.clientHeight, scrollTop: element.scrollTop });
+        measure();
+        const observer = new ResizeObserver(measure);
+        observer.observe(element);
+        return () => observer.disconnect();
+    }, [virtualized]);
+
+    useLayoutEffect(() => {
+        const wrapper = container.current?.querySelector<HTMLElement>('.task-wrapper');
+        if (!virtualized || !wrapper || wrapper.offsetWidth === 0) {
+            return;
+        }
+        // Wrappers overlap by their negative margins.
+        const margins = getComputedStyle(wrapper);
+        const width = wrapper.offsetWidth + parseFloat(margins.marginLeft) + parseFloat(margins.marginRight);
+        if (width !== tile.width || wrapper.offsetHeight !== tile.height) {
+            setTile({ width, height: wrapper.offsetHeight });
+        }
+    });
+
+    const visible = virtualized
+        ? virtualWindow(tasks.length, tile, viewport)
+        : { start: 0, end: tasks.length, paddingTop: 0, paddingBottom: 0 };
+
     let pauseResumeButton: React.ReactNode;
     if (workerActive) {
         pauseResumeButton = <button onClick={() => {
@@ -41,8 +106,17 @@ export default function TaskList({tasks: initialTasks, workerActive: initialWork
     return <div>
         <style>{style}</style>
         <div>{pauseResumeButton}</div>
-        <div className="tasks-container" onMouseUp={evt => handleOutsideClick(evt, selectionState)}>
-            {tasks.map(task =>
+        <div
+            className={virtualized ? 'tasks-container virtualized' : 'tasks-container'}
+            ref={container}
+            onScroll={virtualized ? evt => {
+                const element = evt.currentTarget;
+                setViewport({ width: element.clientWidth, height: element.clientHeight, scrollTop: element.scrollTop });
+            } : undefined}
+            onMouseUp={evt => handleOutsideClick(evt, selectionState)}
+        >
+            {visible.paddingTop > 0 && <div className="tasks-spacer" style={{ height: visible.paddingTop }} />}
+            {tasks.slice(visible.start, visible.end).map(task =>
                 <Task
                     key={task.id}
                     task={task}
@@ -51,6 +125,7 @@ export default function TaskList({tasks: initialTasks, workerActive: initialWork
                     tasks={tasks}
                 />
             )}
+            {visible.paddingBottom > 0 && <div className="tasks-spacer" style={{ height: visible.paddingBottom }} />}
         </div>
     </div>;
 }
@@ -67,7 +142,7 @@ function handleOutsideClick(evt: React.MouseEvent<HTMLElement>, selectionState:
     // https://stackoverflow.com/questions/51847595/why-does-clicking-and-dragging-cause-the-parent-element-to-be-the-event-target#comment90649011_51847665
 
     const target = evt.target as HTMLElement;
-    if (target.classList.contains('task-wrapper') || target.classList.contains('tasks-container')) {
+    if (target.classList.contains('task-wrapper') || target.classList.contains('tasks-container') || target.classList.contains('tasks-spacer')) {
         selectionState.setSelectedTasks(new Set([]));
     }
 };
\ No newline at end of file
@@ -0,0 +1,40 @@
+export interface TileSize {
+    width: number;
+    height: number;
+}
+
+export interface Viewport {
+    width: number;
+    height: number;
+    scrollTop: number;
+}
+
+/**
+ * The tiles to render: `start` to `end` (exclusive), with the space taken by the rows
+ * above and below them.
+ */
+export interface VirtualWindow {
+    start: number;
+    end: number;
+    paddingTop: number;
+    paddingBottom: number;
+}
+
+/**
+ * Which of `count` tiles, laid out in rows that wrap at the viewport width, are visible
+ * (plus `overscanRows` rows above and below, so scrolling does not show gaps).
+ */
+export function virtualWindow(count: number, tile: TileSize, viewport: Viewport, overscanRows: number = 2): VirtualWindow {
+    const columns = Math.max(1, Math.floor(viewport.width / tile.width));
+    const rows = Math.ceil(count / columns);
+    // The list may have shrunk since the scroll position was taken.
+    const scrollTop = Math.max(0, Math.min(viewport.scrollTop, rows * tile.height - viewport.height));
+    const firstRow = Math.max(0, Math.floor(scrollTop / tile.height) - overscanRows);
+    const lastRow = Math.min(rows, Math.ceil((scrollTop + viewport.height) / tile.height) + overscanRows);
+    return {
+        start: firstRow * columns,
+        end: Math.min(count, lastRow * columns),
+        paddingTop: firstRow * tile.height,
+        paddingBottom: (rows - lastRow) * tile.height,
+    };
+}
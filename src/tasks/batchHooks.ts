@@ -0,0 +1,142 @@
+import { FINISHED_TASK_STATUSES, Task, TaskStatus, Tasks } from './manager';
+
+/**
+ * What the batch hooks get to know about the tasks created together.
+ */
+export interface BatchStats {
+    tasks: number;
+    /** Tasks in each status */
+    counts: Partial<Record<TaskStatus, number>>;
+    /** Tasks deleted meanwhile, not counted above */
+    deleted: number;
+    /** Tasks cancelled before they ran, back in 'prepared' (and counted there above) */
+    cancelled: number;
+    /** Seconds from the first start to the last finish */
+    duration: number;
+    /** Seconds the finished tasks ran, added up */
+    taskDuration: number;
+}
+
+export interface BatchCallbacks {
+    /** When the first task starts (or finishes without running) */
+    onStart?: (stats: BatchStats) => void;
+    /** When all tasks have finished, or were cancelled before they ran */
+    onComplete?: (stats: BatchStats) => void;
+}
+
+const NOT_STARTED: TaskStatus[] = ['prepared', 'queued'];
+
+/**
+ * Follows the tasks created by one call, to tell once when the first of them starts and once
+ * when all of them have finished. Stops following them after that.
+ */
+export class BatchTracker {
+    private readonly members: Set<Task>;
+    private readonly unfinished: Set<Task>;
+    private readonly cancelled = new Set<Task>();
+    private deleted = 0;
+    started = false;
+    completed = false;
+    private checkScheduled = false;
+
+    constructor(private readonly tasks: Tasks, members: Task[], private readonly callbacks: BatchCallbacks) {
+        this.members = new Set(members);
+        this.unfinished = new Set(members.filter(task => !FINISHED_TASK_STATUSES.includes(task.status)));
+        tasks.on('status', this.onStatus);
+        tasks.on('remove', this.onRemove);
+        if (this.unfinished.size === 0) {
+            this.scheduleCheck();
+        }
+    }
+
+    stats(): BatchStats {
+        const counts: Partial<Record<TaskStatus, number>> = {};
+        let firstStart = Infinity;
+        let lastFinish = -Infinity;
+        let taskDuration = 0;
+        for (const task of this.members) {
+            counts[task.status] = (counts[task.status] ?? 0) + 1;
+            if (task.startedAt !== undefined) {
+                firstStart = Math.min(firstStart, task.startedAt);
+            }
+            if (FINISHED_TASK_STATUSES.includes(task.status) && task.finishedAt !== undefined) {
+                lastFinish = Math.max(lastFinish, task.finishedAt);
+                if (task.startedAt !== undefined && task.finishedAt >= task.startedAt) {
+                    taskDuration += task.finishedAt - task.startedAt;
+                }
+            }
+        }
+        return {
+            tasks: this.members.size,
+            counts,
+            deleted: this.deleted,
+            cancelled: this.cancelled.size,
+            duration: lastFinish >= firstStart ? (lastFinish - firstStart) / 1000 : 0,
+            taskDuration: taskDuration / 1000,
+        };
+    }
+
+    dispose() {
+        this.tasks.off('status', this.onStatus);
+        this.tasks.off('remove', this.onRemove);
+    }
+
+    private readonly onStatus = (task: Task, previousStatus: TaskStatus) => {
+        if (!this.members.has(task)) {
+            return;
+        }
+        // A queued task that is cancelled goes back to 'prepared', and would never finish.
+        const cancelled = task.status === 'prepared' && previousStatus === 'queued';
+        if (cancelled) {
+            this.cancelled.add(task);
+        } else {
+            this.cancelled.delete(task);
+        }
+        if (cancelled || FINISHED_TASK_STATUSES.includes(task.status)) {
+            this.unfinished.delete(task);
+        } else {
+            this.unfinished.add(task);
+        }
+        if (!this.started && !NOT_STARTED.includes(task.status)) {
+            this.start();
+        }
+        this.scheduleCheck();
+    };
+
+    private readonly onRemove = (task: Task) => {
+        if (this.members.delete(task)) {
+            this.deleted++;
+            this.unfinished.delete(task);
+            this.cancelled.delete(task);
+            this.scheduleCheck();
+        }
+    };
+
+    private start() {
+        this.started = true;
+        this.callbacks.onStart?.(this.stats());
+    }
+
+    /**
+     * Completion is checked once the current change is done: a failed task that is retried
+     * goes on from 'error' to 'queued' within it.
+     */
+    private scheduleCheck() {
+        if (this.checkScheduled) {
+            return;
+        }
+        this.checkScheduled = true;
+        queueMicrotask(() => {
+            this.checkScheduled = false;
+            if (this.completed || this.unfinished.size > 0) {
+                return;
+            }
+            this.completed = true;
+            this.dispose();
+            if (!this.started && this.members.size > 0) {
+                this.start();
+            }
+            this.callbacks.onComplete?.(this.stats());
+        });
+    }
+}
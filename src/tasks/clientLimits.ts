@@ -0,0 +1,83 @@
+import { TokenBucket } from '../utils/rateLimit';
+import { TaskClient } from './manager';
+
+export interface ClientRateLimit {
+    /** Tasks started per minute */
+    perMinute?: number;
+    /** Tasks that may start at once after an idle period (defaults to 1) */
+    burst?: number;
+    /** Tasks that may still be started; counts down with each one */
+    budget?: number;
+}
+
+export interface ClientLimitStatus extends ClientRateLimit {
+    /** Tasks started since the limit was set */
+    started: number;
+    /** Milliseconds until the next task may start (Infinity when the budget is spent) */
+    waitMs: number;
+}
+
+interface ClientState {
+    limit: ClientRateLimit;
+    bucket?: TokenBucket;
+    started: number;
+}
+
+/**
+ * Per-client limits on how fast the worker starts tasks.
+ *
+ * Each client has an optional token bucket (`perMinute`, `burst`) and an optional budget of
+ * tasks. Clients without limits are never held back.
+ */
+export class ClientLimits {
+    private readonly clients = new Map<TaskClient, ClientState>();
+
+    constructor(private readonly now: () => number = Date.now) {}
+
+    /** Sets the limits of a client; without any, removes them. */
+    configure(client: TaskClient, limit: ClientRateLimit) {
+        if (limit.perMinute === undefined && limit.budget === undefined) {
+            this.clients.delete(client);
+            return;
+        }
+        const burst = limit.burst ?? 1;
+        this.clients.set(client, {
+            limit: { ...limit, burst },
+            bucket: limit.perMinute !== undefined ? new TokenBucket(limit.perMinute, burst, this.now) : undefined,
+            started: 0,
+        });
+    }
+
+    /** Milliseconds until the client may start a task (0 if it may now). */
+    msUntilAvailable(client: TaskClient): number {
+        const state = this.clients.get(client);
+        if (state === undefined) {
+            return 0;
+        }
+        if (state.limit.budget !== undefined && state.started >= state.limit.budget) {
+            return Infinity;
+        }
+        return state.bucket?.msUntilAvailable() ?? 0;
+    }
+
+    canStart(client: TaskClient): boolean {
+        return this.msUntilAvailable(client) === 0;
+    }
+
+    /** Counts a task started for the client. */
+    started(client: TaskClient) {
+        const state = this.clients.get(client);
+        if (state !== undefined) {
+            state.bucket?.tryTake();
+            state.started++;
+        }
+    }
+
+    status(): Partial<Record<TaskClient, ClientLimitStatus>> {
+        const status: Partial<Record<TaskClient, ClientLimitStatus>> = {};
+        for (const [client, state] of this.clients) {
+            status[client] = { ...state.limit, started: state.started, waitMs: this.msUntilAvailable(client) };
+        }
+        return status;
+    }
+}
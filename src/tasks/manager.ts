@@ -2,12 +2,17 @@ import EventEmitter from 'events';
 import { v4 as uuidv4 } from 'uuid';
 import * as vscode from 'vscode';
 import { Message, MessagesTx } from '../ai/controller';
-import { Hooks, HookKind, HookRun } from '../utils/hooks';
+import { Hooks, HookFunction, HookKind, HookProxyRegistry, HookRun, executeHook } from '../utils/hooks';
 import { PromptSummarizer } from '../utils/promptSummarizer';
 import { RendererTask } from '../renderer/interface';
 import { AgentWorkbook } from '../agentworkbook';
 import * as telemetry from '../utils/telemetry';
 import { TaskLifecycle } from './worker';
+import { PriorityQueue } from '../utils/priorityQueue';
+import { backoffDelay } from '../utils/rateLimit';
+import { RecordLocation, TaskPayload, TaskStore } from './taskStore';
+import { ResultCache } from './resultCache';
+import { TaskPage, TaskPageOptions, TaskQuery, taskQueryPredicate } from './taskQuery';
 
 export type TaskStatus =
     | 'prepared' | 'queued' | 'running'
@@ -21,8 +26,84 @@ export const ALL_TASK_STATUSES: TaskStatus[] = [
     'prepared', 'queued', 'running', 'completed', 'asking', 'aborted', 'error'
 ];
 
+/**
+ * Statuses after which a task's conversation is not expected to grow (until it is resubmitted)
+ */
+export const FINISHED_TASK_STATUSES: TaskStatus[] = ['completed', 'aborted', 'error'];
+
+/**
+ * Statuses of tasks that did not complete successfully
+ */
+const FAILED_TASK_STATUSES: TaskStatus[] = ['aborted', 'error'];
+
+/**
+ * What happens to a queued task when a task it depends on fails (or is skipped):
+ * it is aborted, skipped (taken out of the queue), or run anyway once the dependency has finished.
+ */
+export type DependencyFailurePolicy = 'abort' | 'skip' | 'run';
+
+export const DEPENDENCY_FAILURE_POLICIES: DependencyFailurePolicy[] = ['abort', 'skip', 'run'];
+
+/**
+ * When a task that ended with a retryable status is queued again by itself
+ */
+export interface RetryPolicy {
+    /** Attempts in total, the first one included */
+    maxAttempts: number;
+    /** Delay before the first retry; doubled for each further one, with jitter */
+    baseDelayMs: number;
+    maxDelayMs: number;
+    /** Statuses that are retried. Note that cancelling a running task ends it as 'aborted'. */
+    retryOn: TaskStatus[];
+}
+
+export const DEFAULT_RETRY_POLICY: RetryPolicy = {
+    maxAttempts: 3,
+    baseDelayMs: 30_000,
+    maxDelayMs: 15 * 60 * 1000,
+    retryOn: ['error'],
+};
+
+export const RETRYABLE_TASK_STATUSES: TaskStatus[] = ['error', 'aborted'];
+
 export type TaskClient = 'roo' | 'copilot' | 'supercode';
 
+/**
+ * What is kept of a task across reloads. Hooks are Python callables and cannot be kept.
+ */
+export interface TaskRecord {
+    id: string;
+    prompt: string;
+    mode: string;
+    client: TaskClient;
+    supercodeUrl?: string;
+    status: TaskStatus;
+    archived: boolean;
+    previousAttempts: TaskStatus[];
+    summary?: string[];
+    priority?: number;
+    retryPolicy?: RetryPolicy;
+    retries?: number;
+    notBefore?: number;
+    dependsOn?: string[];
+    onDependencyFailure?: DependencyFailurePolicy;
+    dependencyFailure?: string;
+    cacheKey?: string;
+    fromCache?: boolean;
+    createdAt?: number;
+    startedAt?: number;
+    finishedAt?: number;
+    /** Where the task store keeps the conversation and hook runs */
+    payload?: RecordLocation;
+}
+
+const SUMMARIZER_SEED_CHUNK = 500;
+
+/**
+ * Queued tasks gain one priority level per this many milliseconds of waiting
+ */
+export const DEFAULT_PRIORITY_AGING_MS = 10 * 60 * 1000;
+
 export class Task {
     readonly id: string;
     prompt: string;
@@ -34,20 +115,50 @@ export class Task {
     private _archived: boolean = false;
 
     previousAttempts: TaskStatus[] = [];
-    conversation: Message[] = [];
-    hookRuns: HookRun[] = [];
+
+    /** Queued tasks with a higher priority run first (changed with Tasks.reprioritize) */
+    priority: number = 0;
+
+    retryPolicy?: RetryPolicy;
+    /** Times the task was queued again by its retry policy since it was last submitted */
+    retries: number = 0;
+    /** A retried task waits in the queue until this time */
+    notBefore?: number;
+
+    /** Ids of the tasks that have to complete before this one runs */
+    dependsOn: string[] = [];
+    onDependencyFailure: DependencyFailurePolicy = 'abort';
+    /** The failed or skipped dependency this task was aborted or skipped for */
+    dependencyFailure?: string;
+
+    /** Key of the result cache; set for tasks created with caching on */
+    cacheKey?: string;
+    /** Whether the task was completed with a cached result instead of running */
+    fromCache: boolean = false;
+
+    /** When the task was created, last started running and last finished (ms since the epoch) */
+    createdAt: number = Date.now();
+    startedAt?: number;
+    finishedAt?: number;
+
+    /** Conversation and hook runs; undefined while evicted to the task store */
+    residentPayload: TaskPayload | undefined = { conversation: [], hookRuns: [] };
 
     // Data for renderer (managed by Tasks class)
     summary?: string[];
 
+    // Store for the payload of finished tasks, and the tasks this one belongs to (managed by Tasks class)
+    store?: TaskStore;
+    tasks?: Tasks;
+
     // Data for worker (managed by Worker class and appropriate ClineController class)
     clineId?: string;
     tx?: MessagesTx;
     taskLifecycle?: TaskLifecycle;
     
 
-    constructor(prompt: string, mode: string, hooks?: Hooks, client: TaskClient = 'roo', supercodeUrl?: string) {
-        this.id = uuidv4().slice(0, 5);
+    constructor(prompt: string, mode: string, hooks?: Hooks, client: TaskClient = 'roo', supercodeUrl?: string, id: string = uuidv4().slice(0, 5)) {
+        this.id = id;
         this.prompt = prompt;
         this.mode = mode;
         this.client = client;
@@ -55,6 +166,82 @@ export class Task {
         this.supercodeUrl = supercodeUrl;
     }
 
+    /**
+     * Recreates a task of a previous session, without emitting updates. Its payload
+     * (if any) stays in the task store until accessed.
+     */
+    static fromRecord(record: TaskRecord): Task {
+        const task = new Task(record.prompt, record.mode, undefined, record.client, record.supercodeUrl, record.id);
+        task._status = record.status;
+        task._archived = record.archived;
+        task.previousAttempts = [...record.previousAttempts];
+        task.summary = record.summary;
+        task.priority = record.priority ?? 0;
+        task.retryPolicy = record.retryPolicy;
+        task.retries = record.retries ?? 0;
+        task.notBefore = record.notBefore;
+        task.dependsOn = [...record.dependsOn ?? []];
+        task.onDependencyFailure = record.onDependencyFailure ?? 'abort';
+        task.dependencyFailure = record.dependencyFailure;
+        task.cacheKey = record.cacheKey;
+        task.fromCache = record.fromCache ?? false;
+        task.createdAt = record.createdAt ?? task.createdAt;
+        task.startedAt = record.startedAt;
+        task.finishedAt = record.finishedAt;
+        if (record.payload !== undefined) {
+            task.residentPayload = undefined;
+        }
+        return task;
+    }
+
+    toRecord(): TaskRecord {
+        return {
+            id: this.id,
+            prompt: this.prompt,
+            mode: this.mode,
+            client: this.client,
+            supercodeUrl: this.supercodeUrl,
+            status: this._status,
+            archived: this._archived,
+            previousAttempts: [...this.previousAttempts],
+            summary: this.summary,
+            priority: this.priority !== 0 ? this.priority : undefined,
+            retryPolicy: this.retryPolicy,
+            retries: this.retries !== 0 ? this.retries : undefined,
+            notBefore: this.notBefore,
+            dependsOn: this.dependsOn.length > 0 ? [...this.dependsOn] : undefined,
+            onDependencyFailure: this.dependsOn.length > 0 ? this.onDependencyFailure : undefined,
+            dependencyFailure: this.dependencyFailure,
+            cacheKey: this.cacheKey,
+            fromCache: this.fromCache || undefined,
+            createdAt: this.createdAt,
+            startedAt: this.startedAt,
+            finishedAt: this.finishedAt,
+            payload: this.store?.location(this.id),
+        };
+    }
+
+    get conversation(): Message[] {
+        return this.payload.conversation;
+    }
+
+    set conversation(value: Message[]) {
+        this.payload.conversation = value;
+    }
+
+    get hookRuns(): HookRun[] {
+        return this.payload.hookRuns;
+    }
+
+    set hookRuns(value: HookRun[]) {
+        this.payload.hookRuns = value;
+    }
+
+    /** The payload, read back from the task store if it was evicted */
+    private get payload(): TaskPayload {
+        return this.residentPayload ?? this.store!.load(this);
+    }
+
     get status(): TaskStatus {
         return this._status;
     }
@@ -63,8 +250,17 @@ export class Task {
         if (this._status !== value) {
             const previousStatus = this._status;
             this._status = value;
+            if (value === 'running') {
+                this.startedAt = Date.now();
+                this.finishedAt = undefined;
+            } else if (FINISHED_TASK_STATUSES.includes(value) && (previousStatus === 'running' || this.finishedAt === undefined)) {
+                // A cancelled task going back to its previous status keeps that attempt's time.
+                this.finishedAt = Date.now();
+            }
             telemetry.tasksStatusChange(previousStatus, value);
-            AgentWorkbook.get().tasks.emit('update');
+            this.updateResidency();
+            this.owner.taskStatusChanged(this, previousStatus);
+            this.owner.changed();
         }
     }
 
@@ -80,14 +276,40 @@ export class Task {
             } else {
                 telemetry.tasksUnarchive(this.status);
             }
-            AgentWorkbook.get().tasks.emit('update');
+            this.updateResidency();
+            this.owner.taskArchivedChanged(this);
+            this.owner.taskChanged(this);
+        }
+    }
+
+    private get owner(): Tasks {
+        return this.tasks ?? AgentWorkbook.get().tasks;
+    }
+
+    /**
+     * Finished and archived tasks let the store move their payload to disk;
+     * active tasks keep it in memory.
+     */
+    private updateResidency() {
+        if (this.store === undefined) {
+            return;
+        }
+        if (this._archived || FINISHED_TASK_STATUSES.includes(this._status)) {
+            this.store.release(this);
+        } else {
+            this.store.retain(this);
         }
     }
 
     submit(verbose: boolean = true) {
         switch (this.status) {
             case 'prepared':
-                this.status = 'queued';
+                this.dependencyFailure = undefined;
+                this.retries = 0;
+                this.notBefore = undefined;
+                if (!this.owner.completeFromCache(this)) {
+                    this.status = 'queued';
+                }
                 break;
             case 'queued':
                 if (verbose) {
@@ -104,6 +326,10 @@ export class Task {
             case 'aborted':
             case 'error': 
                 // resubmit task
+                this.dependencyFailure = undefined;
+                this.retries = 0;
+                this.notBefore = undefined;
+                this.fromCache = false;
                 this.previousAttempts.unshift(this.status);
                 this.status = 'queued';
                 break;
@@ -118,6 +344,7 @@ export class Task {
                 }
                 break;
             case 'queued':
+                this.notBefore = undefined;
                 this.status = this.previousAttempts.shift() ?? 'prepared';
                 break;
             case 'running':
@@ -184,71 +411,292 @@ export class Task {
         return JSON.stringify(this.conversation);
     }
 
+    /**
+     * Text of the final answer: the last completion result, or the last text said if the task
+     * did not get to one.
+     */
+    result(): string | undefined {
+        const conversation = this.conversation;
+        let lastText: string | undefined;
+        for (let i = conversation.length - 1; i >= 0; i--) {
+            const message = conversation[i];
+            if (message.type !== 'say' || message.text === undefined) {
+                continue;
+            }
+            if (message.say === 'completion_result') {
+                return message.text;
+            }
+            if (message.say === 'text' && lastText === undefined) {
+                lastText = message.text;
+            }
+        }
+        return lastText;
+    }
+
+    /** The last message with text */
+    lastMessage(): Message | undefined {
+        const conversation = this.conversation;
+        for (let i = conversation.length - 1; i >= 0; i--) {
+            const message = conversation[i];
+            if ((message.type === 'say' || message.type === 'ask') && message.text) {
+                return message;
+            }
+        }
+        return undefined;
+    }
+
+    messageCount(): number {
+        return this.conversation.length;
+    }
+
+    /** The messages from `start` up to, not including, `end`, without copying the others */
+    messages(start: number = 0, end?: number): Message[] {
+        return this.conversation.slice(start, end);
+    }
+
     hookRunsAsJson(): string {
         return JSON.stringify(this.hookRuns);
     }
 
+    /**
+     * Runs the task's hook of this kind, or the global one. A non-blocking hook is only started:
+     * its run is added to the hook runs once it has finished, and its failure does not fail the task.
+     */
     async runHook(hook: HookKind): Promise<HookRun> {
         const awb = AgentWorkbook.get();
-        if (awb.currentHookRun !== undefined) {
-            throw new Error('Running hook when the previous one has not finished yet');
-        }
-
         telemetry.hooksPyStart(hook);
 
-        const hookFunc = this.hooks?.[hook] ?? awb.globalHooks[hook];
-        if (hookFunc === undefined) {
-            const run = new HookRun(hook);
-            this.hookRuns.push(run);
-            return run;
-        }
-        
+        const hooks = this.hooks !== undefined && this.hooks[hook] !== undefined ? this.hooks : awb.globalHooks;
+        const hookFunc = hooks[hook];
         const hookRun = new HookRun(hook);
-        this.hookRuns.push(hookRun);
-        awb.currentHookRun = hookRun;
-        let command: string | undefined | null = null;
-        try {
-            command = await hookFunc(this);
-        } catch {
-            hookRun.failed = true;
-            awb.currentHookRun = undefined;
-            
-            telemetry.hooksPyException(hook, Date.now() - hookRun.timestamp);
-            
+        if (hookFunc === undefined) {
+            this.hookRuns.push(hookRun);
             return hookRun;
         }
 
-        if (command !== undefined) {
-            const cmdRun = await awb.currentHookRun!.command(command, { cwd: awb.workingDirectory, timeout: 300_000 });
-            if (cmdRun.exitCode !== 0) {
-                hookRun.failed = true;
-            }
-            
-            awb.outputChannel.append('--------\n' + cmdRun.toString() + '\n--------\n');
+        // Held until the hook is done, so that archiving or deleting the task, or replacing the
+        // global hook, meanwhile does not destroy it.
+        const proxies = this.owner.hookProxies;
+        proxies.retainHook(hookFunc);
+
+        if (hooks.nonBlocking?.includes(hook)) {
+            hookRun.background = true;
+            // Pushed when done: by then the task has usually finished and its payload was written
+            // to the task store, so it is written again (and the journal records where).
+            awb.backgroundHooks.run(() => this.executeHook(hookRun, hookFunc).finally(() => {
+                proxies.releaseHook(hookFunc);
+                this.hookRuns.push(hookRun);
+                if (this.owner.getTaskById(this.id) === this) {
+                    this.updateResidency();
+                    this.owner.taskChanged(this);
+                }
+            }));
+            return hookRun;
         }
 
-        awb.currentHookRun = undefined;
-        
-        telemetry.hooksPySuccess(hook, Date.now() - hookRun.timestamp);
-        
+        this.hookRuns.push(hookRun);
+        try {
+            await this.executeHook(hookRun, hookFunc);
+        } finally {
+            proxies.releaseHook(hookFunc);
+        }
         return hookRun;
     }
+
+    private executeHook(hookRun: HookRun, hookFunc: HookFunction): Promise<void> {
+        const awb = AgentWorkbook.get();
+        return executeHook(hookRun, () => hookFunc(this, hookRun), awb.hookContext());
+    }
 }
 
 export type TasksEvents = {
     update: [];
+    /** A task changed its status; emitted right away, also within a batch */
+    status: [task: Task, previousStatus: TaskStatus];
+    /** A task was deleted */
+    remove: [task: Task];
+    /** A task was added, or changed other than in its status */
+    change: [task: Task];
+    /** Tasks were moved, or added other than at the end */
+    reorder: [];
+}
+
+/**
+ * Where the tasks that have dependencies (or dependents) stand.
+ */
+export interface DagStatus {
+    /** Queued tasks whose dependencies are met */
+    ready: string[];
+    /** Queued tasks, with the dependencies they still wait for */
+    waiting: Record<string, string[]>;
+    running: string[];
+    completed: string[];
+    /** Tasks that failed themselves */
+    failed: string[];
+    /** Tasks aborted or skipped because of a dependency, with that dependency */
+    blocked: Record<string, string>;
+}
+
+/**
+ * Number of tasks in a status, and how many of them are archived
+ */
+export interface StatusCount {
+    total: number;
+    archived: number;
+}
+
+/** When a task was queued, and in which order */
+interface QueuedSince {
+    time: number;
+    seq: number;
+}
+
+/** A queued task whose dependencies are met, in the ready queue of its client */
+interface ReadyEntry {
+    task: Task;
+    since: QueuedSince;
+    /** Priority, raised by the time spent waiting (relative to the other entries) */
+    rank: number;
 }
 
 export class Tasks extends EventEmitter<TasksEvents> {
     private _tasks: Task[] = [];
     private _promptSummarizer: PromptSummarizer = new PromptSummarizer();
+    private _byId = new Map<string, Task>();
+    /** Tasks depending on each task */
+    private _dependents = new Map<string, Task[]>();
+    /**
+     * Queued tasks whose dependencies are met, highest rank first, per client. Entries are not removed
+     * when their task leaves the queue or is reprioritized; only those in `_readyEntries` count.
+     */
+    private _ready = new Map<TaskClient, PriorityQueue<ReadyEntry>>();
+    private _readyEntries = new Map<string, ReadyEntry>();
+    /** Queued tasks (ready or waiting for dependencies) */
+    private _queuedSince = new Map<string, QueuedSince>();
+    private _queuedSeq = 0;
+    /** Retried tasks waiting for their backoff delay, earliest first (with stale entries, as above) */
+    private _delayed = new PriorityQueue<ReadyEntry>((a, b) => a.task.notBefore! < b.task.notBefore!);
+    private _delayedEntries = new Map<string, ReadyEntry>();
+    private _delayTimer?: NodeJS.Timeout;
+
+    /** Results of completed tasks created with caching on, for tasks with the same prompt, mode and client */
+    readonly resultCache = new ResultCache();
+
+    /** Holders of the hook functions, including the tasks holding them */
+    readonly hookProxies = new HookProxyRegistry();
+
+    private _batchDepth = 0;
+    private _updatePending = false;
+
+    /** Tasks in each status, kept up to date as statuses change */
+    private _byStatus = new Map<TaskStatus, Set<Task>>(ALL_TASK_STATUSES.map(status => [status, new Set<Task>()]));
+    private _archivedCounts = new Map<TaskStatus, number>(ALL_TASK_STATUSES.map(status => [status, 0]));
+    /** Increasing along the list, to return the tasks of a status in list order */
+    private _positions = new Map<Task, number>();
+    private _firstPosition = 0;
+    private _nextPosition = 0;
 
-    constructor() {
+    /**
+     * @param store Keeps the conversations of finished tasks on disk, within a memory budget.
+     *   Defaults to an in-memory store.
+     */
+    constructor(readonly store: TaskStore = new TaskStore(), private priorityAgingMs: number = DEFAULT_PRIORITY_AGING_MS) {
         super();
+        // Every task watcher and batch tracker listens for itself; any number of them can be open.
+        this.setMaxListeners(0);
     }
     
-    getTask(): Task | undefined {
-        return this._tasks.find(t => t.status === 'queued');
+    /**
+     * The queued task to run next: the one with the highest priority among those whose
+     * dependencies are met, raised by how long it has waited; the first submitted among equals.
+     *
+     * @param canStart Clients that may start a task now; tasks of other clients are passed over
+     */
+    getTask(canStart: (client: TaskClient) => boolean = () => true): Task | undefined {
+        let best: ReadyEntry | undefined;
+        for (const [client, queue] of this._ready) {
+            if (!canStart(client)) {
+                continue;
+            }
+            const entry = this.peekReady(queue);
+            if (entry !== undefined && (best === undefined || readyBefore(entry, best))) {
+                best = entry;
+            }
+        }
+        return best?.task;
+    }
+
+    /** Clients with queued tasks whose dependencies are met */
+    readyClients(): TaskClient[] {
+        return [...this._ready].filter(([, queue]) => this.peekReady(queue) !== undefined).map(([client]) => client);
+    }
+
+    /** Changes the priority of a task, moving it in the ready queue if it is queued. */
+    reprioritize(task: Task, priority: number) {
+        task.priority = priority;
+        const entry = this._readyEntries.get(task.id);
+        if (entry !== undefined) {
+            this.enqueue(task, entry.since);
+        }
+        this.taskChanged(task);
+    }
+
+    /** Queued tasks gain one priority level per `ms` of waiting (none with 0). */
+    configurePriorityAging(ms: number) {
+        this.priorityAgingMs = ms;
+        this.rebuildReadyQueue();
+    }
+
+    /** Signals that tasks changed: emits 'update', or once at the end of the current batch. */
+    changed() {
+        if (this._batchDepth > 0) {
+            this._updatePending = true;
+        } else {
+            this.emit('update');
+        }
+    }
+
+    /** Signals that a task changed other than in its status, e.g. its prompt. */
+    taskChanged(task: Task) {
+        this.emit('change', task);
+        this.changed();
+    }
+
+    /**
+     * Runs `fn` as one batch of changes: listeners (renderer repaint, telemetry, worker,
+     * session journal) get a single 'update' at the end instead of one per change.
+     */
+    batch<T>(fn: () => T): T {
+        this.beginBatch();
+        try {
+            return fn();
+        } finally {
+            this.endBatch();
+        }
+    }
+
+    /** Starts a batch; batches nest, and 'update' is emitted when the outermost one ends. */
+    beginBatch() {
+        this._batchDepth++;
+    }
+
+    endBatch() {
+        if (this._batchDepth === 0) {
+            throw new Error('No batch of task changes to end');
+        }
+        this._batchDepth--;
+        if (this._batchDepth === 0 && this._updatePending) {
+            this._updatePending = false;
+            this.emit('update');
+        }
+    }
+
+    get inBatch(): boolean {
+        return this._batchDepth > 0;
+    }
+
+    getTaskById(taskId: string): Task | undefined {
+        return this._byId.get(taskId);
     }
 
     getTaskByClineId(clineId: string): Task | undefined {
@@ -256,19 +704,75 @@ export class Tasks extends EventEmitter<TasksEvents> {
     }
 
     get queued(): Task[] {
-        return this._tasks.filter(t => t.status === 'queued');
+        return this.withStatus('queued');
     }
 
     get running(): Task | undefined {
-        return this._tasks.find(t => t.status === 'running');
+        return this.withStatus('running')[0];
     }
 
     get completed(): Task[] {
-        return this._tasks.filter(t => t.status === 'completed');
+        return this.withStatus('completed');
     }
 
     get prepared(): Task[] {
-        return this._tasks.filter(t => t.status === 'prepared');
+        return this.withStatus('prepared');
+    }
+
+    /** Tasks in any of the statuses, in list order; takes time in the number of those tasks only */
+    withStatus(...statuses: TaskStatus[]): Task[] {
+        const tasks = statuses.flatMap(status => [...this._byStatus.get(status)!]);
+        return tasks.sort((a, b) => this._positions.get(a)! - this._positions.get(b)!);
+    }
+
+    /**
+     * Tasks matching the query, in list order. Only the tasks in the queried statuses are looked at.
+     * A cursor stays valid while tasks are added or deleted, but not when they are moved.
+     */
+    find(query: TaskQuery, { limit = Infinity, offset = 0, cursor }: TaskPageOptions = {}): TaskPage {
+        const matches = taskQueryPredicate(query);
+        const candidates = query.status !== undefined ? this.withStatus(...query.status) : this._tasks;
+
+        let start = 0;
+        if (cursor !== undefined) {
+            const after = Number(cursor);
+            if (!Number.isFinite(after)) {
+                throw new Error(`Invalid cursor '${cursor}'`);
+            }
+            // Positions increase along the list: find the first task after the cursor.
+            let end = candidates.length;
+            while (start < end) {
+                const middle = (start + end) >> 1;
+                if (this._positions.get(candidates[middle])! <= after) {
+                    start = middle + 1;
+                } else {
+                    end = middle;
+                }
+            }
+        }
+
+        const tasks: Task[] = [];
+        let skipped = 0;
+        for (let i = start; i < candidates.length && tasks.length < limit; i++) {
+            if (!matches(candidates[i])) {
+                continue;
+            }
+            if (skipped < offset) {
+                skipped++;
+            } else {
+                tasks.push(candidates[i]);
+            }
+        }
+        const full = tasks.length > 0 && tasks.length === limit;
+        return { tasks, cursor: full ? String(this._positions.get(tasks[tasks.length - 1])) : undefined };
+    }
+
+    statusCounts(): Record<TaskStatus, StatusCount> {
+        const counts = {} as Record<TaskStatus, StatusCount>;
+        for (const status of ALL_TASK_STATUSES) {
+            counts[status] = { total: this._byStatus.get(status)!.size, archived: this._archivedCounts.get(status)! };
+        }
+        return counts;
     }
 
     push(...tasks: Task[]) {
@@ -282,10 +786,53 @@ export class Tasks extends EventEmitter<TasksEvents> {
             const score = this._promptSummarizer.score(cleanedPrompt);
             const summary = this._promptSummarizer.summary(cleanedPrompt, score, 65);
             task.summary = summary;
+            this.adopt(task);
         }
 
         this._tasks.push(...tasks);
-        this.emit('update');
+        for (const task of tasks) {
+            this._positions.set(task, this._nextPosition++);
+            this.enqueueIfReady(task);
+            this.emit('change', task);
+        }
+        this.changed();
+    }
+
+    /**
+     * Adds the tasks of a previous session in front of the current ones.
+     * Their summaries were restored with them; the summarizer learns their prompts
+     * in the background, so restoring thousands of tasks does not block.
+     */
+    restore(tasks: Task[]) {
+        const existing = new Set(this._tasks.map(t => t.id));
+        const restored = tasks.filter(t => !existing.has(t.id));
+        for (const task of restored) {
+            this.adopt(task);
+            if (task.summary === undefined) {
+                task.summary = [task.prompt];
+            }
+        }
+        this._tasks = [...restored, ...this._tasks];
+        for (let i = restored.length - 1; i >= 0; i--) {
+            this._positions.set(restored[i], --this._firstPosition);
+        }
+        this.rebuildReadyQueue();
+        restored.forEach(task => this.emit('change', task));
+        this.emit('reorder');
+        this.changed();
+
+        const prompts = restored.map(t => clean_whitespace(t.prompt));
+        const seed = (start: number) => {
+            for (const prompt of prompts.slice(start, start + SUMMARIZER_SEED_CHUNK)) {
+                this._promptSummarizer.insert(prompt);
+            }
+            if (start + SUMMARIZER_SEED_CHUNK < prompts.length) {
+                setImmediate(() => seed(start + SUMMARIZER_SEED_CHUNK));
+            }
+        };
+        if (prompts.length > 0) {
+            setImmediate(() => seed(0));
+        }
     }
 
     move(taskIds: string[], target: { taskId: string, position: 'before' | 'after' }) {
@@ -312,7 +859,13 @@ export class Tasks extends EventEmitter<TasksEvents> {
 
         this._tasks.length = 0;  // clear the array
         this._tasks.push(...newTasks);
-        this.emit('update');
+        this._tasks.forEach((task, i) => this._positions.set(task, i));
+        this._firstPosition = 0;
+        this._nextPosition = this._tasks.length;
+        // Moving queued tasks changes the order in which they run.
+        this.rebuildReadyQueue();
+        this.emit('reorder');
+        this.changed();
     }
 
     removeTask(taskId: string) {
@@ -328,12 +881,338 @@ export class Tasks extends EventEmitter<TasksEvents> {
 
             // Remove the task from the array
             this._tasks.splice(taskIndex, 1);
-            this.emit('update');
+            this.store.delete(task);
+            this.unlink(task);
+            this.emit('remove', task);
+            this.changed();
             
             vscode.window.showInformationMessage(`Task #${taskId} deleted permanently ("${task.summary?.join(' ... ') || task.prompt}")`);
         }
     }
 
+    /**
+     * Keeps the status counters and the ready queue in step with a task's status, and applies the dependency failure
+     * policy: to the queued dependents of a task that failed, and to a task queued after one
+     * of its dependencies failed.
+     */
+    taskStatusChanged(task: Task, previousStatus: TaskStatus) {
+        if (this._byStatus.get(previousStatus)!.delete(task)) {
+            this._byStatus.get(task.status)!.add(task);
+            if (task.archived) {
+                this._archivedCounts.set(previousStatus, this._archivedCounts.get(previousStatus)! - 1);
+                this._archivedCounts.set(task.status, this._archivedCounts.get(task.status)! + 1);
+            }
+        }
+        this.emit('status', task, previousStatus);
+
+        if (task.status === 'queued') {
+            const failed = task.dependsOn.map(id => this._byId.get(id)).find(dependency => dependency !== undefined && dependencyFailed(dependency));
+            this._queuedSince.set(task.id, { time: Date.now(), seq: this._queuedSeq++ });
+            if (failed !== undefined) {
+                this.applyDependencyFailure(task, failed);
+            } else {
+                this.enqueueIfReady(task);
+            }
+            return;
+        }
+
+        this._readyEntries.delete(task.id);
+        this._delayedEntries.delete(task.id);
+        this._queuedSince.delete(task.id);
+        if (this.retry(task, previousStatus)) {
+            // Dependents wait for the next attempt.
+            return;
+        }
+        if (FAILED_TASK_STATUSES.includes(task.status)) {
+            this.failDependents(task);
+        }
+        if (task.status === 'completed' && task.cacheKey !== undefined && !task.fromCache) {
+            this.resultCache.put(task.cacheKey, task.conversation);
+        }
+        if (FINISHED_TASK_STATUSES.includes(task.status)) {
+            this.enqueueReadyDependents(task);
+        }
+    }
+
+    /**
+     * Completes a task submitted for the first time with a cached result, instead of queuing it.
+     * Its hooks do not run. Tasks with dependencies always run, since their result may
+     * depend on what the dependencies did.
+     */
+    completeFromCache(task: Task): boolean {
+        if (task.cacheKey === undefined || task.dependsOn.length > 0) {
+            return false;
+        }
+        const conversation = this.resultCache.get(task.cacheKey);
+        if (conversation === undefined) {
+            return false;
+        }
+        task.conversation = conversation;
+        task.fromCache = true;
+        task.status = 'completed';
+        return true;
+    }
+
+    /**
+     * Archiving also drops the task's hooks, so that their proxies can be destroyed;
+     * unarchived tasks run with the global hooks.
+     */
+    taskArchivedChanged(task: Task) {
+        if (task.archived) {
+            this.hookProxies.release(task.hooks);
+            task.hooks = undefined;
+        }
+        if (this._byStatus.get(task.status)!.has(task)) {
+            this._archivedCounts.set(task.status, this._archivedCounts.get(task.status)! + (task.archived ? 1 : -1));
+        }
+    }
+
+    dagStatus(): DagStatus {
+        const status: DagStatus = { ready: [], waiting: {}, running: [], completed: [], failed: [], blocked: {} };
+        for (const task of this._tasks) {
+            if (task.dependsOn.length === 0 && !this._dependents.has(task.id)) {
+                continue;
+            }
+            if (task.dependencyFailure !== undefined && dependencyFailed(task)) {
+                status.blocked[task.id] = task.dependencyFailure;
+            } else if (task.status === 'queued') {
+                const pending = this.pendingDependencies(task);
+                if (pending.length === 0) {
+                    status.ready.push(task.id);
+                } else {
+                    status.waiting[task.id] = pending;
+                }
+            } else if (task.status === 'running') {
+                status.running.push(task.id);
+            } else if (task.status === 'completed') {
+                status.completed.push(task.id);
+            } else if (FAILED_TASK_STATUSES.includes(task.status)) {
+                status.failed.push(task.id);
+            }
+        }
+        return status;
+    }
+
+    /** Dependencies the task still waits for */
+    private pendingDependencies(task: Task): string[] {
+        return task.dependsOn.filter(id => {
+            const dependency = this._byId.get(id);
+            if (dependency === undefined) {
+                return false;
+            }
+            if (task.onDependencyFailure === 'run' && (FINISHED_TASK_STATUSES.includes(dependency.status) || dependencyFailed(dependency))) {
+                return false;
+            }
+            return dependency.status !== 'completed' || dependency.dependencyFailure !== undefined;
+        });
+    }
+
+    private failDependents(task: Task) {
+        for (const dependent of this._dependents.get(task.id) ?? []) {
+            if (dependent.status === 'queued') {
+                this.applyDependencyFailure(dependent, task);
+            }
+        }
+    }
+
+    private applyDependencyFailure(task: Task, failed: Task) {
+        switch (task.onDependencyFailure) {
+            case 'abort':
+                task.dependencyFailure = failed.id;
+                task.status = 'aborted';  // fails its own dependents in turn
+                break;
+            case 'skip':
+                task.dependencyFailure = failed.id;
+                task.cancel(false);
+                this.failDependents(task);
+                break;
+            case 'run':
+                this.enqueueIfReady(task);
+                break;
+        }
+    }
+
+    private enqueueReadyDependents(task: Task) {
+        for (const dependent of this._dependents.get(task.id) ?? []) {
+            this.enqueueIfReady(dependent);
+        }
+    }
+
+    /**
+     * Queues the task again if its retry policy allows, after the backoff delay. Only an
+     * attempt that ran is retried: a cancelled task goes back to its previous status, and stays there.
+     */
+    private retry(task: Task, previousStatus: TaskStatus): boolean {
+        const policy = task.retryPolicy;
+        if (policy === undefined || previousStatus !== 'running' || !policy.retryOn.includes(task.status) || task.retries + 1 >= policy.maxAttempts
+            || task.dependencyFailure !== undefined || task.archived) {
+            return false;
+        }
+        task.notBefore = Date.now() + backoffDelay(task.retries, policy.baseDelayMs, policy.maxDelayMs);
+        task.retries++;
+        task.previousAttempts.unshift(task.status);
+        task.status = 'queued';
+        return true;
+    }
+
+    private enqueueIfReady(task: Task) {
+        if (task.status !== 'queued' || this._readyEntries.has(task.id) || this._delayedEntries.has(task.id)
+            || this.pendingDependencies(task).length > 0) {
+            return;
+        }
+        if (task.notBefore !== undefined && task.notBefore > Date.now()) {
+            const entry: ReadyEntry = { task, since: this.queuedSince(task), rank: 0 };
+            this._delayedEntries.set(task.id, entry);
+            this._delayed.push(entry);
+            this.scheduleDelayed();
+            return;
+        }
+        this.enqueue(task, this.queuedSince(task));
+    }
+
+    /** Moves retried tasks whose delay has passed to the ready queue. */
+    private scheduleDelayed() {
+        clearTimeout(this._delayTimer);
+        this._delayTimer = undefined;
+
+        let promoted = false;
+        let entry: ReadyEntry | undefined;
+        while ((entry = this._delayed.peek()) !== undefined) {
+            if (this._delayedEntries.get(entry.task.id) !== entry) {
+                this._delayed.pop();
+                continue;
+            }
+            const waitMs = entry.task.notBefore! - Date.now();
+            if (waitMs > 0) {
+                this._delayTimer = setTimeout(() => this.scheduleDelayed(), waitMs);
+                this._delayTimer.unref?.();
+                break;
+            }
+            this._delayed.pop();
+            this._delayedEntries.delete(entry.task.id);
+            entry.task.notBefore = undefined;
+            this.enqueue(entry.task, entry.since);
+            this.emit('change', entry.task);
+            promoted = true;
+        }
+        if (promoted) {
+            this.changed();
+        }
+    }
+
+    /** Tasks that waited for dependencies keep the time they were queued at. */
+    private queuedSince(task: Task): QueuedSince {
+        let since = this._queuedSince.get(task.id);
+        if (since === undefined) {
+            // Added to the collection as queued (restored)
+            since = { time: Date.now(), seq: this._queuedSeq++ };
+            this._queuedSince.set(task.id, since);
+        }
+        return since;
+    }
+
+    private enqueue(task: Task, since: QueuedSince) {
+        const aging = this.priorityAgingMs > 0 ? since.time / this.priorityAgingMs : 0;
+        const entry: ReadyEntry = { task, since, rank: task.priority - aging };
+        this._readyEntries.set(task.id, entry);
+        let queue = this._ready.get(task.client);
+        if (queue === undefined) {
+            queue = new PriorityQueue<ReadyEntry>(readyBefore);
+            this._ready.set(task.client, queue);
+        }
+        queue.push(entry);
+
+        // Drop the entries of tasks that left the queue once they make up most of the heaps.
+        let size = 0;
+        for (const queue of this._ready.values()) {
+            size += queue.size;
+        }
+        if (size > 2 * this._readyEntries.size + 64) {
+            for (const [client, queue] of this._ready) {
+                queue.reset([...this._readyEntries.values()].filter(e => e.task.client === client));
+            }
+        }
+    }
+
+    /** The first entry of the queue whose task is still ready */
+    private peekReady(queue: PriorityQueue<ReadyEntry>): ReadyEntry | undefined {
+        let entry: ReadyEntry | undefined;
+        while ((entry = queue.peek()) !== undefined && this._readyEntries.get(entry.task.id) !== entry) {
+            queue.pop();
+        }
+        return entry;
+    }
+
+    /**
+     * Re-enters the queued tasks in list order, keeping the times they were queued at.
+     * The earliest of those goes to the first task, so moving a task up lets it run earlier.
+     */
+    private rebuildReadyQueue() {
+        const queued = this._tasks.filter(t => t.status === 'queued');
+        const since = queued.map(t => this.queuedSince(t));
+        const times = since.map(s => s.time).sort((a, b) => a - b);
+        const seqs = since.map(s => s.seq).sort((a, b) => a - b);
+        this._readyEntries.clear();
+        this._ready.clear();
+        this._delayedEntries.clear();
+        this._delayed.reset([]);
+        queued.forEach((task, i) => {
+            this._queuedSince.set(task.id, { time: times[i], seq: seqs[i] });
+            this.enqueueIfReady(task);
+        });
+    }
+
+    private adopt(task: Task) {
+        task.store = this.store;
+        task.tasks = this;
+        if (!task.archived) {
+            this.hookProxies.retain(task.hooks);
+        }
+        this._byId.set(task.id, task);
+        this._byStatus.get(task.status)!.add(task);
+        if (task.archived) {
+            this._archivedCounts.set(task.status, this._archivedCounts.get(task.status)! + 1);
+        }
+        for (const id of task.dependsOn) {
+            const dependents = this._dependents.get(id);
+            if (dependents === undefined) {
+                this._dependents.set(id, [task]);
+            } else {
+                dependents.push(task);
+            }
+        }
+    }
+
+    /** Forgets a deleted task; tasks depending on it no longer wait for it. */
+    private unlink(task: Task) {
+        if (!task.archived) {
+            this.hookProxies.release(task.hooks);
+        }
+        this._byId.delete(task.id);
+        this._byStatus.get(task.status)!.delete(task);
+        if (task.archived) {
+            this._archivedCounts.set(task.status, this._archivedCounts.get(task.status)! - 1);
+        }
+        this._positions.delete(task);
+        this._readyEntries.delete(task.id);
+        this._delayedEntries.delete(task.id);
+        this._queuedSince.delete(task.id);
+        for (const dependent of this._dependents.get(task.id) ?? []) {
+            dependent.dependsOn = dependent.dependsOn.filter(id => id !== task.id);
+            this.enqueueIfReady(dependent);
+            this.emit('change', dependent);
+        }
+        this._dependents.delete(task.id);
+        for (const id of task.dependsOn) {
+            const dependents = this._dependents.get(id)?.filter(t => t !== task);
+            if (dependents === undefined || dependents.length === 0) {
+                this._dependents.delete(id);
+            } else {
+                this._dependents.set(id, dependents);
+            }
+        }
+    }
+
     [Symbol.iterator]() {
         return this._tasks[Symbol.iterator]();
     }
@@ -351,6 +1230,16 @@ export class Tasks extends EventEmitter<TasksEvents> {
     }
 }
 
+function readyBefore(a: ReadyEntry, b: ReadyEntry): boolean {
+    return a.rank > b.rank || (a.rank === b.rank && a.since.seq < b.since.seq);
+}
+
+/** Whether the task failed, or was aborted or skipped because of a dependency */
+function dependencyFailed(task: Task): boolean {
+    return FAILED_TASK_STATUSES.includes(task.status)
+        || (task.dependencyFailure !== undefined && task.status !== 'queued' && task.status !== 'running');
+}
+
 function clean_whitespace(text: string): string {
     return text.replace(/\s+/g, ' ').trim();
 }
@@ -0,0 +1,125 @@
+import { createHash } from 'crypto';
+import { Message } from '../ai/controller';
+
+export interface ResultCacheOptions {
+    /** Results older than this are not reused */
+    ttlMs: number;
+    maxEntries: number;
+    /** Least recently used results are dropped above this estimated size */
+    maxBytes: number;
+}
+
+export const DEFAULT_RESULT_CACHE_OPTIONS: ResultCacheOptions = {
+    ttlMs: 24 * 60 * 60 * 1000,
+    maxEntries: 1000,
+    maxBytes: 64 * 1024 * 1024,
+};
+
+export interface ResultCacheStats {
+    entries: number;
+    bytes: number;
+    hits: number;
+    misses: number;
+    /** Results dropped to stay within the limits */
+    evictions: number;
+    /** Results dropped because they were older than the TTL */
+    expired: number;
+}
+
+interface CacheEntry {
+    conversation: Message[];
+    bytes: number;
+    storedAt: number;
+}
+
+/**
+ * Key of a task result: the fully built prompt, the mode and the client.
+ */
+export function resultCacheKey(prompt: string, mode: string, client: string): string {
+    return createHash('sha256').update(JSON.stringify([prompt, mode, client])).digest('hex');
+}
+
+/**
+ * Conversations of completed tasks, reused for tasks with the same key instead of running them again.
+ *
+ * Results expire after the TTL; beyond the entry and size limits, the least recently used
+ * ones are dropped. The cache lives in memory for the session.
+ */
+export class ResultCache {
+    private options: ResultCacheOptions;
+    /** Least recently used first */
+    private readonly entries = new Map<string, CacheEntry>();
+    private bytes = 0;
+    private hits = 0;
+    private misses = 0;
+    private evictions = 0;
+    private expired = 0;
+
+    constructor(options: Partial<ResultCacheOptions> = {}, private readonly now: () => number = Date.now) {
+        this.options = { ...DEFAULT_RESULT_CACHE_OPTIONS, ...options };
+    }
+
+    configure(options: Partial<ResultCacheOptions>) {
+        this.options = { ...this.options, ...options };
+        this.enforceLimits();
+    }
+
+    /** A copy of the cached conversation, if there is a fresh one. */
+    get(key: string): Message[] | undefined {
+        const entry = this.entries.get(key);
+        if (entry !== undefined && this.now() - entry.storedAt > this.options.ttlMs) {
+            this.remove(key);
+            this.expired++;
+        } else if (entry !== undefined) {
+            // Most recently used last
+            this.entries.delete(key);
+            this.entries.set(key, entry);
+            this.hits++;
+            return [...entry.conversation];
+        }
+        this.misses++;
+        return undefined;
+    }
+
+    put(key: string, conversation: Message[]) {
+        this.remove(key);
+        const entry: CacheEntry = { conversation: [...conversation], bytes: JSON.stringify(conversation).length, storedAt: this.now() };
+        this.entries.set(key, entry);
+        this.bytes += entry.bytes;
+        this.enforceLimits();
+    }
+
+    clear() {
+        this.entries.clear();
+        this.bytes = 0;
+    }
+
+    stats(): ResultCacheStats {
+        return {
+            entries: this.entries.size,
+            bytes: this.bytes,
+            hits: this.hits,
+            misses: this.misses,
+            evictions: this.evictions,
+            expired: this.expired,
+        };
+    }
+
+    private remove(key: string) {
+        const entry = this.entries.get(key);
+        if (entry !== undefined) {
+            this.entries.delete(key);
+            this.bytes -= entry.bytes;
+        }
+    }
+
+    private enforceLimits() {
+        for (const key of this.entries.keys()) {
+            if (this.entries.size <= this.options.maxEntries && this.bytes <= this.options.maxBytes) {
+                break;
+            }
+            this.remove(key);
+            this.evictions++;
+        }
+    }
+}
@@ -0,0 +1,336 @@
+import * as fs from 'fs';
+import * as path from 'path';
+import { Task, TaskRecord, Tasks } from './manager';
+
+export interface SessionJournalOptions {
+    /** Changes are written this long after the last task update */
+    flushDelayMs: number;
+    /** The log is folded into the snapshot once it holds this many entries (or half as many as there are tasks, if more) */
+    compactAfterEntries: number;
+}
+
+export const DEFAULT_SESSION_JOURNAL_OPTIONS: SessionJournalOptions = {
+    flushDelayMs: 200,
+    compactAfterEntries: 1000,
+};
+
+export interface SessionRestoreResult {
+    tasks: number;
+    /** Restored tasks waiting in the queue */
+    queued: number;
+    /** Tasks that were running when the previous session ended; restored as aborted */
+    aborted: number;
+    durationMs: number;
+}
+
+export interface SessionJournalStats {
+    tasks: number;
+    /** Entries in the log since the last snapshot */
+    logEntries: number;
+    snapshotBytes: number;
+    logBytes: number;
+}
+
+type JournalEntry =
+    | { op: 'put', task: TaskRecord }
+    | { op: 'remove', id: string }
+    | { op: 'order', ids: string[] }
+    ;
+
+interface Snapshot {
+    version: number;
+    tasks: TaskRecord[];
+}
+
+const SNAPSHOT_VERSION = 1;
+const SNAPSHOT_FILE = 'snapshot.json';
+const LOG_FILE = 'journal.jsonl';
+
+/**
+ * Keeps the task queue of the session on disk, so it survives reloads.
+ *
+ * Changes are appended to a log shortly after the tasks update; once the log grows,
+ * it is folded into a snapshot. Only the tasks that changed (as told by the 'status',
+ * 'change', 'remove' and 'reorder' events) are looked at and written, so a large queue
+ * does not slow down status changes. Conversations are not part of the journal: the
+ * task store keeps them, and the journal only records where. Segments the store
+ * compacted are deleted once the journal has recorded the new locations.
+ *
+ * The journal starts recording once the previous session was restored or discarded.
+ */
+export class SessionJournal {
+    private options: SessionJournalOptions;
+    /** Tasks as last written, in queue order */
+    private written = new Map<string, TaskRecord>();
+    private logEntries = 0;
+    private started = false;
+    private flushTimer?: NodeJS.Timeout;
+    /** Changes since the last flush */
+    private dirty = new Set<Task>();
+    private removed = new Set<string>();
+    private reordered = false;
+    private readonly onUpdate = () => this.scheduleFlush();
+    private readonly onChange = (task: Task) => {
+        this.dirty.add(task);
+    };
+    private readonly onRemove = (task: Task) => {
+        this.dirty.delete(task);
+        this.removed.add(task.id);
+    };
+    private readonly onReorder = () => {
+        this.reordered = true;
+    };
+
+    constructor(private readonly tasks: Tasks, private readonly directory: string, options: Partial<SessionJournalOptions> = {}) {
+        this.options = { ...DEFAULT_SESSION_JOURNAL_OPTIONS, ...options };
+        fs.mkdirSync(directory, { recursive: true });
+        this.tasks.on('update', this.onUpdate);
+        this.tasks.on('status', this.onChange);
+        this.tasks.on('change', this.onChange);
+        this.tasks.on('remove', this.onRemove);
+        this.tasks.on('reorder', this.onReorder);
+    }
+
+    get isStarted(): boolean {
+        return this.started;
+    }
+
+    /**
+     * Adds the tasks of the previous session to the current ones and starts recording.
+     * Tasks that were running are restored as aborted; their hooks are lost.
+     */
+    restore(): SessionRestoreResult {
+        if (this.started) {
+            throw new Error('The session journal has already started');
+        }
+        const started = performance.now();
+        const records = this.readPrevious();
+        const ended = this.previousSessionEnd();
+
+        let queued = 0;
+        let aborted = 0;
+        const restored: Task[] = [];
+        for (const record of records.values()) {
+            if (record.status === 'running') {
+                record.previousAttempts = ['running', ...record.previousAttempts];
+                record.status = 'aborted';
+                record.finishedAt = ended;
+                aborted++;
+            } else if (record.status === 'queued') {
+                queued++;
+            }
+            restored.push(Task.fromRecord(record));
+        }
+
+        this.tasks.store.adopt([...records.values()]
+            .filter(record => record.payload !== undefined)
+            .map(record => [record.id, record.payload!]));
+        this.tasks.restore(restored);
+
+        this.written = records;
+        // Fold the previous log into a fresh snapshot, off the startup path.
+        this.logEntries = Number.POSITIVE_INFINITY;
+        this.started = true;
+        this.scheduleFlush();
+
+        return { tasks: restored.length, queued, aborted, durationMs: performance.now() - started };
+    }
+
+    /** Drops the previous session and starts recording. */
+    discard() {
+        if (this.started) {
+            return;
+        }
+        this.tasks.store.discardPrevious();
+        this.written.clear();
+        this.logEntries = Number.POSITIVE_INFINITY;
+        this.started = true;
+        this.flush();
+    }
+
+    /** Writes pending changes now; with `compact`, folds the log into a new snapshot. */
+    flush(compact: boolean = false) {
+        if (this.flushTimer !== undefined) {
+            clearTimeout(this.flushTimer);
+            this.flushTimer = undefined;
+        }
+        if (!this.started) {
+            return;
+        }
+
+        // Compaction in the task store moved the payloads of any number of tasks.
+        const relocated = this.tasks.store.hasRetiredSegments;
+        if (compact || this.logEntries >= Math.max(this.options.compactAfterEntries, this.written.size / 2)) {
+            const current = new Map<string, TaskRecord>();
+            for (const task of this.tasks) {
+                current.set(task.id, task.toRecord());
+            }
+            this.writeSnapshot(current);
+        } else {
+            this.appendChanges(relocated ? this.tasks : this.dirty);
+        }
+        this.dirty.clear();
+        this.removed.clear();
+        this.reordered = false;
+        if (relocated) {
+            this.tasks.store.deleteRetiredSegments();
+        }
+    }
+
+    stats(): SessionJournalStats {
+        const size = (file: string) => fs.existsSync(file) ? fs.statSync(file).size : 0;
+        return {
+            tasks: this.written.size,
+            logEntries: Number.isFinite(this.logEntries) ? this.logEntries : 0,
+            snapshotBytes: size(this.snapshotPath),
+            logBytes: size(this.logPath),
+        };
+    }
+
+    dispose() {
+        this.tasks.off('update', this.onUpdate);
+        this.tasks.off('status', this.onChange);
+        this.tasks.off('change', this.onChange);
+        this.tasks.off('remove', this.onRemove);
+        this.tasks.off('reorder', this.onReorder);
+        this.flush();
+    }
+
+    /** Appends the changes of the given tasks, the deleted tasks and the new order to the log. */
+    private appendChanges(changed: Iterable<Task>) {
+        const entries: JournalEntry[] = [];
+        const removed = [...this.removed].filter(id => this.written.has(id));
+        for (const id of removed) {
+            entries.push({ op: 'remove', id });
+        }
+        const records: TaskRecord[] = [];
+        for (const task of changed) {
+            if (this.tasks.getTaskById(task.id) !== task) {
+                continue;
+            }
+            const record = task.toRecord();
+            const previous = this.written.get(task.id);
+            if (previous === undefined || !sameRecord(previous, record)) {
+                entries.push({ op: 'put', task: record });
+            }
+            records.push(record);
+        }
+        // Replaying puts and removes appends new tasks; anything else is a reorder.
+        let order: string[] | undefined;
+        if (this.reordered) {
+            const replayed = new Set(this.written.keys());
+            removed.forEach(id => replayed.delete(id));
+            records.forEach(record => replayed.add(record.id));
+            const ids = [...this.tasks].map(task => task.id).filter(id => replayed.has(id));
+            if ([...replayed].some((id, i) => ids[i] !== id)) {
+                order = ids;
+                entries.push({ op: 'order', ids });
+            }
+        }
+
+        if (entries.length > 0) {
+            fs.appendFileSync(this.logPath, entries.map(entry => JSON.stringify(entry) + '\n').join(''));
+            this.logEntries += entries.length;
+        }
+        // Only updated once the entries are on disk, so that a failed write is retried.
+        removed.forEach(id => this.written.delete(id));
+        records.forEach(record => this.written.set(record.id, record));
+        if (order !== undefined) {
+            this.written = new Map(order.map(id => [id, this.written.get(id)!]));
+        }
+    }
+
+    private scheduleFlush() {
+        if (this.started && this.flushTimer === undefined) {
+            this.flushTimer = setTimeout(() => {
+                this.flushTimer = undefined;
+                try {
+                    this.flush();
+                } catch (error) {
+                    console.error('Error writing the session journal:', error);
+                }
+            }, this.options.flushDelayMs);
+        }
+    }
+
+    /** Replays the log of the previous session over its snapshot. */
+    private readPrevious(): Map<string, TaskRecord> {
+        const records = new Map<string, TaskRecord>();
+        if (fs.existsSync(this.snapshotPath)) {
+            const snapshot: Snapshot = JSON.parse(fs.readFileSync(this.snapshotPath, 'utf8'));
+            if (snapshot.version !== SNAPSHOT_VERSION) {
+                return records;
+            }
+            for (const record of snapshot.tasks) {
+                records.set(record.id, record);
+            }
+        }
+        if (!fs.existsSync(this.logPath)) {
+            return records;
+        }
+
+        for (const line of fs.readFileSync(this.logPath, 'utf8').split('\n')) {
+            let entry: JournalEntry;
+            try {
+                entry = JSON.parse(line);
+            } catch {
+                // Empty, or cut off by a crash while writing
+                continue;
+            }
+            switch (entry.op) {
+                case 'put':
+                    records.set(entry.task.id, entry.task);
+                    break;
+                case 'remove':
+                    records.delete(entry.id);
+                    break;
+                case 'order': {
+                    const reordered = new Map<string, TaskRecord>();
+                    for (const id of entry.ids) {
+                        const record = records.get(id);
+                        if (record !== undefined) {
+                            reordered.set(id, record);
+                        }
+                    }
+                    records.clear();
+                    for (const [id, record] of reordered) {
+                        records.set(id, record);
+                    }
+                    break;
+                }
+            }
+        }
+        return records;
+    }
+
+    /** When the previous session last recorded a change: the latest it can have ended a running task */
+    private previousSessionEnd(): number {
+        const modified = [this.logPath, this.snapshotPath]
+            .filter(file => fs.existsSync(file))
+            .map(file => fs.statSync(file).mtimeMs);
+        return modified.length > 0 ? Math.max(...modified) : Date.now();
+    }
+
+    private writeSnapshot(records: Map<string, TaskRecord>) {
+        const snapshot: Snapshot = { version: SNAPSHOT_VERSION, tasks: [...records.values()] };
+        const temporary = this.snapshotPath + '.tmp';
+        fs.writeFileSync(temporary, JSON.stringify(snapshot));
+        fs.renameSync(temporary, this.snapshotPath);
+        fs.writeFileSync(this.logPath, '');
+        this.written = records;
+        this.logEntries = 0;
+    }
+
+    private get snapshotPath(): string {
+        return path.join(this.directory, SNAPSHOT_FILE);
+    }
+
+    private get logPath(): string {
+        return path.join(this.directory, LOG_FILE);
+    }
+}
+
+/** Records are plain JSON, so comparing them as written catches a change in any field. */
+function sameRecord(a: TaskRecord, b: TaskRecord): boolean {
+    return JSON.stringify(a) === JSON.stringify(b);
+}
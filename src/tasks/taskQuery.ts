@@ -0,0 +1,50 @@
+import type { Task, TaskClient, TaskStatus } from './manager';
+
+/**
+ * Conditions on tasks; all given ones have to hold. Lists match any of their values.
+ */
+export interface TaskQuery {
+    status?: TaskStatus[];
+    client?: TaskClient[];
+    mode?: string[];
+    /** Case-sensitive substring of the prompt */
+    promptContains?: string;
+    /** JavaScript regular expression searched in the prompt */
+    promptRegex?: string;
+    archived?: boolean;
+}
+
+export interface TaskPageOptions {
+    /** Maximum number of tasks to return */
+    limit?: number;
+    /** Matching tasks to skip */
+    offset?: number;
+    /** Continue after the last task of a previous page */
+    cursor?: string;
+}
+
+export interface TaskPage {
+    tasks: Task[];
+    /** Set when the page is full: pass it to get the next one */
+    cursor?: string;
+}
+
+/** The predicate of a query, without the status (which is looked up in the status index) */
+export function taskQueryPredicate(query: TaskQuery): (task: Task) => boolean {
+    let regex: RegExp | undefined;
+    if (query.promptRegex !== undefined) {
+        try {
+            regex = new RegExp(query.promptRegex);
+        } catch (error) {
+            throw new Error(`Invalid prompt regex '${query.promptRegex}': ${error instanceof Error ? error.message : error}`);
+        }
+    }
+    const clients = query.client !== undefined ? new Set<string>(query.client) : undefined;
+    const modes = query.mode !== undefined ? new Set(query.mode) : undefined;
+
+    return task => (clients === undefined || clients.has(task.client))
+        && (modes === undefined || modes.has(task.mode))
+        && (query.archived === undefined || task.archived === query.archived)
+        && (query.promptContains === undefined || task.prompt.includes(query.promptContains))
+        && (regex === undefined || regex.test(task.prompt));
+}
@@ -0,0 +1,436 @@
+import { createHash } from 'crypto';
+import * as fs from 'fs';
+import { FileHandle, open } from 'fs/promises';
+import * as path from 'path';
+import { Message } from '../ai/controller';
+import { HookRun } from '../utils/hooks';
+
+/**
+ * The bulky part of a task: everything that grows while it runs.
+ */
+export interface TaskPayload {
+    conversation: Message[];
+    hookRuns: HookRun[];
+}
+
+/**
+ * What the store needs from a task: its id and the payload held in memory
+ * (undefined while the payload only lives on disk).
+ */
+export interface PayloadHolder {
+    readonly id: string;
+    residentPayload: TaskPayload | undefined;
+}
+
+export interface TaskStoreOptions {
+    /** Payloads of finished tasks are evicted (least recently used first) above this estimated size */
+    memoryBudgetBytes: number;
+    /** Size at which a new segment file is started */
+    segmentBytes: number;
+}
+
+export const DEFAULT_TASK_STORE_OPTIONS: TaskStoreOptions = {
+    memoryBudgetBytes: 256 * 1024 * 1024,
+    segmentBytes: 32 * 1024 * 1024,
+};
+
+export interface TaskStoreStats {
+    /** Payloads of finished tasks held in memory, and their estimated size */
+    residentTasks: number;
+    residentBytes: number;
+    /** Payloads that only live on disk */
+    evictedTasks: number;
+    segments: number;
+    diskBytes: number;
+    /** Bytes on disk taken by superseded or deleted records */
+    deadBytes: number;
+}
+
+/**
+ * Where a payload record lives on disk.
+ */
+export interface RecordLocation {
+    segment: number;
+    offset: number;
+    length: number;
+    /** Payload shape when it was written, to tell whether it changed since */
+    fingerprint: string;
+}
+
+interface ResidentEntry {
+    holder: PayloadHolder;
+    bytes: number;
+}
+
+const SEGMENT_PATTERN = /^segment-(\d+)\.jsonl$/;
+
+/**
+ * Disk-backed store for task payloads (conversations and hook runs).
+ *
+ * Payloads of finished tasks are appended to JSONL segment files and kept in memory
+ * within a memory budget; beyond it, the least recently used ones are dropped and read
+ * back from disk when accessed. Payloads of active tasks are never evicted.
+ * Without a directory, the store keeps everything in memory.
+ *
+ * Segments of the previous session stay on disk until `adopt` takes over the records
+ * a restored session refers to (or `discardPrevious` drops them).
+ */
+export class TaskStore {
+    private options: TaskStoreOptions;
+    /** Finished tasks with a payload in memory, least recently used first */
+    private readonly resident = new Map<string, ResidentEntry>();
+    private residentBytes = 0;
+    /** Tasks that are active again; their payload stays in memory */
+    private readonly pinned = new Set<string>();
+    private readonly index = new Map<string, RecordLocation>();
+    private readonly segmentSizes = new Map<number, number>();
+    private activeSegment = 0;
+    private activeFd?: number;
+    /** Highest segment number in use; new segments are numbered after it */
+    private lastSegment = 0;
+    private deadBytes = 0;
+    /** Segment files found at startup that no adopted record refers to (yet) */
+    private previousSegments = new Set<number>();
+    /** Segments replaced by compaction, kept until the new locations of their records are recorded */
+    private retiredSegments: number[] = [];
+    private compaction?: Promise<void>;
+    private disposed = false;
+
+    constructor(private readonly directory?: string, options: Partial<TaskStoreOptions> = {}) {
+        this.options = { ...DEFAULT_TASK_STORE_OPTIONS, ...options };
+        if (directory !== undefined) {
+            fs.mkdirSync(directory, { recursive: true });
+            for (const file of fs.readdirSync(directory)) {
+                const match = SEGMENT_PATTERN.exec(file);
+                if (match) {
+                    const segment = Number(match[1]);
+                    this.previousSegments.add(segment);
+                    // New segments are numbered after the existing ones.
+                    this.lastSegment = Math.max(this.lastSegment, segment);
+                }
+            }
+        }
+    }
+
+    /**
+     * Takes over records of the previous session, so their payloads can be loaded.
+     * Segment files no record refers to are deleted.
+     */
+    adopt(records: Iterable<[string, RecordLocation]>) {
+        const liveBytes = new Map<number, number>();
+        for (const [id, location] of records) {
+            if (!this.previousSegments.has(location.segment) || this.index.has(id)) {
+                continue;
+            }
+            this.index.set(id, location);
+            liveBytes.set(location.segment, (liveBytes.get(location.segment) ?? 0) + location.length);
+        }
+        for (const [segment, live] of liveBytes) {
+            const size = fs.statSync(this.segmentPath(segment)).size;
+            this.segmentSizes.set(segment, size);
+            this.deadBytes += size - live;
+            this.previousSegments.delete(segment);
+        }
+        this.discardPrevious();
+        this.maybeCompact();
+    }
+
+    /** Deletes segment files of the previous session that were not adopted. */
+    discardPrevious() {
+        for (const segment of this.previousSegments) {
+            fs.rmSync(this.segmentPath(segment), { force: true });
+        }
+        this.previousSegments.clear();
+    }
+
+    /** Whether compaction moved records since the last `deleteRetiredSegments`. */
+    get hasRetiredSegments(): boolean {
+        return this.retiredSegments.length > 0;
+    }
+
+    /**
+     * Deletes the segments compaction replaced. Call it once the new locations of all records
+     * are recorded: until then, a crash leaves them referring to the old segments.
+     */
+    deleteRetiredSegments() {
+        for (const segment of this.retiredSegments) {
+            fs.rmSync(this.segmentPath(segment), { force: true });
+        }
+        this.retiredSegments = [];
+    }
+
+    /** Resolves once a compaction running in the background is done. */
+    compacted(): Promise<void> {
+        return this.compaction ?? Promise.resolve();
+    }
+
+    /** Where the task's payload is stored, if it was written. */
+    location(id: string): RecordLocation | undefined {
+        return this.index.get(id);
+    }
+
+    configure(options: Partial<TaskStoreOptions>) {
+        this.options = { ...this.options, ...options };
+        this.enforceBudget();
+    }
+
+    /**
+     * The task has finished (or was archived): write its payload to disk and let it be
+     * evicted from memory when the budget is exceeded.
+     */
+    release(holder: PayloadHolder) {
+        this.pinned.delete(holder.id);
+        if (this.directory === undefined || holder.residentPayload === undefined) {
+            return;
+        }
+        const bytes = this.persist(holder.id, holder.residentPayload);
+        this.setResident(holder, bytes);
+        this.enforceBudget();
+    }
+
+    /** The task is active again: keep its payload in memory. */
+    retain(holder: PayloadHolder) {
+        this.pinned.add(holder.id);
+        this.removeResident(holder.id);
+    }
+
+    /** Reads an evicted payload back from disk and makes it resident again. */
+    load(holder: PayloadHolder): TaskPayload {
+        const location = this.index.get(holder.id);
+        if (location === undefined || this.directory === undefined) {
+            // Never written: the task never had any payload.
+            holder.residentPayload = { conversation: [], hookRuns: [] };
+            return holder.residentPayload;
+        }
+
+        const payload = this.readRecord(location);
+        holder.residentPayload = payload;
+        if (!this.pinned.has(holder.id)) {
+            this.setResident(holder, location.length);
+            this.enforceBudget(holder.id);
+        }
+        return payload;
+    }
+
+    /** Forgets a deleted task. */
+    delete(holder: PayloadHolder) {
+        this.pinned.delete(holder.id);
+        this.removeResident(holder.id);
+        const location = this.index.get(holder.id);
+        if (location !== undefined) {
+            this.deadBytes += location.length;
+            this.index.delete(holder.id);
+        }
+        this.maybeCompact();
+    }
+
+    stats(): TaskStoreStats {
+        let diskBytes = 0;
+        for (const size of this.segmentSizes.values()) {
+            diskBytes += size;
+        }
+        return {
+            residentTasks: this.resident.size,
+            residentBytes: this.residentBytes,
+            evictedTasks: this.index.size - [...this.index.keys()].filter(id => this.resident.has(id) || this.pinned.has(id)).length,
+            segments: this.segmentSizes.size,
+            diskBytes,
+            deadBytes: this.deadBytes,
+        };
+    }
+
+    dispose() {
+        this.disposed = true;
+        this.closeActiveSegment();
+    }
+
+    private setResident(holder: PayloadHolder, bytes: number) {
+        this.removeResident(holder.id);
+        this.resident.set(holder.id, { holder, bytes });
+        this.residentBytes += bytes;
+    }
+
+    private removeResident(id: string) {
+        const entry = this.resident.get(id);
+        if (entry !== undefined) {
+            this.resident.delete(id);
+            this.residentBytes -= entry.bytes;
+        }
+    }
+
+    /**
+     * Evicts least recently used payloads until the resident size fits the budget.
+     * `keepId` is exempt: a payload that was just loaded for its caller.
+     */
+    private enforceBudget(keepId?: string) {
+        for (const [id, entry] of this.resident) {
+            if (this.residentBytes <= this.options.memoryBudgetBytes) {
+                break;
+            }
+            if (id === keepId) {
+                continue;
+            }
+            const payload = entry.holder.residentPayload;
+            // Messages can still arrive after a task has finished; write them before dropping the payload.
+            if (payload !== undefined && this.index.get(id)?.fingerprint !== fingerprint(payload)) {
+                this.persist(id, payload);
+            }
+            entry.holder.residentPayload = undefined;
+            this.removeResident(id);
+        }
+    }
+
+    /** Appends the payload unless the stored copy is current. Returns the record size. */
+    private persist(id: string, payload: TaskPayload): number {
+        const current = this.index.get(id);
+        const print = fingerprint(payload);
+        if (current !== undefined && current.fingerprint === print) {
+            return current.length;
+        }
+
+        const record = Buffer.from(JSON.stringify({ id, payload }) + '\n', 'utf8');
+        if (current !== undefined) {
+            this.deadBytes += current.length;
+        }
+        this.appendRecord(id, record, print);
+        this.maybeCompact();
+        return record.length;
+    }
+
+    private appendRecord(id: string, record: Buffer, print: string) {
+        if (this.activeFd === undefined || (this.segmentSizes.get(this.activeSegment) ?? 0) + record.length > this.options.segmentBytes) {
+            this.openNextSegment();
+        }
+        const offset = this.segmentSizes.get(this.activeSegment)!;
+        fs.writeSync(this.activeFd!, record);
+        this.segmentSizes.set(this.activeSegment, offset + record.length);
+
+        this.index.set(id, { segment: this.activeSegment, offset, length: record.length, fingerprint: print });
+    }
+
+    private readRecord(location: RecordLocation): TaskPayload {
+        const buffer = Buffer.alloc(location.length);
+        const fd = fs.openSync(this.segmentPath(location.segment), 'r');
+        try {
+            fs.readSync(fd, buffer, 0, location.length, location.offset);
+        } finally {
+            fs.closeSync(fd);
+        }
+        const { payload } = JSON.parse(buffer.toString('utf8'));
+        return {
+            conversation: payload.conversation,
+            hookRuns: payload.hookRuns.map((run: any) => HookRun.fromJSON(run)),
+        };
+    }
+
+    private openNextSegment() {
+        this.closeActiveSegment();
+        this.activeSegment = ++this.lastSegment;
+        this.activeFd = fs.openSync(this.segmentPath(this.activeSegment), 'a');
+        this.segmentSizes.set(this.activeSegment, 0);
+    }
+
+    private closeActiveSegment() {
+        if (this.activeFd !== undefined) {
+            fs.closeSync(this.activeFd);
+            this.activeFd = undefined;
+        }
+    }
+
+    private segmentPath(segment: number): string {
+        return path.join(this.directory!, `segment-${String(segment).padStart(6, '0')}.jsonl`);
+    }
+
+    /**
+     * Starts rewriting the live records into fresh segments once more than half of the
+     * disk space is taken by superseded or deleted records. The copy runs in the background,
+     * off the extension host thread; the old segments are then retired, not deleted:
+     * see `deleteRetiredSegments`.
+     */
+    private maybeCompact() {
+        if (this.compaction !== undefined || this.directory === undefined) {
+            return;
+        }
+        let diskBytes = 0;
+        for (const size of this.segmentSizes.values()) {
+            diskBytes += size;
+        }
+        if (this.deadBytes < this.options.segmentBytes || this.deadBytes * 2 < diskBytes) {
+            return;
+        }
+        this.compaction = this.compact()
+            .catch(error => console.error('Error compacting the task store:', error))
+            .finally(() => { this.compaction = undefined; });
+    }
+
+    private async compact() {
+        // Records written meanwhile go to a segment of their own, which is kept.
+        this.openNextSegment();
+        const oldSegments = [...this.segmentSizes.keys()].filter(segment => segment !== this.activeSegment);
+        const live = [...this.index.entries()].filter(([, location]) => location.segment !== this.activeSegment);
+
+        const sources = new Map<number, FileHandle>();
+        let target: { segment: number, handle: FileHandle } | undefined;
+        try {
+            for (const [id, location] of live) {
+                if (this.disposed) {
+                    return;
+                }
+                if (this.index.get(id) !== location) {
+                    // Written again or deleted meanwhile
+                    continue;
+                }
+                let source = sources.get(location.segment);
+                if (source === undefined) {
+                    source = await open(this.segmentPath(location.segment), 'r');
+                    sources.set(location.segment, source);
+                }
+                const record = Buffer.alloc(location.length);
+                await source.read(record, 0, location.length, location.offset);
+
+                if (target === undefined || this.segmentSizes.get(target.segment)! + record.length > this.options.segmentBytes) {
+                    await target?.handle.close();
+                    const segment = ++this.lastSegment;
+                    target = { segment, handle: await open(this.segmentPath(segment), 'a') };
+                    this.segmentSizes.set(segment, 0);
+                }
+                const offset = this.segmentSizes.get(target.segment)!;
+                await target.handle.write(record);
+                this.segmentSizes.set(target.segment, offset + record.length);
+                if (this.index.get(id) === location) {
+                    this.index.set(id, { ...location, segment: target.segment, offset });
+                }
+            }
+        } finally {
+            await Promise.all([...sources.values(), ...(target !== undefined ? [target.handle] : [])].map(handle => handle.close()));
+        }
+
+        // No record refers to the old segments any more.
+        for (const segment of oldSegments) {
+            this.segmentSizes.delete(segment);
+        }
+        let diskBytes = 0;
+        for (const size of this.segmentSizes.values()) {
+            diskBytes += size;
+        }
+        let liveBytes = 0;
+        for (const location of this.index.values()) {
+            liveBytes += location.length;
+        }
+        this.deadBytes = diskBytes - liveBytes;
+        this.retiredSegments.push(...oldSegments);
+    }
+}
+
+/**
+ * Conversations, hook runs and their commands mostly grow, so their lengths tell whether
+ * a payload changed since it was written. The last message and hook run can also change
+ * in place (a streamed message is finalized, a command's output comes in), so they are hashed.
+ */
+function fingerprint(payload: TaskPayload): string {
+    const commands = payload.hookRuns.reduce((total, run) => total + run.commands.length, 0);
+    const failed = payload.hookRuns.filter(run => run.failed).length;
+    const last = [payload.conversation[payload.conversation.length - 1] ?? null, payload.hookRuns[payload.hookRuns.length - 1] ?? null];
+    const tail = createHash('sha1').update(JSON.stringify(last)).digest('base64');
+    return `${payload.conversation.length}:${payload.hookRuns.length}:${commands}:${failed}:${tail}`;
+}
@@ -0,0 +1,64 @@
+import { Task } from './manager';
+
+type Column = Float64Array | unknown[];
+
+interface FieldDefinition {
+    /** Numeric fields are returned as Float64Array (NaN where missing), which Pyodide hands over as a buffer */
+    numeric: boolean;
+    value: (task: Task) => unknown;
+}
+
+const seconds = (ms: number | undefined) => ms === undefined ? NaN : ms / 1000;
+
+/**
+ * Fields of the task table, named as in Python
+ */
+const FIELDS: Record<string, FieldDefinition> = {
+    id: { numeric: false, value: task => task.id },
+    prompt: { numeric: false, value: task => task.prompt },
+    summary: { numeric: false, value: task => (task.summary ?? [task.prompt]).join(' ... ') },
+    mode: { numeric: false, value: task => task.mode },
+    client: { numeric: false, value: task => task.client },
+    status: { numeric: false, value: task => task.status },
+    archived: { numeric: false, value: task => task.archived },
+    from_cache: { numeric: false, value: task => task.fromCache },
+    depends_on: { numeric: false, value: task => [...task.dependsOn] },
+    priority: { numeric: true, value: task => task.priority },
+    retries: { numeric: true, value: task => task.retries },
+    attempts: { numeric: true, value: task => task.previousAttempts.length + 1 },
+    created_at: { numeric: true, value: task => seconds(task.createdAt) },
+    started_at: { numeric: true, value: task => seconds(task.startedAt) },
+    finished_at: { numeric: true, value: task => seconds(task.finishedAt) },
+    duration: {
+        numeric: true,
+        value: task => task.startedAt !== undefined && task.finishedAt !== undefined && task.finishedAt >= task.startedAt
+            ? (task.finishedAt - task.startedAt) / 1000
+            : NaN,
+    },
+};
+
+export const TASK_TABLE_FIELDS = Object.keys(FIELDS);
+
+export const DEFAULT_TASK_TABLE_FIELDS = ['id', 'status', 'mode', 'client', 'archived', 'priority', 'attempts', 'created_at', 'duration', 'summary'];
+
+/**
+ * Task metadata as one array per field, to hand many tasks to Python in a single call.
+ * Timestamps and durations are in seconds.
+ */
+export function tasksTable(tasks: Task[], fields: string[] = DEFAULT_TASK_TABLE_FIELDS): Record<string, Column> {
+    const unknown = fields.filter(field => !(field in FIELDS));
+    if (unknown.length > 0) {
+        throw new Error(`Unknown task fields: ${unknown.join(', ')}, expected any of: ${TASK_TABLE_FIELDS.join(', ')}`);
+    }
+
+    const table: Record<string, Column> = {};
+    for (const field of fields) {
+        const { numeric, value } = FIELDS[field];
+        const column: Column = numeric ? new Float64Array(tasks.length) : new Array(tasks.length);
+        for (let i = 0; i < tasks.length; i++) {
+            column[i] = value(tasks[i]);
+        }
+        table[field] = column;
+    }
+    return table;
+}
@@ -0,0 +1,120 @@
+import type { Task, TaskStatus, Tasks } from './manager';
+import { TaskQuery, taskQueryPredicate } from './taskQuery';
+
+export interface TaskStatusEvent {
+    taskId: string;
+    oldStatus: TaskStatus;
+    newStatus: TaskStatus;
+    /** Milliseconds since the epoch */
+    timestamp: number;
+    /** Set when the task was deleted; both statuses are then its last one */
+    removed?: boolean;
+}
+
+/**
+ * Which status changes a watcher receives: those of the given tasks, and of tasks matching
+ * the query, where `status` is the new status. The deletion of a task it would receive changes
+ * of is delivered whatever its status, since that task will not change status any more.
+ */
+export interface TaskWatchFilter extends TaskQuery {
+    taskIds?: string[];
+}
+
+export const DEFAULT_WATCH_QUEUE_SIZE = 1000;
+
+/**
+ * Status changes of tasks, queued for a subscriber that takes them with `next`.
+ *
+ * The queue is bounded: when it is full, the oldest event is dropped, so a slow subscriber
+ * never holds back the worker or takes up unbounded memory.
+ */
+export class TaskWatcher {
+    private readonly buffer: (TaskStatusEvent | undefined)[];
+    private start = 0;
+    private length = 0;
+    private waiting?: (event: TaskStatusEvent | undefined) => void;
+    private readonly matches: (task: Task) => boolean;
+    private readonly matchesTask: (task: Task) => boolean;
+    /** Events dropped because the queue was full */
+    dropped = 0;
+    closed = false;
+
+    constructor(private readonly tasks: Tasks, filter: TaskWatchFilter = {}, capacity: number = DEFAULT_WATCH_QUEUE_SIZE) {
+        if (!(capacity >= 1)) {
+            throw new Error(`The watch queue size must be at least 1, got ${capacity}`);
+        }
+        this.buffer = new Array(capacity);
+        const taskIds = filter.taskIds !== undefined ? new Set(filter.taskIds) : undefined;
+        const statuses = filter.status !== undefined ? new Set(filter.status) : undefined;
+        const query = taskQueryPredicate(filter);
+        this.matchesTask = task => (taskIds === undefined || taskIds.has(task.id)) && query(task);
+        this.matches = task => (statuses === undefined || statuses.has(task.status)) && this.matchesTask(task);
+        this.tasks.on('status', this.onStatus);
+        this.tasks.on('remove', this.onRemove);
+    }
+
+    /** The next event, waiting for one if none is queued; undefined once closed. */
+    next(): Promise<TaskStatusEvent | undefined> {
+        if (this.length > 0) {
+            return Promise.resolve(this.shift());
+        }
+        if (this.closed) {
+            return Promise.resolve(undefined);
+        }
+        // A second caller replaces the first, which gets undefined.
+        this.waiting?.(undefined);
+        return new Promise(resolve => this.waiting = resolve);
+    }
+
+    get queued(): number {
+        return this.length;
+    }
+
+    close() {
+        if (this.closed) {
+            return;
+        }
+        this.closed = true;
+        this.tasks.off('status', this.onStatus);
+        this.tasks.off('remove', this.onRemove);
+        const waiting = this.waiting;
+        this.waiting = undefined;
+        waiting?.(undefined);
+    }
+
+    private readonly onStatus = (task: Task, oldStatus: TaskStatus) => {
+        if (!this.matches(task)) {
+            return;
+        }
+        this.deliver({ taskId: task.id, oldStatus, newStatus: task.status, timestamp: Date.now() });
+    };
+
+    private readonly onRemove = (task: Task) => {
+        if (this.matchesTask(task)) {
+            this.deliver({ taskId: task.id, oldStatus: task.status, newStatus: task.status, timestamp: Date.now(), removed: true });
+        }
+    };
+
+    private deliver(event: TaskStatusEvent) {
+        if (this.waiting !== undefined) {
+            const waiting = this.waiting;
+            this.waiting = undefined;
+            waiting(event);
+            return;
+        }
+        if (this.length === this.buffer.length) {
+            this.shift();
+            this.dropped++;
+        }
+        this.buffer[(this.start + this.length) % this.buffer.length] = event;
+        this.length++;
+    }
+
+    private shift(): TaskStatusEvent {
+        const event = this.buffer[this.start]!;
+        this.buffer[this.start] = undefined;
+        this.start = (this.start + 1) % this.buffer.length;
+        this.length--;
+        return event;
+    }
+}
@@ -2,12 +2,14 @@ import * as vscode from 'vscode';
 import { Watchdog } from '../utils/asyncUtils';
 import { IClineController, Message, MessagesRx } from '../ai/controller';
 import { Task, Tasks } from './manager';
+import { ClientLimits } from './clientLimits';
 import { ICommandExecutor } from './interfaces';
 import * as telemetry from '../utils/telemetry';
 import { shellCommandProcessor } from '../utils/shellCommandProcessor';
 import { ClientFactory } from '../ai/clientFactory';
 import { ITaskClient, ClientConfig, ClientError } from '../ai/clientTypes';
 import { SuperCodeClient } from '../ai/supercodeClient';
+import { TIMEOUTS } from '../core/constants';
 
 
 export class Worker {
@@ -24,6 +26,11 @@ export class Worker {
 
     private _runningUserTask: boolean;
 
+    /** Limits on how fast tasks of each client are started */
+    readonly limits = new ClientLimits();
+    /** Wakes up the worker when a rate-limited client may start its next task */
+    private limitTimer?: NodeJS.Timeout;
+
     /**
      * Transfers the task object from the caller of `startTask` (or `resumeTask`) to the handler of `rootTaskStarted` event.
      */
@@ -133,6 +140,7 @@ export class Worker {
                     // Process shell commands in the task prompt before starting
                     try {
                         task.prompt = await shellCommandProcessor.processContent(task.prompt);
+                        this.tasks.taskChanged(task);
                     } catch (error) {
                         console.error('Error processing shell commands in task prompt:', error);
                         // Continue with original prompt if shell processing fails
@@ -263,6 +271,7 @@ export class Worker {
 
             // Update task prompt with processed version
             task.prompt = processedPrompt;
+            this.tasks.taskChanged(task);
 
             // Create SuperCode client with URL override if provided
             const clientConfig: ClientConfig = {
@@ -273,61 +282,28 @@ export class Worker {
 
             const client = ClientFactory.getInstance().createClient('supercode', clientConfig);
 
-            // Submit task to SuperCode
-            this.outputChannel.appendLine(`Submitting SuperCode task #${task.id}...`);
-            await client.submitTask(task);
-
-            // Wait 10 seconds before starting to poll
-            this.outputChannel.appendLine(`Waiting 5 seconds before polling SuperCode task #${task.id}...`);
-            await new Promise(resolve => setTimeout(resolve, 5000));
-
-            // Poll for completion - specifically wait for client status to be 'ready'
-            this.outputChannel.appendLine(`Polling SuperCode task #${task.id} for ready status...`);
-            let attempts = 0;
-            const maxAttempts = 300; // 5 minutes at 1-second intervals
-            
-            // Cast client to SuperCodeClient to access getClientStatus method
+            // Cast client to SuperCodeClient to access runTask method
             const supercodeClient = client as SuperCodeClient;
-            if (typeof supercodeClient.getClientStatus !== 'function') {
-                throw new Error('SuperCode client does not support getClientStatus method');
+            if (typeof supercodeClient.runTask !== 'function') {
+                throw new Error('SuperCode client does not support runTask method');
             }
-            
-            while (attempts < maxAttempts) {
-                try {
-                    const clientStatus = await supercodeClient.getClientStatus();
-                    
-                    // Check if client status is 'ready' (not busy and ready)
-                    if (!clientStatus.busy && clientStatus.status === 'ready') {
-                        // Run oncomplete hook
-                        const hookCompleteResult = await task.runHook('oncomplete');
-                        task.status = hookCompleteResult.failed ? 'error' : 'completed';
-                        this.outputChannel.appendLine(`SuperCode task #${task.id} completed - client status is ready`);
-                        return;
-                    }
-                    
-                    // Check for error status
-                    if (clientStatus.status === 'error') {
-                        task.status = 'error';
-                        this.outputChannel.appendLine(`SuperCode task #${task.id} failed - client status is error: ${clientStatus.message || 'Unknown error'}`);
-                        return;
-                    }
-                    
-                    // Log current status for debugging
-                    this.outputChannel.appendLine(`SuperCode task #${task.id} status: busy=${clientStatus.busy}, status=${clientStatus.status}`);
-                    
-                } catch (statusError) {
-                    this.outputChannel.appendLine(`Error getting SuperCode client status for task #${task.id}: ${statusError}`);
-                    // Continue polling in case it's a temporary issue
-                }
 
-                // Wait 1 second before checking again
-                await new Promise(resolve => setTimeout(resolve, 1000));
-                attempts++;
+            // Submit task to SuperCode and wait for the client status to return to 'ready'.
+            // Status changes are pushed by the server when it supports it, so there is no fixed polling delay.
+            this.outputChannel.appendLine(`Submitting SuperCode task #${task.id}...`);
+            const clientStatus = await supercodeClient.runTask(task, TIMEOUTS.SUPERCODE_TASK);
+
+            // Check for error status
+            if (clientStatus.status === 'error') {
+                task.status = 'error';
+                this.outputChannel.appendLine(`SuperCode task #${task.id} failed - client status is error: ${clientStatus.message || 'Unknown error'}`);
+                return;
             }
 
-            // Timeout - task took too long
-            this.outputChannel.appendLine(`SuperCode task #${task.id} timed out after 5 minutes`);
-            task.status = 'error';
+            // Run oncomplete hook
+            const hookCompleteResult = await task.runHook('oncomplete');
+            task.status = hookCompleteResult.failed ? 'error' : 'completed';
+            this.outputChannel.appendLine(`SuperCode task #${task.id} completed - client status is ready`);
 
         } catch (error) {
             this.outputChannel.appendLine(`Error handling SuperCode task #${task.id}: ${error}`);
@@ -360,7 +336,32 @@ export class Worker {
             return undefined;
         }
 
-        return this.tasks.getTask();
+        // Tasks of clients that hit their limits wait; the best task of any other client runs.
+        const task = this.tasks.getTask(client => this.limits.canStart(client));
+        if (task !== undefined) {
+            this.limits.started(task.client);
+        } else {
+            this.wakeupWhenLimitsAllow();
+        }
+        return task;
+    }
+
+    /** Call when the limits change. */
+    limitsChanged() {
+        clearTimeout(this.limitTimer);
+        this.limitTimer = undefined;
+        this._wakeupAgentWorkbook?.();
+    }
+
+    private wakeupWhenLimitsAllow() {
+        const waitMs = Math.min(...this.tasks.readyClients().map(client => this.limits.msUntilAvailable(client)));
+        if (!isFinite(waitMs) || this.limitTimer !== undefined) {
+            return;
+        }
+        this.limitTimer = setTimeout(() => {
+            this.limitTimer = undefined;
+            this._wakeupAgentWorkbook?.();
+        }, waitMs);
     }
 
     private async onRootTaskStarted(clineTaskId: string) {
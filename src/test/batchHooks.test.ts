@@ -0,0 +1,95 @@
+import * as assert from 'assert';
+import { BatchStats, BatchTracker } from '../tasks/batchHooks';
+import { Task, Tasks } from '../tasks/manager';
+
+const settled = () => new Promise(resolve => setImmediate(resolve));
+
+describe('Batch hooks', function () {
+    let tasks: Tasks;
+    let members: Task[];
+    let events: [string, BatchStats][];
+
+    beforeEach(() => {
+        tasks = new Tasks(undefined, 0);
+        members = ['a', 'b', 'c'].map(id => new Task(id, 'code', undefined, 'roo', undefined, id));
+        tasks.push(...members);
+        tasks.push(new Task('other', 'code', undefined, 'roo', undefined, 'other'));
+        events = [];
+        new BatchTracker(tasks, members, {
+            onStart: stats => events.push(['start', stats]),
+            onComplete: stats => events.push(['complete', stats]),
+        });
+    });
+
+    it('fires once when the first task starts and once when all have finished', async () => {
+        members.forEach(task => task.status = 'queued');
+        tasks.getTaskById('other')!.status = 'running';
+        assert.deepStrictEqual(events, []);
+
+        members[0].status = 'running';
+        members[1].status = 'running';
+        assert.deepStrictEqual(events.map(e => e[0]), ['start']);
+
+        members[0].status = 'completed';
+        members[1].status = 'error';
+        await settled();
+        assert.deepStrictEqual(events.map(e => e[0]), ['start']);
+
+        members[2].status = 'aborted';
+        await settled();
+        assert.deepStrictEqual(events.map(e => e[0]), ['start', 'complete']);
+        assert.deepStrictEqual(events[1][1].counts, { completed: 1, error: 1, aborted: 1 });
+        assert.strictEqual(events[1][1].tasks, 3);
+
+        members[0].submit(false);
+        members[0].status = 'completed';
+        await settled();
+        assert.strictEqual(events.length, 2);
+    });
+
+    it('waits for a failed task that is queued again in the same change', async () => {
+        members[1].status = 'completed';
+        members[2].status = 'completed';
+        members[0].status = 'error';
+        members[0].status = 'queued';
+        await settled();
+        assert.deepStrictEqual(events.map(e => e[0]), ['start']);
+    });
+
+    it('completes when the unfinished tasks are deleted', async () => {
+        members[0].status = 'completed';
+        tasks.removeTask('b');
+        tasks.removeTask('c');
+        await settled();
+        assert.deepStrictEqual(events.map(e => e[0]), ['start', 'complete']);
+        assert.strictEqual(events[1][1].deleted, 2);
+    });
+
+    it('completes when the queued tasks are cancelled', async () => {
+        members.forEach(task => task.submit(false));
+        members[0].status = 'running';
+        members[0].status = 'completed';
+        members[1].cancel(false);
+        await settled();
+        assert.deepStrictEqual(events.map(e => e[0]), ['start']);
+
+        members[2].cancel(false);
+        await settled();
+        assert.deepStrictEqual(events.map(e => e[0]), ['start', 'complete']);
+        assert.strictEqual(events[1][1].cancelled, 2);
+        assert.deepStrictEqual(events[1][1].counts, { completed: 1, prepared: 2 });
+        assert.strictEqual(tasks.listenerCount('status'), 0);
+    });
+
+    it('adds up how long the tasks ran', () => {
+        members.forEach((task, i) => {
+            task.status = 'running';
+            task.startedAt = 1000 * i;
+            task.status = 'completed';
+            task.finishedAt = 1000 * i + 500;
+        });
+        const stats = new BatchTracker(tasks, members, {}).stats();
+        assert.strictEqual(stats.taskDuration, 1.5);
+        assert.strictEqual(stats.duration, 2.5);
+    });
+});
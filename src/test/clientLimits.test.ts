@@ -0,0 +1,64 @@
+import * as assert from 'assert';
+import { ClientLimits } from '../tasks/clientLimits';
+import { Task, TaskClient, Tasks } from '../tasks/manager';
+
+describe('ClientLimits', function () {
+    let now: number;
+    let limits: ClientLimits;
+
+    beforeEach(() => {
+        now = 0;
+        limits = new ClientLimits(() => now);
+    });
+
+    it('never holds back clients without limits', () => {
+        for (let i = 0; i < 100; i++) {
+            assert.ok(limits.canStart('roo'));
+            limits.started('roo');
+        }
+    });
+
+    it('starts tasks at the configured rate after the burst', () => {
+        limits.configure('copilot', { perMinute: 6, burst: 2 });
+        limits.started('copilot');
+        limits.started('copilot');
+
+        assert.strictEqual(limits.msUntilAvailable('copilot'), 10_000);
+        now += 10_000;
+        assert.ok(limits.canStart('copilot'));
+    });
+
+    it('stops at the budget', () => {
+        limits.configure('supercode', { budget: 2 });
+        limits.started('supercode');
+        limits.started('supercode');
+
+        assert.strictEqual(limits.msUntilAvailable('supercode'), Infinity);
+        assert.deepStrictEqual(limits.status().supercode, { budget: 2, burst: 1, started: 2, waitMs: Infinity });
+        limits.configure('supercode', {});
+        assert.ok(limits.canStart('supercode'));
+    });
+
+    it('lets the tasks of other clients pass a held back one', () => {
+        const tasks = new Tasks(undefined, 0);
+        const clients: [string, TaskClient][] = [['c1', 'copilot'], ['c2', 'copilot'], ['r1', 'roo']];
+        for (const [id, client] of clients) {
+            tasks.push(Task.fromRecord({ id, prompt: id, mode: 'code', client, status: 'queued', archived: false, previousAttempts: [] }));
+        }
+        limits.configure('copilot', { perMinute: 1 });
+
+        const order: string[] = [];
+        let next: Task | undefined;
+        while ((next = tasks.getTask(client => limits.canStart(client))) !== undefined) {
+            limits.started(next.client);
+            next.status = 'running';
+            next.status = 'completed';
+            order.push(next.id);
+        }
+
+        assert.deepStrictEqual(order, ['c1', 'r1']);
+        assert.deepStrictEqual(tasks.readyClients(), ['copilot']);
+        now += 60_000;
+        assert.strictEqual(tasks.getTask(client => limits.canStart(client))?.id, 'c2');
+    });
+});
@@ -0,0 +1,66 @@
+import * as assert from 'assert';
+import { HookContext, HookPool, HookRun, executeHook, validateHookCommands } from '../utils/hooks';
+
+/** Records how many commands the pool ran at the same time */
+function trackOverlap(pool: HookPool): { max: number } {
+    const overlap = { max: 0 };
+    const limit = pool.limit.bind(pool);
+    let active = 0;
+    pool.limit = <T>(job: () => Promise<T>) => limit(async () => {
+        overlap.max = Math.max(overlap.max, ++active);
+        try {
+            return await job();
+        } finally {
+            active--;
+        }
+    });
+    return overlap;
+}
+
+describe('Hook commands', function () {
+    this.timeout(10_000);
+
+    let context: HookContext;
+
+    beforeEach(() => {
+        context = { cwd: undefined, commands: new HookPool(4), log: () => { } };
+    });
+
+    it('runs a list of commands in parallel', async () => {
+        const overlap = trackOverlap(context.commands);
+        const run = new HookRun('oncomplete');
+        await executeHook(run, () => ['sleep 0.4', 'sleep 0.4', 'sleep 0.4'], context);
+
+        assert.strictEqual(run.failed, false);
+        assert.strictEqual(run.commands.length, 3);
+        assert.strictEqual(overlap.max, 3);
+    });
+
+    it('stops sequential commands at the first failure, and fails the run', async () => {
+        const run = new HookRun('oncomplete');
+        await executeHook(run, () => ({ sequential: ['true', 'false', 'echo never'] }), context);
+
+        assert.strictEqual(run.failed, true);
+        assert.deepStrictEqual(run.commands.map(c => c.command), ['true', 'false']);
+    });
+
+    it('bounds how many commands run at the same time', async () => {
+        context.commands.concurrency = 1;
+        const overlap = trackOverlap(context.commands);
+        const run = new HookRun('oncomplete');
+        await executeHook(run, () => ({ parallel: ['sleep 0.3', { sequential: ['sleep 0.3'] }] }), context);
+
+        assert.strictEqual(run.commands.length, 2);
+        assert.strictEqual(overlap.max, 1);
+    });
+
+    it('rejects anything else without running any command', async () => {
+        assert.throws(() => validateHookCommands({ parallel: 'echo' }), /'parallel' has to be a list/);
+        assert.throws(() => validateHookCommands(['echo', 3]), /expected a command/);
+
+        const run = new HookRun('oncomplete');
+        await executeHook(run, () => ['echo a', { concurrent: ['echo b'] }] as any, context);
+        assert.strictEqual(run.failed, true);
+        assert.strictEqual(run.commands.length, 0);
+    });
+});
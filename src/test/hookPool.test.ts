@@ -0,0 +1,47 @@
+import * as assert from 'assert';
+import { HookPool, Hooks, setHookBlocking } from '../utils/hooks';
+
+describe('Background hooks', function () {
+    it('runs at most `concurrency` hooks at a time, in order', async () => {
+        const pool = new HookPool(2);
+        const started: number[] = [];
+        const finish: (() => void)[] = [];
+        for (let i = 0; i < 4; i++) {
+            pool.run(() => new Promise<void>(resolve => { started.push(i); finish.push(resolve); }));
+        }
+
+        assert.deepStrictEqual(started, [0, 1]);
+        assert.deepStrictEqual([pool.active, pool.queued], [2, 2]);
+
+        finish[0]();
+        await new Promise(resolve => setImmediate(resolve));
+        assert.deepStrictEqual(started, [0, 1, 2]);
+
+        finish[1]();
+        finish[2]();
+        await new Promise(resolve => setImmediate(resolve));
+        finish[3]();
+        await pool.idle();
+        assert.deepStrictEqual([pool.active, pool.queued], [0, 0]);
+    });
+
+    it('goes on after a failed hook', async () => {
+        const pool = new HookPool(1);
+        let ran = false;
+        pool.run(() => Promise.reject(new Error('failed')));
+        pool.run(async () => { ran = true; });
+
+        await pool.idle();
+        assert.ok(ran);
+    });
+
+    it('marks hook kinds as non-blocking', () => {
+        const hooks: Hooks = {};
+        setHookBlocking(hooks, 'oncomplete', false);
+        setHookBlocking(hooks, 'onpause', false);
+        setHookBlocking(hooks, 'oncomplete', false);
+        assert.deepStrictEqual(hooks.nonBlocking, ['onpause', 'oncomplete']);
+        setHookBlocking(hooks, 'onpause', true);
+        assert.deepStrictEqual(hooks.nonBlocking, ['oncomplete']);
+    });
+});
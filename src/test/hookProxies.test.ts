@@ -0,0 +1,50 @@
+import * as assert from 'assert';
+import { Task, Tasks } from '../tasks/manager';
+import { HookFunction, HookProxyRegistry } from '../utils/hooks';
+
+function proxy(destroyed: HookFunction[]): HookFunction {
+    const hook: HookFunction & { destroy?: () => void } = () => undefined;
+    hook.destroy = () => destroyed.push(hook);
+    return hook;
+}
+
+describe('Hook proxies', function () {
+    it('destroys a hook once its last holder releases it', () => {
+        const destroyed: HookFunction[] = [];
+        const forgotten: HookFunction[] = [];
+        const registry = new HookProxyRegistry();
+        registry.onDestroy = hook => forgotten.push(hook);
+        const shared = proxy(destroyed);
+        const hooks = { onstart: shared, oncomplete: shared };
+
+        registry.retain(hooks);
+        registry.retainHook(shared);
+        assert.deepStrictEqual(registry.stats(), { alive: 1, references: 3 });
+
+        registry.release(hooks);
+        assert.deepStrictEqual(destroyed, []);
+        registry.releaseHook(shared);
+        assert.deepStrictEqual(destroyed, [shared]);
+        assert.deepStrictEqual(forgotten, [shared]);
+        assert.deepStrictEqual(registry.stats(), { alive: 0, references: 0 });
+    });
+
+    it('releases the hooks of deleted and archived tasks', () => {
+        const destroyed: HookFunction[] = [];
+        const tasks = new Tasks(undefined, 0);
+        const hooks = { oncomplete: proxy(destroyed) };
+        const a = new Task('a', 'code', hooks, 'roo', undefined, 'a');
+        const b = new Task('b', 'code', hooks, 'roo', undefined, 'b');
+        tasks.push(a, b);
+        assert.deepStrictEqual(tasks.hookProxies.stats(), { alive: 1, references: 2 });
+
+        tasks.removeTask('a');
+        assert.deepStrictEqual(tasks.hookProxies.stats(), { alive: 1, references: 1 });
+
+        b.archive(false);
+        assert.strictEqual(b.hooks, undefined);
+        assert.deepStrictEqual(destroyed, [hooks.oncomplete]);
+        tasks.removeTask('b');
+        assert.deepStrictEqual(tasks.hookProxies.stats(), { alive: 0, references: 0 });
+    });
+});
@@ -0,0 +1,182 @@
+import * as assert from 'assert';
+import * as http from 'http';
+import { AddressInfo } from 'net';
+import { HttpClient } from '../utils/http';
+
+/**
+ * Local server that counts TCP connections and the peak number of concurrent requests.
+ */
+class StubServer {
+    connections = 0;
+    inFlight = 0;
+    peakInFlight = 0;
+    handler: (req: http.IncomingMessage, res: http.ServerResponse) => void = (_req, res) => {
+        res.writeHead(200, { 'Content-Type': 'application/json' });
+        res.end('{"ok":true}');
+    };
+    private server: http.Server;
+
+    constructor() {
+        this.server = http.createServer((req, res) => {
+            this.inFlight++;
+            this.peakInFlight = Math.max(this.peakInFlight, this.inFlight);
+            res.on('close', () => this.inFlight--);
+            this.handler(req, res);
+        });
+        this.server.on('connection', () => this.connections++);
+    }
+
+    async start(): Promise<string> {
+        await new Promise<void>(resolve => this.server.listen(0, '127.0.0.1', resolve));
+        return `http://127.0.0.1:${(this.server.address() as AddressInfo).port}`;
+    }
+
+    stop(): Promise<void> {
+        this.server.closeAllConnections();
+        return new Promise(resolve => this.server.close(() => resolve()));
+    }
+}
+
+/** Plain `http.get` without an agent: a new connection per request, as before pooling. */
+function unpooledGet(url: string): Promise<void> {
+    return new Promise((resolve, reject) => {
+        http.get(url, { agent: false }, res => {
+            res.resume();
+            res.on('end', () => resolve());
+        }).on('error', reject);
+    });
+}
+
+describe('HttpClient', function () {
+    let server: StubServer;
+    let baseUrl: string;
+    let client: HttpClient;
+
+    beforeEach(async () => {
+        server = new StubServer();
+        baseUrl = await server.start();
+        client = new HttpClient();
+    });
+
+    afterEach(async () => {
+        client.dispose();
+        await server.stop();
+    });
+
+    it('buffers the response of a request', async () => {
+        server.handler = (req, res) => {
+            let body = '';
+            req.on('data', chunk => body += chunk);
+            req.on('end', () => {
+                res.writeHead(201, { 'Content-Type': 'text/plain' });
+                res.end(`${req.method} ${req.headers['content-type']} ${body}`);
+            });
+        };
+        const result = await client.request({ method: 'POST', url: `${baseUrl}/echo`, body: 'hi' });
+
+        assert.strictEqual(result.success, true);
+        assert.strictEqual(result.statusCode, 201);
+        assert.strictEqual(result.response, 'POST text/plain; charset=utf-8 hi');
+        assert.strictEqual(result.headers?.['content-type'], 'text/plain');
+    });
+
+    it('reuses one connection for sequential requests', async () => {
+        for (let i = 0; i < 20; i++) {
+            const result = await client.request({ method: 'GET', url: `${baseUrl}/status` });
+            assert.strictEqual(result.success, true);
+        }
+
+        assert.strictEqual(server.connections, 1);
+        assert.strictEqual(client.stats().reusedSockets, 19);
+        assert.strictEqual(client.stats().idleSockets, 1);
+    });
+
+    it('caps concurrent sockets per origin', async () => {
+        client.configure({ maxSocketsPerOrigin: 2 });
+        server.handler = (_req, res) => setTimeout(() => res.end('done'), 20);
+        const results = await Promise.all(Array.from({ length: 8 }, () => client.request({ method: 'GET', url: baseUrl })));
+
+        assert.ok(results.every(result => result.success));
+        assert.strictEqual(server.peakInFlight, 2);
+        assert.strictEqual(server.connections, 2);
+    });
+
+    it('streams the response body in chunks', async () => {
+        server.handler = (_req, res) => {
+            res.writeHead(200);
+            res.write('first,');
+            setTimeout(() => res.end('second'), 20);
+        };
+        const response = await client.stream({ method: 'GET', url: baseUrl });
+        const chunks: string[] = [];
+        let chunk: Uint8Array | undefined;
+        while ((chunk = await response.read()) !== undefined) {
+            chunks.push(Buffer.from(chunk).toString());
+        }
+
+        assert.deepStrictEqual(chunks, ['first,', 'second']);
+    });
+
+    it('closes a partially read response without blocking the pool', async () => {
+        client.configure({ maxSocketsPerOrigin: 1 });
+        server.handler = (req, res) => {
+            res.writeHead(200);
+            res.write('partial');
+            if (req.url === '/done') {
+                res.end();
+            }
+        };
+        const response = await client.stream({ method: 'GET', url: `${baseUrl}/endless` });
+        await response.read();
+        response.close();
+
+        const result = await client.request({ method: 'GET', url: `${baseUrl}/done` });
+        assert.strictEqual(result.response, 'partial');
+    });
+
+    it('lets requests in flight finish when reconfigured', async () => {
+        const release: (() => void)[] = [];
+        server.handler = (_req, res) => release.push(() => res.end('done'));
+        const inFlight = Array.from({ length: 3 }, () => client.request({ method: 'GET', url: baseUrl }));
+        while (release.length < 3) {
+            await new Promise(resolve => setImmediate(resolve));
+        }
+
+        client.configure({ maxSocketsPerOrigin: 4 });
+        release.forEach(end => end());
+        const results = await Promise.all(inFlight);
+        assert.ok(results.every(result => result.success && result.response === 'done'));
+
+        // The previous sockets are closed instead of going back to a pool.
+        while (client.stats().activeSockets + client.stats().idleSockets > 0) {
+            await new Promise(resolve => setImmediate(resolve));
+        }
+        server.handler = (_req, res) => res.end('again');
+        assert.strictEqual((await client.request({ method: 'GET', url: baseUrl })).response, 'again');
+        assert.strictEqual(server.connections, 4);
+    });
+
+    it('reports timeouts and unreachable servers without throwing', async () => {
+        server.handler = () => { /* never answers */ };
+        const timedOut = await client.request({ method: 'GET', url: baseUrl, timeout: 50 });
+        assert.deepStrictEqual(timedOut, { success: false, error: 'Request timeout' });
+
+        const unreachable = await client.request({ method: 'GET', url: 'http://127.0.0.1:1/' });
+        assert.strictEqual(unreachable.success, false);
+        await assert.rejects(client.stream({ method: 'GET', url: 'not a url' }), /Invalid URL/);
+    });
+
+    it('opens one connection where requests without the pool open one each', async () => {
+        const count = 50;
+        for (let i = 0; i < count; i++) {
+            await unpooledGet(baseUrl);
+        }
+        assert.strictEqual(server.connections, count);
+
+        for (let i = 0; i < count; i++) {
+            await client.request({ method: 'GET', url: baseUrl });
+        }
+        assert.strictEqual(server.connections, count + 1);
+        assert.strictEqual(client.stats().reusedSockets, count - 1);
+    });
+});
@@ -0,0 +1,295 @@
+import * as assert from 'assert';
+import * as fs from 'fs';
+import * as http from 'http';
+import * as os from 'os';
+import * as path from 'path';
+import { AddressInfo } from 'net';
+import { httpRequest } from '../utils/http';
+import { NtfyDispatcher, buildDigest, encodeHeaderValue } from '../utils/ntfyDispatcher';
+import { TokenBucket } from '../utils/rateLimit';
+
+interface ReceivedMessage {
+    method: string;
+    url: string;
+    headers: http.IncomingHttpHeaders;
+    body: string;
+    at: number;
+}
+
+/**
+ * Minimal stand-in for an ntfy server. `respond` decides the status code of each request.
+ */
+class StubNtfyServer {
+    readonly received: ReceivedMessage[] = [];
+    respond: (req: http.IncomingMessage, index: number) => number = () => 200;
+    private server: http.Server;
+    private requests = 0;
+
+    constructor() {
+        this.server = http.createServer((req, res) => {
+            let body = '';
+            req.on('data', chunk => body += chunk);
+            req.on('end', () => {
+                const status = this.respond(req, this.requests++);
+                if (status >= 200 && status < 300) {
+                    this.received.push({ method: req.method ?? '', url: req.url ?? '', headers: req.headers, body, at: Date.now() });
+                }
+                res.writeHead(status, { 'Content-Type': 'application/json' });
+                res.end('{}');
+            });
+        });
+    }
+
+    async start(): Promise<string> {
+        await new Promise<void>(resolve => this.server.listen(0, '127.0.0.1', resolve));
+        return `http://127.0.0.1:${(this.server.address() as AddressInfo).port}`;
+    }
+
+    stop(): Promise<void> {
+        return new Promise(resolve => this.server.close(() => resolve()));
+    }
+}
+
+describe('NtfyDispatcher', function () {
+    let server: StubNtfyServer;
+    let baseUrl: string;
+    let spoolDir: string;
+
+    beforeEach(async () => {
+        server = new StubNtfyServer();
+        baseUrl = await server.start();
+        spoolDir = fs.mkdtempSync(path.join(os.tmpdir(), 'ntfy-spool-'));
+    });
+
+    afterEach(async () => {
+        await server.stop();
+        fs.rmSync(spoolDir, { recursive: true, force: true });
+    });
+
+    const message = (body: string, extra: Partial<{ coalesceKey: string, headers: Record<string, string> }> = {}) => ({
+        url: `${baseUrl}/alerts`,
+        body,
+        headers: extra.headers ?? { Priority: '3' },
+        coalesceKey: extra.coalesceKey,
+    });
+
+    it('delivers a message with its headers', async () => {
+        const dispatcher = new NtfyDispatcher(httpRequest);
+        const delivery = await dispatcher.publish(message('hello', { headers: { Priority: '4', Title: 'Hi' } }));
+
+        assert.strictEqual(delivery.success, true);
+        assert.strictEqual(delivery.attempts, 1);
+        assert.strictEqual(server.received.length, 1);
+        assert.strictEqual(server.received[0].url, '/alerts');
+        assert.strictEqual(server.received[0].body, 'hello');
+        assert.strictEqual(server.received[0].headers['title'], 'Hi');
+    });
+
+    it('rate limits per topic once the burst is used up', async () => {
+        const dispatcher = new NtfyDispatcher(httpRequest, { ratePerMinute: 600, burst: 2 });
+        const started = Date.now();
+        await Promise.all([1, 2, 3, 4].map(i => dispatcher.publish(message(`m${i}`))));
+
+        // 2 messages go out immediately, the other 2 wait ~100 ms each.
+        assert.ok(Date.now() - started >= 180, `finished too fast: ${Date.now() - started} ms`);
+        assert.deepStrictEqual(server.received.map(m => m.body), ['m1', 'm2', 'm3', 'm4']);
+    });
+
+    it('rejects rate limits that would never let a message through', () => {
+        assert.throws(() => new NtfyDispatcher(httpRequest, { ratePerMinute: 0 }), /rate limit must be above 0/);
+        const dispatcher = new NtfyDispatcher(httpRequest);
+        assert.throws(() => dispatcher.configure({ ratePerMinute: -1 }), /rate limit must be above 0/);
+        assert.throws(() => dispatcher.configure({ burst: 0 }), /burst must be at least 1/);
+    });
+
+    it('coalesces messages with the same key into one digest', async () => {
+        const dispatcher = new NtfyDispatcher(httpRequest, { coalesceWindowMs: 60_000 });
+        const accepted = [
+            await dispatcher.publish(message('task a done', { coalesceKey: 'tasks completed', headers: { Priority: '3', Tags: 'ok' } })),
+            await dispatcher.publish(message('task b done', { coalesceKey: 'tasks completed', headers: { Priority: '5', Tags: 'ok,late' } })),
+            await dispatcher.publish(message('task c done', { coalesceKey: 'tasks completed' })),
+        ];
+        assert.ok(accepted.every(d => d.queued));
+        assert.strictEqual(server.received.length, 0);
+
+        const [delivery] = await dispatcher.flush();
+        assert.strictEqual(delivery.success, true);
+        assert.strictEqual(delivery.messages, 3);
+        assert.strictEqual(server.received.length, 1);
+        assert.strictEqual(server.received[0].headers['title'], '3 tasks completed');
+        assert.strictEqual(server.received[0].headers['priority'], '5');
+        assert.strictEqual(server.received[0].headers['tags'], 'ok,late');
+        assert.strictEqual(server.received[0].body, '- task a done\n- task b done\n- task c done');
+    });
+
+    it('sends the digest when the coalescing window ends', async () => {
+        const dispatcher = new NtfyDispatcher(httpRequest, { coalesceWindowMs: 30 });
+        await dispatcher.publish(message('one', { coalesceKey: 'events' }));
+        await dispatcher.publish(message('two', { coalesceKey: 'events' }));
+        await new Promise(resolve => setTimeout(resolve, 150));
+
+        assert.strictEqual(server.received.length, 1);
+        assert.strictEqual(server.received[0].headers['title'], '2 events');
+    });
+
+    it('retries transient failures with backoff', async () => {
+        server.respond = (_req, index) => index < 2 ? 503 : 200;
+        const dispatcher = new NtfyDispatcher(httpRequest, { retryBaseMs: 10, retryMaxMs: 20 });
+        const delivery = await dispatcher.publish(message('eventually'));
+
+        assert.strictEqual(delivery.success, true);
+        assert.strictEqual(delivery.attempts, 3);
+        assert.deepStrictEqual(server.received.map(m => m.body), ['eventually']);
+    });
+
+    it('does not retry or spool rejected messages', async () => {
+        server.respond = () => 400;
+        const spoolFile = path.join(spoolDir, 'spool.jsonl');
+        const dispatcher = new NtfyDispatcher(httpRequest, { retryBaseMs: 10, spoolFile });
+        const delivery = await dispatcher.publish(message('bad'));
+
+        assert.strictEqual(delivery.success, false);
+        assert.strictEqual(delivery.attempts, 1);
+        assert.strictEqual(delivery.spooled, false);
+        assert.strictEqual(await dispatcher.spooledCount(), 0);
+    });
+
+    it('spools undeliverable messages and replays them when the server recovers', async () => {
+        let down = true;
+        server.respond = () => down ? 502 : 200;
+        const spoolFile = path.join(spoolDir, 'spool.jsonl');
+        const dispatcher = new NtfyDispatcher(httpRequest, { maxRetries: 1, retryBaseMs: 5, retryMaxMs: 5, spoolFile });
+
+        const first = await dispatcher.publish(message('lost 1'));
+        const second = await dispatcher.publish(message('lost 2'));
+        assert.strictEqual(first.spooled, true);
+        assert.strictEqual(second.spooled, true);
+        assert.strictEqual(await dispatcher.spooledCount(), 2);
+
+        down = false;
+        assert.strictEqual(await dispatcher.replaySpool(), 2);
+        assert.strictEqual(await dispatcher.spooledCount(), 0);
+        assert.deepStrictEqual(server.received.map(m => m.body), ['lost 1', 'lost 2']);
+        dispatcher.dispose();
+    });
+
+    it('keeps spooled messages on disk until each is delivered, and stops while the server is down', async () => {
+        let down = true;
+        let requests = 0;
+        const spoolFile = path.join(spoolDir, 'spool.jsonl');
+        const spooledBodies = () => !fs.existsSync(spoolFile) ? [] : fs.readFileSync(spoolFile, 'utf8').split('\n').filter(line => line !== '').map(line => JSON.parse(line).body);
+        const onDisk: string[][] = [];
+        server.respond = () => {
+            requests++;
+            onDisk.push(spooledBodies());
+            return down || requests > 1 ? 502 : 200;
+        };
+        const dispatcher = new NtfyDispatcher(httpRequest, { maxRetries: 2, retryBaseMs: 5, retryMaxMs: 5, spoolFile });
+        for (const body of ['m1', 'm2', 'm3']) {
+            await dispatcher.publish(message(body));
+        }
+
+        requests = 0;
+        onDisk.length = 0;
+        assert.strictEqual(await dispatcher.replaySpool(), 0);
+        // One attempt for the oldest message, no retries and no attempts for the others.
+        assert.strictEqual(requests, 1);
+        assert.deepStrictEqual(spooledBodies(), ['m1', 'm2', 'm3']);
+
+        down = false;
+        requests = 0;
+        onDisk.length = 0;
+        assert.strictEqual(await dispatcher.replaySpool(), 1);
+        assert.deepStrictEqual(onDisk, [['m1', 'm2', 'm3'], ['m2', 'm3']]);
+        assert.deepStrictEqual(spooledBodies(), ['m2', 'm3']);
+        assert.deepStrictEqual(server.received.map(m => m.body), ['m1']);
+        dispatcher.dispose();
+    });
+
+    it('replays the spool after the next successful delivery', async () => {
+        let down = true;
+        server.respond = () => down ? 500 : 200;
+        const spoolFile = path.join(spoolDir, 'spool.jsonl');
+        const dispatcher = new NtfyDispatcher(httpRequest, { maxRetries: 0, spoolFile });
+
+        await dispatcher.publish(message('queued while down'));
+        down = false;
+        await dispatcher.publish(message('back up'));
+        await dispatcher.replaySpool();
+
+        assert.deepStrictEqual(server.received.map(m => m.body).sort(), ['back up', 'queued while down']);
+        dispatcher.dispose();
+    });
+
+    it('spools unreachable servers', async () => {
+        const spoolFile = path.join(spoolDir, 'spool.jsonl');
+        const dispatcher = new NtfyDispatcher(httpRequest, { maxRetries: 0, timeoutMs: 500, spoolFile });
+        const delivery = await dispatcher.publish({ url: 'http://127.0.0.1:1/alerts', body: 'nobody home', headers: {} });
+
+        assert.strictEqual(delivery.success, false);
+        assert.strictEqual(delivery.spooled, true);
+        dispatcher.dispose();
+    });
+
+    it('uploads attachments from disk with PUT and reports progress', async () => {
+        const attachPath = path.join(spoolDir, 'build.log');
+        fs.writeFileSync(attachPath, 'x'.repeat(1024 * 1024));
+        const dispatcher = new NtfyDispatcher(httpRequest, { progressIntervalMs: 0 });
+        const progress: Array<[number, number]> = [];
+        const delivery = await dispatcher.publish(
+            { ...message('Build done ✓'), attachPath },
+            (sent, total) => progress.push([sent, total]));
+
+        assert.strictEqual(delivery.success, true);
+        const received = server.received[0];
+        assert.strictEqual(received.method, 'PUT');
+        assert.strictEqual(received.headers['filename'], 'build.log');
+        assert.strictEqual(received.headers['message'], encodeHeaderValue('Build done ✓'));
+        assert.strictEqual(received.body.length, 1024 * 1024);
+        assert.ok(progress.length > 1, 'expected several progress reports');
+        assert.deepStrictEqual(progress[progress.length - 1], [1024 * 1024, 1024 * 1024]);
+    });
+
+    it('rejects attachments above the size limit without uploading', async () => {
+        const attachPath = path.join(spoolDir, 'big.bin');
+        fs.writeFileSync(attachPath, Buffer.alloc(2048));
+        const dispatcher = new NtfyDispatcher(httpRequest, { maxAttachmentBytes: 1024 });
+        const delivery = await dispatcher.publish({ ...message('too big'), attachPath });
+        const missing = await dispatcher.publish({ ...message('gone'), attachPath: path.join(spoolDir, 'missing.bin') });
+
+        assert.strictEqual(delivery.success, false);
+        assert.match(delivery.error ?? '', /above the 1 KB limit/);
+        assert.match(missing.error ?? '', /not found/);
+        assert.strictEqual(server.received.length, 0);
+    });
+});
+
+describe('buildDigest', function () {
+    it('sends a single message unchanged', () => {
+        const msg = { url: 'http://x/t', body: 'only', headers: { Title: 'T' }, coalesceKey: 'things' };
+        assert.strictEqual(buildDigest([msg]), msg);
+    });
+});
+
+describe('encodeHeaderValue', function () {
+    it('keeps plain ASCII and encodes everything else', () => {
+        assert.strictEqual(encodeHeaderValue('Build done'), 'Build done');
+        assert.strictEqual(encodeHeaderValue('line 1\nline 2'), '=?UTF-8?B?bGluZSAxCmxpbmUgMg==?=');
+    });
+});
+
+describe('TokenBucket', function () {
+    it('refills at the configured rate', () => {
+        let now = 0;
+        const bucket = new TokenBucket(60, 2, () => now);
+        assert.ok(bucket.tryTake());
+        assert.ok(bucket.tryTake());
+        assert.ok(!bucket.tryTake());
+        assert.strictEqual(bucket.msUntilAvailable(), 1000);
+
+        now = 1000;
+        assert.ok(bucket.tryTake());
+        now = 10_000;
+        assert.strictEqual(bucket.available, 2);
+    });
+});
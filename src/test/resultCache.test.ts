@@ -0,0 +1,108 @@
+import * as assert from 'assert';
+import { Message } from '../ai/controller';
+import { ResultCache, resultCacheKey } from '../tasks/resultCache';
+import { Task, Tasks } from '../tasks/manager';
+
+const conversation = (text: string): Message[] => [{ type: 'say', say: 'text', text }];
+
+function task(tasks: Tasks, prompt: string, dependsOn: string[] = []): Task {
+    const created = new Task(prompt, 'code');
+    created.cacheKey = resultCacheKey(prompt, 'code', 'roo');
+    created.dependsOn = dependsOn;
+    tasks.push(created);
+    return created;
+}
+
+function run(task: Task, text: string) {
+    task.submit(false);
+    task.status = 'running';
+    task.conversation.push(...conversation(text));
+    task.status = 'completed';
+}
+
+describe('ResultCache', function () {
+    let now: number;
+    let cache: ResultCache;
+
+    beforeEach(() => {
+        now = 0;
+        cache = new ResultCache({ ttlMs: 1000, maxEntries: 2 }, () => now);
+    });
+
+    it('keys on the prompt, mode and client', () => {
+        assert.strictEqual(resultCacheKey('p', 'code', 'roo'), resultCacheKey('p', 'code', 'roo'));
+        assert.notStrictEqual(resultCacheKey('p', 'code', 'roo'), resultCacheKey('p', 'ask', 'roo'));
+        assert.notStrictEqual(resultCacheKey('p', 'code', 'roo'), resultCacheKey('p', 'code', 'copilot'));
+    });
+
+    it('expires results after the TTL', () => {
+        cache.put('a', conversation('a'));
+        now = 1000;
+        assert.deepStrictEqual(cache.get('a'), conversation('a'));
+        now = 1001;
+        assert.strictEqual(cache.get('a'), undefined);
+        assert.deepStrictEqual(cache.stats(), { entries: 0, bytes: 0, hits: 1, misses: 1, evictions: 0, expired: 1 });
+    });
+
+    it('drops the least recently used results beyond the limits', () => {
+        cache.put('a', conversation('a'));
+        cache.put('b', conversation('b'));
+        cache.get('a');
+        cache.put('c', conversation('c'));
+
+        assert.strictEqual(cache.get('b'), undefined);
+        assert.ok(cache.get('a') !== undefined && cache.get('c') !== undefined);
+
+        cache.configure({ maxBytes: 0 });
+        assert.strictEqual(cache.stats().entries, 0);
+        assert.strictEqual(cache.stats().evictions, 3);
+    });
+});
+
+describe('Task result caching', function () {
+    let tasks: Tasks;
+
+    beforeEach(() => {
+        tasks = new Tasks(undefined, 0);
+    });
+
+    it('completes an identical task with the cached conversation instead of queuing it', () => {
+        run(task(tasks, 'analyze'), 'result');
+
+        const duplicate = task(tasks, 'analyze');
+        duplicate.submit(false);
+
+        assert.strictEqual(duplicate.status, 'completed');
+        assert.ok(duplicate.fromCache);
+        assert.deepStrictEqual(duplicate.conversation, conversation('result'));
+        assert.strictEqual(tasks.getTask(), undefined);
+        assert.strictEqual(tasks.resultCache.stats().hits, 1);
+    });
+
+    it('runs tasks that were not cached, failed, or are resubmitted', () => {
+        const failed = task(tasks, 'failing');
+        failed.submit(false);
+        failed.status = 'running';
+        failed.status = 'error';
+
+        const other = task(tasks, 'failing');
+        other.submit(false);
+        assert.strictEqual(other.status, 'queued');
+
+        run(task(tasks, 'analyze'), 'result');
+        const duplicate = task(tasks, 'analyze');
+        duplicate.submit(false);
+        duplicate.submit(false);
+        assert.strictEqual(duplicate.status, 'queued');
+        assert.ok(!duplicate.fromCache);
+    });
+
+    it('runs tasks with dependencies', () => {
+        run(task(tasks, 'analyze'), 'result');
+        const dependency = task(tasks, 'setup');
+        const dependent = task(tasks, 'analyze', [dependency.id]);
+        dependent.submit(false);
+
+        assert.strictEqual(dependent.status, 'queued');
+    });
+});
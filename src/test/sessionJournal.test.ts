@@ -0,0 +1,242 @@
+import * as assert from 'assert';
+import * as fs from 'fs';
+import * as os from 'os';
+import * as path from 'path';
+import { Message } from '../ai/controller';
+import { Task, TaskRecord, Tasks } from '../tasks/manager';
+import { SessionJournal, SessionJournalOptions } from '../tasks/sessionJournal';
+import { TaskStore, TaskStoreOptions } from '../tasks/taskStore';
+
+function record(id: string, status: TaskRecord['status'] = 'prepared', prompt: string = `prompt ${id}`): TaskRecord {
+    return { id, prompt, mode: 'code', client: 'roo', status, archived: false, previousAttempts: [], summary: [prompt] };
+}
+
+describe('SessionJournal', function () {
+    let directory: string;
+    let sessionDirectory: string;
+    let storeDirectory: string;
+
+    /** A fresh extension host: new tasks, task store and journal over the same directories */
+    function reload(options: Partial<SessionJournalOptions> = {}, storeOptions: Partial<TaskStoreOptions> = {}): { tasks: Tasks, journal: SessionJournal } {
+        const tasks = new Tasks(new TaskStore(storeDirectory, storeOptions));
+        return { tasks, journal: new SessionJournal(tasks, sessionDirectory, { flushDelayMs: 10, ...options }) };
+    }
+
+    function close(session: { tasks: Tasks, journal: SessionJournal }) {
+        session.journal.dispose();
+        session.tasks.store.dispose();
+    }
+
+    beforeEach(() => {
+        directory = fs.mkdtempSync(path.join(os.tmpdir(), 'session-journal-'));
+        sessionDirectory = path.join(directory, 'session');
+        storeDirectory = path.join(directory, 'task-store');
+    });
+
+    afterEach(() => {
+        fs.rmSync(directory, { recursive: true, force: true });
+    });
+
+    it('restores tasks in queue order', () => {
+        const first = reload();
+        first.journal.discard();
+        first.tasks.push(...['a', 'b', 'c'].map(id => Task.fromRecord(record(id, 'queued'))));
+        close(first);
+
+        const second = reload();
+        const result = second.journal.restore();
+
+        assert.deepStrictEqual([...second.tasks].map(t => [t.id, t.status, t.prompt]), [
+            ['a', 'queued', 'prompt a'], ['b', 'queued', 'prompt b'], ['c', 'queued', 'prompt c'],
+        ]);
+        assert.strictEqual(result.queued, 3);
+        close(second);
+    });
+
+    it('writes only changes to the log and replays it', async () => {
+        const first = reload();
+        first.journal.discard();
+        first.tasks.push(...['a', 'b', 'c', 'd'].map(id => Task.fromRecord(record(id))));
+        first.journal.flush(true);
+
+        const changed = [...first.tasks][1];
+        changed.prompt = 'changed';
+        first.tasks.taskChanged(changed);
+        first.tasks.removeTask('c');
+        first.tasks.move(['d'], { taskId: 'a', position: 'before' });
+        await new Promise(resolve => setTimeout(resolve, 50));
+        // One put, one remove and the new order
+        assert.strictEqual(first.journal.stats().logEntries, 3);
+        // Crashed: no final flush
+        first.tasks.store.dispose();
+
+        const second = reload();
+        second.journal.restore();
+        assert.deepStrictEqual([...second.tasks].map(t => [t.id, t.prompt]), [['d', 'prompt d'], ['a', 'prompt a'], ['b', 'changed']]);
+        close(second);
+    });
+
+    it('records a change in any field', () => {
+        const first = reload();
+        first.journal.discard();
+        first.tasks.push(Task.fromRecord({ ...record('a', 'completed'), dependsOn: ['x'], finishedAt: 1_000 }));
+        first.journal.flush(true);
+
+        const [task] = first.tasks;
+        task.dependsOn = ['y'];
+        task.finishedAt = 2_000;
+        first.tasks.taskChanged(task);
+        first.journal.flush();
+        assert.strictEqual(first.journal.stats().logEntries, 1);
+        first.tasks.store.dispose();
+
+        const second = reload();
+        second.journal.restore();
+        const [restored] = second.tasks;
+        assert.deepStrictEqual([restored.dependsOn, restored.finishedAt], [['y'], 2_000]);
+        close(second);
+    });
+
+    it('only looks at the tasks that changed', () => {
+        const session = reload();
+        session.journal.discard();
+        const tasks = Array.from({ length: 1000 }, (_, i) => Task.fromRecord(record(`t${i}`)));
+        session.tasks.push(...tasks);
+        session.journal.flush(true);
+
+        let records = 0;
+        for (const task of tasks) {
+            const toRecord = task.toRecord.bind(task);
+            task.toRecord = () => (records++, toRecord());
+        }
+        tasks[500].submit(false);
+        session.journal.flush();
+
+        assert.strictEqual(records, 1);
+        assert.strictEqual(session.journal.stats().logEntries, 1);
+        close(session);
+    });
+
+    it('keeps compacted segments until the new locations are recorded', async () => {
+        const first = reload({ flushDelayMs: 60_000 }, { memoryBudgetBytes: 0, segmentBytes: 4096 });
+        first.journal.discard();
+        const tasks = Array.from({ length: 40 }, (_, i) => Task.fromRecord(record(`t${i}`, 'completed')));
+        first.tasks.push(...tasks);
+        for (const task of tasks) {
+            task.conversation.push({ type: 'say', say: 'text', text: 'x'.repeat(500) } as unknown as Message);
+            first.tasks.store.release(task);
+        }
+        first.journal.flush();
+        tasks.slice(0, 35).forEach(task => first.tasks.removeTask(task.id));
+        await first.tasks.store.compacted();
+        assert.ok(first.tasks.store.hasRetiredSegments);
+
+        // Crashed before the journal recorded where the payloads moved
+        const second = reload();
+        second.journal.restore();
+        assert.strictEqual((second.tasks.getTaskById('t39')!.conversation[0] as any).text, 'x'.repeat(500));
+        close(second);
+
+        first.journal.dispose();
+        assert.ok(!first.tasks.store.hasRetiredSegments);
+        first.tasks.store.dispose();
+    });
+
+    it('folds the log into a snapshot once it grows', () => {
+        const session = reload({ compactAfterEntries: 10 });
+        session.journal.discard();
+        for (let i = 0; i < 60; i++) {
+            session.tasks.push(Task.fromRecord(record(`t${i}`)));
+            session.journal.flush();
+        }
+
+        const stats = session.journal.stats();
+        assert.ok(stats.logEntries <= 30, `${stats.logEntries} log entries`);
+        assert.ok(stats.snapshotBytes > 0);
+        close(session);
+    });
+
+    it('restores running tasks as aborted', () => {
+        const first = reload();
+        first.journal.discard();
+        first.tasks.push(Task.fromRecord(record('a', 'running')));
+        close(first);
+
+        const second = reload();
+        const result = second.journal.restore();
+        const [task] = second.tasks;
+
+        assert.strictEqual(task.status, 'aborted');
+        assert.deepStrictEqual(task.previousAttempts, ['running']);
+        assert.strictEqual(result.aborted, 1);
+        // Ended at the latest when the previous session last wrote to the journal
+        assert.ok(task.finishedAt !== undefined && task.finishedAt <= Date.now(), `finished at ${task.finishedAt}`);
+        close(second);
+    });
+
+    it('loads conversations of restored tasks from the task store on access', () => {
+        const first = reload();
+        first.journal.discard();
+        const task = Task.fromRecord(record('a', 'completed'));
+        first.tasks.push(task);
+        task.conversation.push({ type: 'say', say: 'text', text: 'done' } as unknown as Message);
+        first.tasks.store.release(task);
+        close(first);
+
+        const second = reload();
+        second.journal.restore();
+        const [restored] = second.tasks;
+
+        assert.strictEqual(restored.residentPayload, undefined);
+        assert.strictEqual((restored.conversation[0] as any).text, 'done');
+        close(second);
+    });
+
+    it('drops the previous session when discarded', () => {
+        const first = reload();
+        first.journal.discard();
+        first.tasks.push(Task.fromRecord(record('a')));
+        close(first);
+
+        const second = reload();
+        second.journal.discard();
+        close(second);
+
+        const third = reload();
+        assert.strictEqual(third.journal.restore().tasks, 0);
+        close(third);
+    });
+
+    it('restores 10k tasks without reading their payloads', () => {
+        const first = reload();
+        first.journal.discard();
+        const prompt = 'Refactor the module and add tests for the edge cases. '.repeat(10);
+        first.tasks.restore(Array.from({ length: 10_000 }, (_, i) => Task.fromRecord(record(`t${i}`, i % 2 ? 'completed' : 'queued', `${i} ${prompt}`))));
+        for (const task of first.tasks) {
+            if (task.status === 'completed') {
+                task.conversation.push({ type: 'say', say: 'text', text: task.id } as unknown as Message);
+                first.tasks.store.release(task);
+            }
+        }
+        close(first);
+
+        const second = reload();
+        const store = second.tasks.store;
+        let loads = 0;
+        const load = store.load;
+        store.load = holder => {
+            loads++;
+            return load.call(store, holder);
+        };
+        const result = second.journal.restore();
+
+        assert.strictEqual(result.tasks, 10_000);
+        // Payloads stay on disk until a task's conversation is opened.
+        assert.strictEqual(loads, 0);
+        assert.deepStrictEqual([store.stats().residentTasks, store.stats().evictedTasks], [0, 5_000]);
+
+        assert.strictEqual((second.tasks.getTaskById('t1')!.conversation[0] as any).text, 't1');
+        assert.strictEqual(loads, 1);
+        close(second);
+    });
+});
@@ -0,0 +1,229 @@
+import * as assert from 'assert';
+import * as http from 'http';
+import { AddressInfo } from 'net';
+import { SuperCodeClient, TUIStatusResponse } from '../ai/supercodeClient';
+import { Task } from '../tasks/manager';
+import { ServerSentEventParser } from '../utils/sse';
+
+/**
+ * Local stand-in for the SuperCode TUI API.
+ *
+ * A submitted prompt keeps the server busy for `workMs`. Status changes are pushed to
+ * `/tui/status/events` subscribers when `supportsEvents` is set; otherwise that endpoint is a 404.
+ */
+class StubSuperCodeServer {
+    supportsEvents = true;
+    workMs = 50;
+    failWith?: string;
+    prompts: string[] = [];
+    statusPolls = 0;
+    streams = 0;
+    private status: TUIStatusResponse = { busy: false, status: 'ready' };
+    private prompt = '';
+    private subscribers = new Set<http.ServerResponse>();
+    private server: http.Server;
+
+    constructor() {
+        this.server = http.createServer((req, res) => {
+            let body = '';
+            req.on('data', chunk => body += chunk);
+            req.on('end', () => this.handle(req, res, body));
+        });
+    }
+
+    async start(): Promise<string> {
+        await new Promise<void>(resolve => this.server.listen(0, '127.0.0.1', resolve));
+        return `http://127.0.0.1:${(this.server.address() as AddressInfo).port}`;
+    }
+
+    stop(): Promise<void> {
+        this.dropSubscribers();
+        this.server.closeAllConnections();
+        return new Promise(resolve => this.server.close(() => resolve()));
+    }
+
+    /** Closes all event streams, as a server restart or proxy timeout would. */
+    dropSubscribers() {
+        for (const subscriber of this.subscribers) {
+            subscriber.destroy();
+        }
+        this.subscribers.clear();
+    }
+
+    private setStatus(status: TUIStatusResponse) {
+        this.status = status;
+        for (const subscriber of this.subscribers) {
+            subscriber.write(`data: ${JSON.stringify(status)}\n\n`);
+        }
+    }
+
+    private handle(req: http.IncomingMessage, res: http.ServerResponse, body: string) {
+        switch (`${req.method} ${req.url}`) {
+            case 'GET /tui/status':
+                this.statusPolls++;
+                res.writeHead(200, { 'Content-Type': 'application/json' });
+                res.end(JSON.stringify(this.status));
+                return;
+            case 'GET /tui/status/events':
+                if (!this.supportsEvents) {
+                    break;
+                }
+                this.streams++;
+                res.writeHead(200, { 'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache' });
+                res.write(`: connected\n\ndata: ${JSON.stringify(this.status)}\n\n`);
+                this.subscribers.add(res);
+                res.on('close', () => this.subscribers.delete(res));
+                return;
+            case 'POST /tui/clear-prompt':
+                this.prompt = '';
+                res.end();
+                return;
+            case 'POST /tui/append-prompt':
+                this.prompt += JSON.parse(body).text;
+                res.end();
+                return;
+            case 'POST /tui/submit-prompt':
+                this.prompts.push(this.prompt);
+                this.setStatus({ busy: true, status: 'processing' });
+                setTimeout(() => this.setStatus(this.failWith !== undefined
+                    ? { busy: false, status: 'error', message: this.failWith }
+                    : { busy: false, status: 'ready' }), this.workMs);
+                res.end();
+                return;
+        }
+        res.writeHead(404);
+        res.end();
+    }
+}
+
+const task = (id: number, prompt: string) => ({ id, prompt } as unknown as Task);
+
+describe('SuperCodeClient', function () {
+    let server: StubSuperCodeServer;
+    let baseUrl: string;
+
+    beforeEach(async () => {
+        server = new StubSuperCodeServer();
+        baseUrl = await server.start();
+    });
+
+    afterEach(async () => {
+        await server.stop();
+    });
+
+    it('notices completion as soon as the event stream reports it', async () => {
+        server.workMs = 100;
+        const client = new SuperCodeClient(baseUrl, 5000, 1, { pollIntervalMs: 1000 });
+        const status = await client.runTask(task(1, 'write tests'), 5000);
+
+        assert.deepStrictEqual(status, { busy: false, status: 'ready' });
+        assert.deepStrictEqual(server.prompts, ['write tests']);
+        // Only the readiness check before submitting; no polling while the task runs.
+        assert.strictEqual(server.statusPolls, 1);
+    });
+
+    it('runs tasks back to back without poll latency', async () => {
+        server.workMs = 20;
+        const client = new SuperCodeClient(baseUrl, 5000, 1);
+        for (let i = 0; i < 10; i++) {
+            await client.runTask(task(i, `task ${i}`), 5000);
+        }
+
+        assert.strictEqual(server.prompts.length, 10);
+        // One readiness check per task; every completion came from the event stream.
+        assert.strictEqual(server.statusPolls, 10);
+    });
+
+    it('keeps a quiet event stream open past the request timeout, checking the status meanwhile', async () => {
+        server.workMs = 300;
+        const client = new SuperCodeClient(baseUrl, 50, 1, { heartbeatMs: 40 });
+        const status = await client.runTask(task(1, 'x'), 5000);
+
+        assert.strictEqual(status.status, 'ready');
+        assert.strictEqual(server.streams, 1);
+        // The readiness check and the heartbeats while the task ran
+        assert.ok(server.statusPolls >= 3, `${server.statusPolls} status requests`);
+    });
+
+    it('probes each server for an event stream on its own', async () => {
+        server.supportsEvents = false;
+        const polling = new SuperCodeClient(baseUrl, 5000, 1, { pollIntervalMs: 20 });
+        await polling.runTask(task(1, 'x'), 5000);
+
+        server.supportsEvents = true;
+        server.statusPolls = 0;
+        const streaming = new SuperCodeClient(baseUrl, 5000, 1, { pollIntervalMs: 1000 });
+        await streaming.runTask(task(2, 'y'), 5000);
+        assert.strictEqual(server.statusPolls, 1);
+    });
+
+    it('reports errors from the status stream', async () => {
+        server.failWith = 'model overloaded';
+        const client = new SuperCodeClient(baseUrl, 5000, 1);
+        const status = await client.runTask(task(1, 'x'), 5000);
+
+        assert.deepStrictEqual(status, { busy: false, status: 'error', message: 'model overloaded' });
+    });
+
+    it('falls back to polling when the server has no event stream', async () => {
+        server.supportsEvents = false;
+        server.workMs = 100;
+        const client = new SuperCodeClient(baseUrl, 5000, 1, { pollIntervalMs: 20 });
+        const status = await client.runTask(task(1, 'x'), 5000);
+
+        assert.strictEqual(status.status, 'ready');
+        assert.ok(server.statusPolls > 2, `expected polling, got ${server.statusPolls} status requests`);
+    });
+
+    it('recovers from a dropped event stream', async () => {
+        server.workMs = 150;
+        const client = new SuperCodeClient(baseUrl, 5000, 1, { reconnectDelayMs: 20 });
+        setTimeout(() => server.dropSubscribers(), 50);
+        const status = await client.runTask(task(1, 'x'), 5000);
+
+        assert.strictEqual(status.status, 'ready');
+        // The readiness check and one catch-up after reconnecting; no fallback to polling.
+        assert.strictEqual(server.statusPolls, 2);
+    });
+
+    it('accepts ready after the grace period when busy was never observed', async () => {
+        // The task finishes before the submit request returns; the stream only ever sees 'ready'.
+        server.workMs = 0;
+        server.supportsEvents = false;
+        const client = new SuperCodeClient(baseUrl, 5000, 1, { pollIntervalMs: 20, completionGraceMs: 100 });
+        const started = Date.now();
+        await client.runTask(task(1, 'x'), 5000);
+
+        assert.ok(Date.now() - started >= 100);
+    });
+
+    it('times out when the task never completes', async () => {
+        server.workMs = 10_000;
+        const client = new SuperCodeClient(baseUrl, 5000, 1);
+        await assert.rejects(client.runTask(task(1, 'x'), 100), /timed out/);
+    });
+
+    it('stops watching when the watch is closed', async () => {
+        const client = new SuperCodeClient(baseUrl, 5000, 1);
+        const seen: TUIStatusResponse[] = [];
+        const stop = client.watchStatus(status => seen.push(status));
+        await new Promise(resolve => setTimeout(resolve, 50));
+        stop();
+        await new Promise(resolve => setTimeout(resolve, 20));
+
+        assert.deepStrictEqual(seen, [{ busy: false, status: 'ready' }]);
+    });
+});
+
+describe('ServerSentEventParser', function () {
+    it('handles events split across chunks', () => {
+        const parser = new ServerSentEventParser();
+        const bytes = Buffer.from(': ping\r\n\r\ndata: {"a":"é"}\r\n\r\ndata: line 1\ndata: line 2\n\n');
+
+        const events: string[] = [];
+        for (let i = 0; i < bytes.length; i += 3) {
+            events.push(...parser.push(bytes.subarray(i, i + 3)));
+        }
+        assert.deepStrictEqual(events, ['{"a":"é"}', 'line 1\nline 2']);
+    });
+});
@@ -0,0 +1,54 @@
+import * as assert from 'assert';
+import { Task, Tasks } from '../tasks/manager';
+
+describe('Task batches', function () {
+    let tasks: Tasks;
+    let updates: number;
+
+    beforeEach(() => {
+        tasks = new Tasks(undefined, 0);
+        updates = 0;
+        tasks.on('update', () => updates++);
+    });
+
+    it('emits one update for a batch of changes', () => {
+        const created = Array.from({ length: 5000 }, (_, i) => new Task(`prompt ${i}`, 'code', undefined, 'roo', undefined, `t${i}`));
+        tasks.batch(() => {
+            tasks.push(...created);
+            for (const task of created) {
+                task.submit(false);
+            }
+            for (const task of created) {
+                task.cancel(false);
+                task.archive(false);
+            }
+            tasks.move(['t4999'], { taskId: 't0', position: 'before' });
+        });
+
+        // The renderer repaint and telemetry walk all tasks once, not once per change.
+        assert.strictEqual(updates, 1);
+        assert.ok(created.every(task => task.archived));
+    });
+
+    it('emits the update when the outermost batch ends', () => {
+        tasks.beginBatch();
+        tasks.batch(() => tasks.push(new Task('a', 'code')));
+        assert.strictEqual(updates, 0);
+        tasks.endBatch();
+
+        assert.strictEqual(updates, 1);
+        assert.ok(!tasks.inBatch);
+    });
+
+    it('ends the batch when it throws, and skips the update if nothing changed', () => {
+        assert.throws(() => tasks.batch(() => {
+            tasks.push(new Task('a', 'code'));
+            throw new Error('failed');
+        }), /failed/);
+        assert.strictEqual(updates, 1);
+
+        tasks.batch(() => undefined);
+        assert.strictEqual(updates, 1);
+        assert.throws(() => tasks.endBatch(), /No batch/);
+    });
+});
@@ -0,0 +1,109 @@
+import * as assert from 'assert';
+import { RendererTask } from '../renderer/interface';
+import { RendererTaskPublisher, applyRendererTaskDelta, diffRendererTasks, isEmptyDelta } from '../renderer/taskDelta';
+import { virtualWindow } from '../renderer/taskList/virtualWindow';
+
+function rendererTask(id: string, status: RendererTask['status'] = 'prepared'): RendererTask {
+    return { id, prompt: `prompt ${id}`, summary: [`prompt ${id}`], mode: 'code', client: 'roo', status, archived: false };
+}
+
+function tasks(count: number): RendererTask[] {
+    return Array.from({ length: count }, (_, i) => rendererTask(`t${i}`));
+}
+
+/** Deterministic pseudo-random numbers */
+function random(seed: number): () => number {
+    return () => {
+        seed = (seed * 1103515245 + 12345) % 2147483648;
+        return seed / 2147483648;
+    };
+}
+
+describe('Renderer task deltas', function () {
+    it('sends only the tasks that were added, removed, changed or moved', () => {
+        const previous = tasks(6);
+        const current = [previous[0], previous[4], previous[1], { ...previous[2], status: 'queued' as const }, rendererTask('new'), previous[5]];
+
+        const delta = diffRendererTasks(previous, current, 7);
+
+        assert.deepStrictEqual(delta.removed, ['t3']);
+        assert.deepStrictEqual(delta.added.map(a => [a.task.id, a.index]), [['new', 4]]);
+        assert.deepStrictEqual(delta.changed.map(t => t.id), ['t2']);
+        assert.deepStrictEqual(delta.moved, [{ id: 't4', index: 1 }]);
+        assert.strictEqual(delta.version, 8);
+        assert.deepStrictEqual(applyRendererTaskDelta(previous, delta), current);
+    });
+
+    it('rebuilds any reordering and editing of the list', () => {
+        const next = random(42);
+        let previous = tasks(200);
+        let counter = 200;
+        for (let round = 0; round < 50; round++) {
+            const current = previous.filter(() => next() > 0.1).map(task => next() < 0.1 ? { ...task, archived: !task.archived } : task);
+            for (let i = 0; i < 10; i++) {
+                const from = Math.floor(next() * current.length);
+                const [task] = current.splice(from, 1);
+                current.splice(Math.floor(next() * current.length), 0, task);
+                current.splice(Math.floor(next() * current.length), 0, rendererTask(`t${counter++}`));
+            }
+
+            const delta = diffRendererTasks(previous, current, round);
+            assert.deepStrictEqual(applyRendererTaskDelta(previous, delta), current);
+            previous = current;
+        }
+    });
+
+    it('keeps the version while nothing changes', () => {
+        const publisher = new RendererTaskPublisher(1);
+        const first = publisher.publish(tasks(3));
+        const second = publisher.publish(tasks(3));
+
+        assert.deepStrictEqual([first.baseVersion, first.version], [1, 2]);
+        assert.ok(isEmptyDelta(second));
+        assert.deepStrictEqual([second.baseVersion, second.version], [2, 2]);
+        assert.strictEqual(publisher.snapshot().version, 2);
+        assert.strictEqual(publisher.snapshot().tasks.length, 3);
+    });
+
+    it('sends and renders a small part of a list of 20k tasks', () => {
+        const publisher = new RendererTaskPublisher(0);
+        let rendered = tasks(20_000);
+        publisher.publish(rendered);
+
+        const current = rendered.map((task, i) => i % 200 === 0 ? { ...task, status: 'queued' as const } : task);
+        current.splice(10, 0, ...current.splice(15_000, 5));
+
+        const delta = publisher.publish(current);
+        const message = JSON.stringify(delta);
+        rendered = applyRendererTaskDelta(rendered, delta);
+        const window = virtualWindow(rendered.length, { width: 200, height: 104 }, { width: 1000, height: 600, scrollTop: 500_000 });
+
+        assert.deepStrictEqual(rendered, current);
+        assert.deepStrictEqual([delta.changed.length, delta.moved.length], [100, 5]);
+        // The full list is over 2 MB.
+        assert.ok(message.length < JSON.stringify(current).length / 50, `delta of ${message.length} bytes`);
+        assert.ok(window.end - window.start <= 55, `rendered ${window.end - window.start} of 20000 tasks`);
+    });
+});
+
+describe('Virtual window', function () {
+    const tile = { width: 200, height: 100 };
+
+    it('renders the visible rows and a few around them', () => {
+        const window = virtualWindow(1000, tile, { width: 1000, height: 300, scrollTop: 1000 }, 1);
+
+        // 5 columns; rows 10 to 12 are visible, rows 9 and 13 are overscan.
+        assert.deepStrictEqual(window, { start: 45, end: 70, paddingTop: 900, paddingBottom: 18600 });
+    });
+
+    it('clamps to the list', () => {
+        assert.deepStrictEqual(
+            virtualWindow(70, tile, { width: 450, height: 300, scrollTop: 10_000 }, 0),
+            { start: 64, end: 70, paddingTop: 3200, paddingBottom: 0 },
+        );
+        assert.deepStrictEqual(
+            virtualWindow(0, tile, { width: 0, height: 0, scrollTop: 0 }),
+            { start: 0, end: 0, paddingTop: 0, paddingBottom: 0 },
+        );
+    });
+});
@@ -0,0 +1,113 @@
+import * as assert from 'assert';
+import { DependencyFailurePolicy, Task, Tasks } from '../tasks/manager';
+
+function task(tasks: Tasks, id: string, dependsOn: Task[] = [], onDependencyFailure: DependencyFailurePolicy = 'abort'): Task {
+    const created = new Task(`prompt ${id}`, 'code', undefined, 'roo', undefined, id);
+    created.dependsOn = dependsOn.map(t => t.id);
+    created.onDependencyFailure = onDependencyFailure;
+    tasks.push(created);
+    return created;
+}
+
+/** Runs the task the worker would pick next, finishing it with the given status */
+function runNext(tasks: Tasks, status: 'completed' | 'error' = 'completed'): string | undefined {
+    const next = tasks.getTask();
+    if (next !== undefined) {
+        next.status = 'running';
+        next.status = status;
+    }
+    return next?.id;
+}
+
+describe('Task dependencies', function () {
+    let tasks: Tasks;
+
+    beforeEach(() => {
+        tasks = new Tasks();
+    });
+
+    it('runs a task only once its dependencies have completed', () => {
+        const generate = task(tasks, 'gen');
+        const review = task(tasks, 'rev', [generate]);
+        review.submit(false);
+        generate.submit(false);
+
+        assert.deepStrictEqual(tasks.dagStatus().waiting, { rev: ['gen'] });
+        assert.strictEqual(runNext(tasks), 'gen');
+        assert.deepStrictEqual(tasks.dagStatus().ready, ['rev']);
+        assert.strictEqual(runNext(tasks), 'rev');
+    });
+
+    it('runs independent branches while a task waits', () => {
+        const a = task(tasks, 'a');
+        const afterA = task(tasks, 'afterA', [a]);
+        const b = task(tasks, 'b');
+        [afterA, a, b].forEach(t => t.submit(false));
+
+        // afterA is first in the queue but waits; a and b are not held up behind it.
+        assert.deepStrictEqual([runNext(tasks), runNext(tasks), runNext(tasks)], ['a', 'afterA', 'b']);
+    });
+
+    it('aborts downstream tasks when a dependency fails', () => {
+        const generate = task(tasks, 'gen');
+        const review = task(tasks, 'rev', [generate]);
+        const fix = task(tasks, 'fix', [review]);
+        [generate, review, fix].forEach(t => t.submit(false));
+
+        runNext(tasks, 'error');
+
+        assert.strictEqual(review.status, 'aborted');
+        assert.strictEqual(fix.status, 'aborted');
+        assert.deepStrictEqual(tasks.dagStatus().blocked, { rev: 'gen', fix: 'rev' });
+        assert.deepStrictEqual(tasks.dagStatus().failed, ['gen']);
+        assert.strictEqual(tasks.getTask(), undefined);
+    });
+
+    it('skips downstream tasks back out of the queue', () => {
+        const generate = task(tasks, 'gen');
+        const review = task(tasks, 'rev', [generate], 'skip');
+        const fix = task(tasks, 'fix', [review], 'skip');
+        [generate, review, fix].forEach(t => t.submit(false));
+
+        runNext(tasks, 'error');
+
+        assert.strictEqual(review.status, 'prepared');
+        assert.strictEqual(fix.status, 'prepared');
+        assert.deepStrictEqual(tasks.dagStatus().blocked, { rev: 'gen', fix: 'rev' });
+    });
+
+    it('runs tasks with the run policy after a failed dependency', () => {
+        const generate = task(tasks, 'gen');
+        const cleanup = task(tasks, 'cleanup', [generate], 'run');
+        [generate, cleanup].forEach(t => t.submit(false));
+
+        runNext(tasks, 'error');
+
+        assert.strictEqual(runNext(tasks), 'cleanup');
+    });
+
+    it('applies the policy to a task queued after its dependency failed', () => {
+        const generate = task(tasks, 'gen');
+        const review = task(tasks, 'rev', [generate]);
+        generate.submit(false);
+        runNext(tasks, 'error');
+
+        review.submit(false);
+
+        assert.strictEqual(review.status, 'aborted');
+        // Resubmitting both retries the pipeline.
+        generate.submit(false);
+        review.submit(false);
+        assert.deepStrictEqual(tasks.dagStatus().waiting, { rev: ['gen'] });
+    });
+
+    it('stops waiting for a deleted dependency', () => {
+        const generate = task(tasks, 'gen');
+        const review = task(tasks, 'rev', [generate]);
+        review.submit(false);
+        tasks.removeTask('gen');
+
+        assert.deepStrictEqual(review.dependsOn, []);
+        assert.strictEqual(tasks.getTask(), review);
+    });
+});
@@ -0,0 +1,11 @@
+import { Task, TaskRecord, Tasks } from '../tasks/manager';
+
+/**
+ * Adds a task to the list, as restored from a record: a 'prepared' task with
+ * the prompt `prompt <id>` unless `fields` say otherwise.
+ */
+export function addTask(tasks: Tasks, id: string, fields: Partial<TaskRecord> = {}): Task {
+    const created = Task.fromRecord({ id, prompt: `prompt ${id}`, mode: 'code', client: 'roo', status: 'prepared', archived: false, previousAttempts: [], ...fields });
+    tasks.push(created);
+    return created;
+}
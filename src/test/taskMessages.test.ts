@@ -0,0 +1,44 @@
+import * as assert from 'assert';
+import { Message } from '../ai/controller';
+import { Task, Tasks } from '../tasks/manager';
+
+function task(conversation: Message[]): Task {
+    const tasks = new Tasks(undefined, 0);
+    const created = Task.fromRecord({ id: 'a', prompt: 'p', mode: 'code', client: 'roo', status: 'completed', archived: false, previousAttempts: [] });
+    tasks.push(created);
+    created.conversation = conversation;
+    return created;
+}
+
+describe('Task messages', function () {
+    it('returns the last completion result as the result', () => {
+        const done = task([
+            { type: 'say', say: 'text', text: 'thinking' },
+            { type: 'say', say: 'completion_result', text: 'done' },
+            { type: 'ask', ask: 'completion_result', text: '' },
+        ]);
+
+        assert.strictEqual(done.result(), 'done');
+        assert.deepStrictEqual(done.lastMessage(), { type: 'say', say: 'completion_result', text: 'done' });
+    });
+
+    it('falls back to the last text without a completion result', () => {
+        const failed = task([
+            { type: 'say', say: 'text', text: 'first' },
+            { type: 'say', say: 'text', text: 'second' },
+            { type: 'say', say: 'error', text: 'failed' },
+        ]);
+
+        assert.strictEqual(failed.result(), 'second');
+        assert.strictEqual(task([]).result(), undefined);
+        assert.strictEqual(task([]).lastMessage(), undefined);
+    });
+
+    it('returns a page of messages', () => {
+        const long = task(Array.from({ length: 10 }, (_, i) => ({ type: 'say', say: 'text', text: `${i}` })));
+
+        assert.strictEqual(long.messageCount(), 10);
+        assert.deepStrictEqual(long.messages(8).map(m => m.type === 'say' && m.text), ['8', '9']);
+        assert.deepStrictEqual(long.messages(2, 4).map(m => m.type === 'say' && m.text), ['2', '3']);
+    });
+});
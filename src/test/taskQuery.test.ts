@@ -0,0 +1,47 @@
+import * as assert from 'assert';
+import { Task, Tasks } from '../tasks/manager';
+import { addTask } from './taskFixtures';
+
+const ids = (found: { tasks: Task[] }) => found.tasks.map(t => t.id);
+
+describe('Task queries', function () {
+    let tasks: Tasks;
+
+    beforeEach(() => {
+        tasks = new Tasks(undefined, 0);
+        addTask(tasks, 'a', { status: 'completed', prompt: 'fix the parser' });
+        addTask(tasks, 'b', { status: 'error', client: 'copilot', prompt: 'fix the lexer' });
+        addTask(tasks, 'c', { status: 'queued', client: 'copilot', prompt: 'write docs' });
+        addTask(tasks, 'd', { status: 'completed', client: 'copilot', prompt: 'Fix the build' });
+        tasks.getTaskById('d')!.archive(false);
+    });
+
+    it('filters on all the given conditions', () => {
+        assert.deepStrictEqual(ids(tasks.find({ status: ['completed', 'error'], client: ['copilot'] })), ['b', 'd']);
+        assert.deepStrictEqual(ids(tasks.find({ promptContains: 'fix' })), ['a', 'b']);
+        assert.deepStrictEqual(ids(tasks.find({ promptRegex: '^[Ff]ix', archived: false })), ['a', 'b']);
+        assert.deepStrictEqual(ids(tasks.find({ mode: ['ask'] })), []);
+        assert.throws(() => tasks.find({ promptRegex: '(' }), /Invalid prompt regex/);
+    });
+
+    it('pages with limit and offset', () => {
+        assert.deepStrictEqual(ids(tasks.find({}, { limit: 2, offset: 1 })), ['b', 'c']);
+        assert.deepStrictEqual(ids(tasks.find({ client: ['copilot'] }, { offset: 2 })), ['d']);
+    });
+
+    it('continues from a cursor while tasks are added and deleted', () => {
+        const first = tasks.find({}, { limit: 2 });
+        assert.deepStrictEqual(ids(first), ['a', 'b']);
+
+        tasks.removeTask('b');
+        addTask(tasks, 'e');
+        const second = tasks.find({}, { limit: 2, cursor: first.cursor });
+        assert.deepStrictEqual(ids(second), ['c', 'd']);
+        const third = tasks.find({}, { limit: 2, cursor: second.cursor });
+        assert.deepStrictEqual(ids(third), ['e']);
+        assert.strictEqual(third.cursor, undefined);
+
+        const completed = tasks.find({ status: ['completed'] }, { limit: 1 });
+        assert.deepStrictEqual(ids(tasks.find({ status: ['completed'] }, { limit: 1, cursor: completed.cursor })), ['d']);
+    });
+});
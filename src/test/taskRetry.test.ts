@@ -0,0 +1,117 @@
+import * as assert from 'assert';
+import { RetryPolicy, Task, Tasks } from '../tasks/manager';
+
+const policy = (overrides: Partial<RetryPolicy> = {}): RetryPolicy =>
+    ({ maxAttempts: 3, baseDelayMs: 20, maxDelayMs: 1000, retryOn: ['error'], ...overrides });
+
+function task(tasks: Tasks, id: string, retryPolicy?: RetryPolicy, dependsOn: string[] = []): Task {
+    const created = new Task(`prompt ${id}`, 'code', undefined, 'roo', undefined, id);
+    created.retryPolicy = retryPolicy;
+    created.dependsOn = dependsOn;
+    tasks.push(created);
+    created.submit(false);
+    return created;
+}
+
+function fail(task: Task, status: 'error' | 'aborted' = 'error') {
+    task.status = 'running';
+    task.status = status;
+}
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+describe('Task retry', function () {
+    let tasks: Tasks;
+
+    beforeEach(() => {
+        tasks = new Tasks(undefined, 0);
+    });
+
+    it('queues a failed task again after the backoff delay', async () => {
+        const flaky = task(tasks, 'flaky', policy());
+        let updates = 0;
+        tasks.on('update', () => updates++);
+        fail(flaky);
+
+        assert.strictEqual(flaky.status, 'queued');
+        assert.deepStrictEqual(flaky.previousAttempts, ['error']);
+        assert.strictEqual(tasks.getTask(), undefined, 'held back during the delay');
+
+        const before = updates;
+        await sleep(40);
+        // The scheduler wakes up the worker by itself.
+        assert.ok(updates > before);
+        assert.strictEqual(tasks.getTask(), flaky);
+    });
+
+    it('gives up after the maximum number of attempts', async () => {
+        const flaky = task(tasks, 'flaky', policy({ maxAttempts: 2, baseDelayMs: 0 }));
+        fail(flaky);
+        await sleep(5);
+        assert.strictEqual(tasks.getTask(), flaky);
+        fail(flaky);
+
+        assert.strictEqual(flaky.status, 'error');
+        assert.strictEqual(flaky.retries, 1);
+    });
+
+    it('only retries the configured statuses', () => {
+        const flaky = task(tasks, 'flaky', policy());
+        fail(flaky, 'aborted');
+
+        assert.strictEqual(flaky.status, 'aborted');
+    });
+
+    it('runs other tasks while one waits for its retry', () => {
+        const flaky = task(tasks, 'flaky', policy({ baseDelayMs: 60_000 }));
+        task(tasks, 'other');
+        fail(flaky);
+
+        assert.strictEqual(tasks.getTask()?.id, 'other');
+    });
+
+    it('keeps dependents waiting for the next attempt', () => {
+        const flaky = task(tasks, 'flaky', policy());
+        const dependent = task(tasks, 'dependent', undefined, ['flaky']);
+        fail(flaky);
+
+        assert.strictEqual(dependent.status, 'queued');
+        assert.deepStrictEqual(tasks.dagStatus().waiting, { dependent: ['flaky'] });
+    });
+
+    it('starts counting again when submitted by hand', () => {
+        const flaky = task(tasks, 'flaky', policy({ maxAttempts: 2 }));
+        fail(flaky);
+        flaky.cancel(false);
+        assert.strictEqual(flaky.status, 'error');
+
+        flaky.submit(false);
+        assert.strictEqual(flaky.retries, 0);
+        assert.strictEqual(tasks.getTask(), flaky);
+    });
+
+    it('stays cancelled when cancelled during the backoff delay', async () => {
+        const flaky = task(tasks, 'flaky', policy({ baseDelayMs: 0 }));
+        fail(flaky);
+        assert.strictEqual(flaky.status, 'queued');
+
+        flaky.cancel(false);
+        await sleep(5);
+        assert.strictEqual(flaky.status, 'error');
+        assert.strictEqual(flaky.notBefore, undefined);
+        assert.strictEqual(tasks.getTask(), undefined);
+    });
+
+    it('stays cancelled when submitted by hand and cancelled', () => {
+        const flaky = task(tasks, 'flaky', policy());
+        fail(flaky);
+        flaky.cancel(false);
+        assert.strictEqual(flaky.status, 'error');
+
+        flaky.submit(false);
+        flaky.cancel(false);
+
+        assert.strictEqual(flaky.status, 'error');
+        assert.strictEqual(tasks.getTask(), undefined);
+    });
+});
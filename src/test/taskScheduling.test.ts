@@ -0,0 +1,110 @@
+import * as assert from 'assert';
+import { Task, Tasks } from '../tasks/manager';
+import { PriorityQueue } from '../utils/priorityQueue';
+import { addTask } from './taskFixtures';
+
+/** Ids in the order the worker would run them */
+function drain(tasks: Tasks): string[] {
+    const order: string[] = [];
+    let next: Task | undefined;
+    while ((next = tasks.getTask()) !== undefined) {
+        next.status = 'running';
+        next.status = 'completed';
+        order.push(next.id);
+    }
+    return order;
+}
+
+describe('PriorityQueue', function () {
+    it('pops items in order', () => {
+        const queue = new PriorityQueue<number>((a, b) => a < b);
+        const items = Array.from({ length: 1000 }, (_, i) => (i * 7919) % 1000);
+        items.forEach(item => queue.push(item));
+
+        const popped: number[] = [];
+        while (queue.size > 0) {
+            popped.push(queue.pop()!);
+        }
+        assert.deepStrictEqual(popped, [...items].sort((a, b) => a - b));
+    });
+});
+
+describe('Task scheduling', function () {
+    let tasks: Tasks;
+
+    beforeEach(() => {
+        tasks = new Tasks(undefined, 0);
+    });
+
+    it('runs higher priorities first, in submission order among equals', () => {
+        addTask(tasks, 'a', { status: 'queued' });
+        addTask(tasks, 'b', { status: 'queued', priority: 5 });
+        addTask(tasks, 'c', { status: 'queued' });
+        addTask(tasks, 'd', { status: 'queued', priority: 5 });
+        addTask(tasks, 'e', { status: 'queued', priority: -1 });
+
+        assert.deepStrictEqual(drain(tasks), ['b', 'd', 'a', 'c', 'e']);
+    });
+
+    it('moves a task when it is reprioritized', () => {
+        const a = addTask(tasks, 'a', { status: 'queued' });
+        addTask(tasks, 'b', { status: 'queued' });
+        addTask(tasks, 'c', { status: 'queued' });
+        tasks.reprioritize(tasks.getTaskById('c')!, 1);
+        tasks.reprioritize(a, -1);
+
+        assert.deepStrictEqual(drain(tasks), ['c', 'b', 'a']);
+    });
+
+    it('skips tasks that left the queue', () => {
+        const a = addTask(tasks, 'a', { status: 'queued', priority: 1 });
+        addTask(tasks, 'b', { status: 'queued' });
+        a.cancel(false);
+        a.submit(false);
+        a.cancel(false);
+
+        assert.deepStrictEqual(drain(tasks), ['b']);
+    });
+
+    it('follows tasks moved in the list', () => {
+        ['a', 'b', 'c'].forEach(id => addTask(tasks, id, { status: 'queued' }));
+        tasks.move(['c'], { taskId: 'a', position: 'before' });
+
+        assert.deepStrictEqual(drain(tasks), ['c', 'a', 'b']);
+    });
+
+    it('raises the priority of waiting tasks', async () => {
+        tasks.configurePriorityAging(5);
+        addTask(tasks, 'low', { status: 'queued' });
+        await new Promise(resolve => setTimeout(resolve, 30));
+        addTask(tasks, 'high', { status: 'queued', priority: 2 });
+
+        // 'low' waited six aging periods longer: more than the two priority levels between them.
+        assert.deepStrictEqual(drain(tasks), ['low', 'high']);
+    });
+
+    it('dequeues independently of the number of finished tasks', () => {
+        for (let i = 0; i < 50_000; i++) {
+            addTask(tasks, `done${i}`, { status: 'completed' });
+        }
+        for (let i = 0; i < 1000; i++) {
+            addTask(tasks, `q${i}`, { status: 'queued', priority: i % 10 });
+        }
+
+        // Count the tasks looked at through their status.
+        const status = Object.getOwnPropertyDescriptor(Task.prototype, 'status')!;
+        let reads = 0;
+        Object.defineProperty(Task.prototype, 'status', { ...status, get() { reads++; return status.get!.call(this); } });
+        let order: string[];
+        try {
+            order = drain(tasks);
+        } finally {
+            Object.defineProperty(Task.prototype, 'status', status);
+        }
+
+        assert.strictEqual(order.length, 1000);
+        assert.strictEqual(order[0], 'q9');
+        // A handful per task run (mostly its own status changes); a scan reads all 51k on every dequeue.
+        assert.ok(reads <= 1000 * 20, `1000 dequeues read ${reads} statuses`);
+    });
+});
@@ -0,0 +1,80 @@
+import * as assert from 'assert';
+import { ALL_TASK_STATUSES, Task, TaskStatus, Tasks } from '../tasks/manager';
+
+function record(id: string, status: TaskStatus, archived: boolean = false) {
+    return { id, prompt: `prompt ${id}`, mode: 'code', client: 'roo' as const, status, archived, previousAttempts: [] };
+}
+
+/** Counts by walking all tasks, as a reference */
+function countByScan(tasks: Tasks) {
+    const counts: Record<string, { total: number, archived: number }> = {};
+    for (const status of ALL_TASK_STATUSES) {
+        counts[status] = { total: 0, archived: 0 };
+    }
+    for (const task of tasks) {
+        counts[task.status].total++;
+        counts[task.status].archived += task.archived ? 1 : 0;
+    }
+    return counts;
+}
+
+describe('Task status counts', function () {
+    let tasks: Tasks;
+
+    beforeEach(() => {
+        tasks = new Tasks(undefined, 0);
+    });
+
+    it('follows status changes, archiving, restoring and deleting', () => {
+        const created = ['a', 'b', 'c', 'd'].map(id => new Task(`prompt ${id}`, 'code', undefined, 'roo', undefined, id));
+        tasks.push(...created);
+        tasks.restore([Task.fromRecord(record('r1', 'completed', true)), Task.fromRecord(record('r2', 'running'))]);
+        created[0].submit(false);
+        created[1].submit(false);
+        created[1].status = 'running';
+        created[1].status = 'completed';
+        created[1].archive(false);
+        created[2].archive(false);
+        created[2].unarchive(false);
+        created[3].archive(false);
+        tasks.removeTask('d');
+
+        assert.deepStrictEqual(tasks.statusCounts(), countByScan(tasks));
+        assert.deepStrictEqual(tasks.statusCounts().completed, { total: 2, archived: 2 });
+        assert.deepStrictEqual(tasks.statusCounts().prepared, { total: 1, archived: 0 });
+    });
+
+    it('returns the tasks of a status in list order', () => {
+        ['a', 'b', 'c'].forEach(id => tasks.push(Task.fromRecord(record(id, 'queued'))));
+        tasks.restore([Task.fromRecord(record('r', 'queued'))]);
+        tasks.move(['a'], { taskId: 'c', position: 'after' });
+        tasks.push(Task.fromRecord(record('d', 'queued')));
+
+        assert.deepStrictEqual(tasks.queued.map(t => t.id), ['r', 'b', 'c', 'a', 'd']);
+        assert.strictEqual(tasks.running, undefined);
+    });
+
+    it('counts without walking all tasks', () => {
+        for (let chunk = 0; chunk < 10; chunk++) {
+            tasks.push(...Array.from({ length: 10_000 }, (_, i) => Task.fromRecord(record(`done${chunk}-${i}`, 'completed', i % 2 === 0))));
+        }
+        tasks.push(...Array.from({ length: 10 }, (_, i) => Task.fromRecord(record(`q${i}`, 'queued'))));
+
+        // Count the tasks looked at through their status.
+        const status = Object.getOwnPropertyDescriptor(Task.prototype, 'status')!;
+        let reads = 0;
+        Object.defineProperty(Task.prototype, 'status', { ...status, get() { reads++; return status.get!.call(this); } });
+        try {
+            for (let i = 0; i < 1000; i++) {
+                tasks.statusCounts();
+                tasks.queued;
+            }
+        } finally {
+            Object.defineProperty(Task.prototype, 'status', status);
+        }
+
+        assert.deepStrictEqual(tasks.statusCounts().completed, { total: 100_000, archived: 50_000 });
+        // At most the queued tasks, never the 100k completed ones
+        assert.ok(reads <= 1000 * 10, `1000 polls read ${reads} statuses`);
+    });
+});
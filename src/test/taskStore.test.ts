@@ -0,0 +1,167 @@
+import * as assert from 'assert';
+import * as fs from 'fs';
+import * as os from 'os';
+import * as path from 'path';
+import { Message } from '../ai/controller';
+import { PayloadHolder, TaskPayload, TaskStore } from '../tasks/taskStore';
+import { HookRun } from '../utils/hooks';
+import { CommandRun } from '../utils/shellCommand';
+
+function holder(id: string, messages: number, text: string = 'x'.repeat(100)): PayloadHolder {
+    const conversation = Array.from({ length: messages }, (_, i) => ({ type: 'say', say: 'text', text: `${i} ${text}` } as unknown as Message));
+    return { id, residentPayload: { conversation, hookRuns: [] } };
+}
+
+describe('TaskStore', function () {
+    let directory: string;
+
+    beforeEach(() => {
+        directory = fs.mkdtempSync(path.join(os.tmpdir(), 'task-store-'));
+    });
+
+    afterEach(() => {
+        fs.rmSync(directory, { recursive: true, force: true });
+    });
+
+    it('keeps finished payloads in memory within the budget', () => {
+        const store = new TaskStore(directory);
+        const task = holder('a', 3);
+        store.release(task);
+
+        assert.ok(task.residentPayload !== undefined);
+        assert.strictEqual(store.stats().residentTasks, 1);
+        assert.ok(store.stats().diskBytes > 0);
+        store.dispose();
+    });
+
+    it('evicts the least recently used payloads and reads them back on access', () => {
+        const store = new TaskStore(directory, { memoryBudgetBytes: 3000 });
+        const tasks = ['a', 'b', 'c'].map(id => holder(id, 10));
+        tasks.forEach(task => store.release(task));
+
+        assert.strictEqual(tasks[0].residentPayload, undefined);
+        assert.ok(tasks[2].residentPayload !== undefined);
+
+        const payload = store.load(tasks[0]);
+        assert.strictEqual(payload.conversation.length, 10);
+        assert.strictEqual((payload.conversation[9] as any).text, `9 ${'x'.repeat(100)}`);
+        assert.strictEqual(tasks[0].residentPayload, payload);
+        // Loading 'a' made it the most recently used; 'b' is next in line.
+        assert.strictEqual(tasks[1].residentPayload, undefined);
+        store.dispose();
+    });
+
+    it('never evicts payloads of active tasks', () => {
+        const store = new TaskStore(directory, { memoryBudgetBytes: 0 });
+        const task = holder('a', 10);
+        store.release(task);
+        assert.strictEqual(task.residentPayload, undefined);
+
+        store.retain(task);
+        const payload = store.load(task);
+        store.release(holder('b', 10));
+
+        assert.strictEqual(task.residentPayload, payload);
+        assert.strictEqual(store.stats().residentTasks, 0);
+        store.dispose();
+    });
+
+    it('writes messages that arrived after the task finished before evicting it', () => {
+        const store = new TaskStore(directory, { memoryBudgetBytes: 5000 });
+        const task = holder('a', 2);
+        store.release(task);
+        task.residentPayload!.conversation.push({ type: 'say', say: 'text', text: 'late' } as unknown as Message);
+        store.release(holder('b', 40));
+
+        assert.strictEqual(task.residentPayload, undefined);
+        assert.strictEqual((store.load(task).conversation[2] as any).text, 'late');
+        store.dispose();
+    });
+
+    it('writes a message updated in place after the task finished before evicting it', () => {
+        const store = new TaskStore(directory, { memoryBudgetBytes: 5000 });
+        const task = holder('a', 2);
+        store.release(task);
+        // A streamed message is finalized: same number of messages, new text
+        (task.residentPayload!.conversation[1] as any).text = 'final';
+        store.release(holder('b', 40));
+
+        assert.strictEqual(task.residentPayload, undefined);
+        assert.strictEqual((store.load(task).conversation[1] as any).text, 'final');
+        store.dispose();
+    });
+
+    it('restores hook runs with their commands', () => {
+        const store = new TaskStore(directory, { memoryBudgetBytes: 0 });
+        const run = new HookRun('oncomplete');
+        run.failed = true;
+        run.commands.push(new CommandRun('echo hi', 1, 'hi\n', '', 1000, 2000));
+        const task: PayloadHolder = { id: 'h', residentPayload: { conversation: [], hookRuns: [run] } as TaskPayload };
+        store.release(task);
+
+        const [restored] = store.load(task).hookRuns;
+        assert.ok(restored instanceof HookRun);
+        assert.strictEqual(restored.toString(), run.toString());
+        store.dispose();
+    });
+
+    it('compacts segments once most of the data is dead', async () => {
+        const store = new TaskStore(directory, { memoryBudgetBytes: 0, segmentBytes: 4096 });
+        const tasks = Array.from({ length: 40 }, (_, i) => holder(`t${i}`, 5));
+        tasks.forEach(task => store.release(task));
+        const before = store.stats().diskBytes;
+        tasks.slice(0, 35).forEach(task => store.delete(task));
+        await store.compacted();
+
+        const stats = store.stats();
+        assert.ok(stats.diskBytes < before / 2, `${stats.diskBytes} of ${before} bytes left`);
+        assert.strictEqual(store.load(tasks[39]).conversation.length, 5);
+        // The old segments stay until the new locations are recorded.
+        assert.ok(store.hasRetiredSegments);
+        assert.ok(fs.readdirSync(directory).length > stats.segments);
+        store.deleteRetiredSegments();
+        assert.strictEqual(fs.readdirSync(directory).length, stats.segments);
+        store.dispose();
+    });
+
+    it('keeps payloads written while compacting in the background', async () => {
+        const store = new TaskStore(directory, { memoryBudgetBytes: 0, segmentBytes: 4096 });
+        const tasks = Array.from({ length: 40 }, (_, i) => holder(`t${i}`, 5));
+        tasks.forEach(task => store.release(task));
+        tasks.slice(0, 35).forEach(task => store.delete(task));
+
+        const late = holder('late', 3);
+        store.release(late);
+        const updated = store.load(tasks[36]);
+        updated.conversation.push({ type: 'say', say: 'text', text: 'update' } as unknown as Message);
+        store.release(tasks[36]);
+        await store.compacted();
+        store.deleteRetiredSegments();
+
+        assert.strictEqual(store.load(late).conversation.length, 3);
+        assert.strictEqual((store.load(tasks[36]).conversation[5] as any).text, 'update');
+        assert.strictEqual(store.load(tasks[39]).conversation.length, 5);
+        store.dispose();
+    });
+
+    it('bounds memory for thousands of finished tasks', () => {
+        const budget = 1024 * 1024;
+        const store = new TaskStore(directory, { memoryBudgetBytes: budget });
+        const tasks = Array.from({ length: 2000 }, (_, i) => holder(`t${i}`, 20, 'y'.repeat(500)));
+        tasks.forEach(task => store.release(task));
+
+        const stats = store.stats();
+        assert.ok(stats.residentBytes <= budget, `${stats.residentBytes} bytes resident`);
+        assert.ok(tasks.filter(task => task.residentPayload !== undefined).length < 200);
+        assert.strictEqual(store.load(tasks[0]).conversation.length, 20);
+        store.dispose();
+    });
+
+    it('keeps everything in memory without a directory', () => {
+        const store = new TaskStore(undefined, { memoryBudgetBytes: 0 });
+        const task = holder('a', 3);
+        store.release(task);
+
+        assert.ok(task.residentPayload !== undefined);
+    });
+});
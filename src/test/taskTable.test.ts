@@ -0,0 +1,74 @@
+import * as assert from 'assert';
+import { Task, Tasks } from '../tasks/manager';
+import { tasksTable } from '../tasks/taskTable';
+import { addTask } from './taskFixtures';
+
+describe('Task table', function () {
+    let tasks: Tasks;
+
+    beforeEach(() => {
+        tasks = new Tasks(undefined, 0);
+    });
+
+    it('returns one column per field, numbers as Float64Array', () => {
+        const done = addTask(tasks, 'a', { status: 'queued', createdAt: 1_000_000 });
+        done.status = 'running';
+        done.startedAt = 2_000_000;
+        done.status = 'completed';
+        done.finishedAt = 2_003_500;
+        addTask(tasks, 'b', { mode: 'ask', createdAt: 1_000_000 });
+
+        const table = tasksTable([...tasks], ['id', 'mode', 'status', 'created_at', 'duration']);
+
+        assert.deepStrictEqual(table.id, ['a', 'b']);
+        assert.deepStrictEqual(table.mode, ['code', 'ask']);
+        assert.deepStrictEqual(table.status, ['completed', 'prepared']);
+        assert.ok(table.duration instanceof Float64Array);
+        assert.deepStrictEqual([...table.created_at], [1000, 1000]);
+        assert.strictEqual(table.duration[0], 3.5);
+        assert.ok(Number.isNaN(table.duration[1]));
+    });
+
+    it('keeps the finish time of the last run when a resubmitted task is cancelled', () => {
+        const done = addTask(tasks, 'a', { status: 'queued', createdAt: 1_000_000 });
+        done.status = 'running';
+        done.status = 'completed';
+        done.finishedAt = 2_003_500;
+
+        done.submit(false);
+        done.cancel(false);
+
+        assert.strictEqual(done.status, 'completed');
+        assert.deepStrictEqual([...tasksTable([done], ['finished_at']).finished_at], [2003.5]);
+    });
+
+    it('rejects unknown fields', () => {
+        assert.throws(() => tasksTable([], ['id', 'colour']), /Unknown task fields: colour/);
+    });
+
+    it('builds the table of 50k tasks in one pass per field', () => {
+        for (let chunk = 0; chunk < 5; chunk++) {
+            tasks.push(...Array.from({ length: 10_000 }, (_, i) => Task.fromRecord({
+                id: `t${chunk}-${i}`, prompt: 'p', mode: i % 3 ? 'code' : 'ask', client: 'roo', status: i % 4 ? 'completed' : 'error',
+                archived: false, previousAttempts: [], startedAt: i, finishedAt: 2 * i,
+            })));
+        }
+
+        // Count the tasks looked at through their status.
+        const status = Object.getOwnPropertyDescriptor(Task.prototype, 'status')!;
+        let reads = 0;
+        Object.defineProperty(Task.prototype, 'status', { ...status, get() { reads++; return status.get!.call(this); } });
+        let table: ReturnType<typeof tasksTable>;
+        try {
+            table = tasksTable(tasks.withStatus('completed', 'error'));
+        } finally {
+            Object.defineProperty(Task.prototype, 'status', status);
+        }
+
+        assert.strictEqual(table.id.length, 50_000);
+        assert.deepStrictEqual(table.id.slice(0, 2), ['t0-0', 't0-1']);
+        assert.ok(table.duration instanceof Float64Array);
+        // Once for the status column; the tasks are picked by status from the index.
+        assert.strictEqual(reads, 50_000);
+    });
+});
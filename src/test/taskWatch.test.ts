@@ -0,0 +1,102 @@
+import * as assert from 'assert';
+import { Tasks } from '../tasks/manager';
+import { TaskWatcher } from '../tasks/taskWatch';
+import { addTask } from './taskFixtures';
+
+const transition = (event: { taskId: string, oldStatus: string, newStatus: string } | undefined) =>
+    event && `${event.taskId}:${event.oldStatus}->${event.newStatus}`;
+
+describe('Task watchers', function () {
+    let tasks: Tasks;
+
+    beforeEach(() => {
+        tasks = new Tasks(undefined, 0);
+    });
+
+    it('delivers status changes to a waiting and a queued consumer', async () => {
+        const a = addTask(tasks, 'a');
+        const watcher = new TaskWatcher(tasks);
+
+        const waiting = watcher.next();
+        a.status = 'running';
+        a.status = 'completed';
+
+        assert.strictEqual(transition(await waiting), 'a:prepared->running');
+        const queued = await watcher.next();
+        assert.strictEqual(transition(queued), 'a:running->completed');
+        assert.ok(queued!.timestamp > 0);
+        watcher.close();
+    });
+
+    it('only delivers the changes matching the filter', async () => {
+        const a = addTask(tasks, 'a');
+        const b = addTask(tasks, 'b', { client: 'copilot' });
+        const byStatus = new TaskWatcher(tasks, { status: ['completed'] });
+        const byTask = new TaskWatcher(tasks, { taskIds: ['b'] });
+        const byClient = new TaskWatcher(tasks, { client: ['roo'] });
+
+        a.status = 'running';
+        b.status = 'running';
+        b.status = 'completed';
+
+        assert.deepStrictEqual([byStatus.queued, byTask.queued, byClient.queued], [1, 2, 1]);
+        assert.strictEqual(transition(await byStatus.next()), 'b:running->completed');
+        assert.strictEqual(transition(await byClient.next()), 'a:prepared->running');
+    });
+
+    it('drops the oldest events when the queue is full', async () => {
+        const a = addTask(tasks, 'a');
+        const watcher = new TaskWatcher(tasks, {}, 2);
+
+        a.status = 'queued';
+        a.status = 'running';
+        a.status = 'completed';
+
+        assert.strictEqual(watcher.dropped, 1);
+        assert.strictEqual(transition(await watcher.next()), 'a:queued->running');
+        assert.strictEqual(transition(await watcher.next()), 'a:running->completed');
+    });
+
+    it('delivers the deletion of a watched task whatever its status', async () => {
+        addTask(tasks, 'a', { status: 'queued' });
+        addTask(tasks, 'b', { status: 'queued' });
+        const watcher = new TaskWatcher(tasks, { taskIds: ['a'], status: ['completed'] });
+
+        tasks.removeTask('b');
+        tasks.removeTask('a');
+
+        assert.strictEqual(watcher.queued, 1);
+        const event = await watcher.next();
+        assert.strictEqual(transition(event), 'a:queued->queued');
+        assert.strictEqual(event!.removed, true);
+    });
+
+    it('stops delivering when closed', async () => {
+        const a = addTask(tasks, 'a');
+        const watcher = new TaskWatcher(tasks);
+        const waiting = watcher.next();
+
+        watcher.close();
+        a.status = 'running';
+
+        assert.strictEqual(await waiting, undefined);
+        assert.strictEqual(await watcher.next(), undefined);
+        assert.strictEqual(tasks.listenerCount('status'), 0);
+        assert.strictEqual(tasks.listenerCount('remove'), 0);
+    });
+
+    it('can have many watchers open without a listener leak warning', async () => {
+        const warnings: Error[] = [];
+        const onWarning = (warning: Error) => warnings.push(warning);
+        process.on('warning', onWarning);
+        try {
+            const watchers = Array.from({ length: 50 }, () => new TaskWatcher(tasks));
+            await new Promise(resolve => setImmediate(resolve));
+            watchers.forEach(watcher => watcher.close());
+        } finally {
+            process.off('warning', onWarning);
+        }
+
+        assert.deepStrictEqual(warnings.map(warning => warning.name), []);
+    });
+});
@@ -1,33 +1,278 @@
 import { ExecOptions } from "child_process";
 import { CommandRun, shell_command } from "./shellCommand";
+import { TIMEOUTS } from "../core/constants";
 import { Task } from "../tasks/manager";
+import type { BatchStats } from "../tasks/batchHooks";
 import * as telemetry from './telemetry';
 
 export type HookKind = 'onstart' | 'oncomplete' | 'onpause' | 'onresume';
 
+export const HOOK_KINDS: HookKind[] = ['onstart', 'oncomplete', 'onpause', 'onresume'];
+
+/** Hooks of the tasks created together by one call */
+export type BatchHookKind = 'onbatchstart' | 'onbatchcomplete';
+
+export type HookRunKind = HookKind | BatchHookKind;
+
 export interface Hooks {
     onstart?: HookFunction;
     oncomplete?: HookFunction;
     onpause?: HookFunction;
     onresume?: HookFunction;
+    /** Hooks that run in the background, without holding up the worker */
+    nonBlocking?: HookKind[];
+}
+
+/**
+ * What a hook returns to run: a shell command, a list of commands to run in parallel, or
+ * commands explicitly run in parallel or one after the other. These nest.
+ */
+export type HookCommands = string | HookCommands[] | { parallel: HookCommands[] } | { sequential: HookCommands[] };
+
+/**
+ * A hook gets the task and its run, to which the shell commands it runs itself are added.
+ */
+export type HookFunction = (task: Task, run: HookRun) => HookCommands | undefined | Promise<HookCommands | undefined>;
+
+export type BatchHookFunction = (stats: BatchStats, run: HookRun) => HookCommands | undefined | Promise<HookCommands | undefined>;
+
+export interface BatchHooks {
+    onbatchstart?: BatchHookFunction;
+    onbatchcomplete?: BatchHookFunction;
+}
+
+export interface HookContext {
+    cwd: string | undefined;
+    /** Bounds how many hook commands run at the same time, across all hooks */
+    commands: HookPool;
+    /** Gets the output of each command */
+    log: (text: string) => void;
+}
+
+/**
+ * Calls a hook, then runs the shell commands it returns (if any). The hook failing, or any of
+ * its commands, marks the run as failed.
+ */
+export async function executeHook(
+    run: HookRun,
+    call: () => HookCommands | undefined | Promise<HookCommands | undefined>,
+    context: HookContext,
+): Promise<void> {
+    let commands: HookCommands | undefined | null = null;
+    try {
+        commands = await call();
+    } catch {
+        run.failed = true;
+        telemetry.hooksPyException(run.kind, Date.now() - run.timestamp);
+        return;
+    }
+
+    if (commands !== undefined) {
+        try {
+            validateHookCommands(commands);
+        } catch (error) {
+            run.failed = true;
+            context.log(`--------\nInvalid hook commands: ${error instanceof Error ? error.message : error}\n--------\n`);
+            return;
+        }
+        if (!await runHookCommands(run, commands, context)) {
+            run.failed = true;
+        }
+    }
+
+    telemetry.hooksPySuccess(run.kind, Date.now() - run.timestamp);
 }
 
-export type HookFunction = (task: Task) => string | undefined | Promise<string | undefined>;
+/**
+ * Runs the commands, each with its own timeout, and adds them to the run as they finish.
+ * Sequential commands stop at the first failing one, as with `&&`. Returns whether all succeeded.
+ */
+export async function runHookCommands(run: HookRun, commands: HookCommands, context: HookContext): Promise<boolean> {
+    if (typeof commands === 'string') {
+        const cmdRun = await context.commands.limit(() => run.command(commands, { cwd: context.cwd, timeout: TIMEOUTS.SHELL_COMMAND }));
+        context.log('--------\n' + cmdRun.toString() + '\n--------\n');
+        return cmdRun.exitCode === 0;
+    }
+    if (Array.isArray(commands) || 'parallel' in commands) {
+        const parallel = Array.isArray(commands) ? commands : commands.parallel;
+        const results = await Promise.all(parallel.map(command => runHookCommands(run, command, context)));
+        return results.every(ok => ok);
+    }
+    for (const command of commands.sequential) {
+        if (!await runHookCommands(run, command, context)) {
+            return false;
+        }
+    }
+    return true;
+}
+
+/** Throws if the value returned by a hook is not made of HookCommands */
+export function validateHookCommands(commands: unknown) {
+    if (typeof commands === 'string') {
+        return;
+    }
+    if (Array.isArray(commands)) {
+        commands.forEach(validateHookCommands);
+        return;
+    }
+    if (typeof commands === 'object' && commands !== null && Object.keys(commands).length === 1) {
+        const [key, list] = Object.entries(commands)[0];
+        if (key === 'parallel' || key === 'sequential') {
+            if (!Array.isArray(list)) {
+                throw new Error(`'${key}' has to be a list of commands, got ${JSON.stringify(list)}`);
+            }
+            list.forEach(validateHookCommands);
+            return;
+        }
+    }
+    throw new Error(`expected a command, a list of commands, or {parallel: [...]} or {sequential: [...]}, got ${JSON.stringify(commands)}`);
+}
+
+export function setHookBlocking(hooks: Hooks, kind: HookKind, blocking: boolean) {
+    const nonBlocking = (hooks.nonBlocking ?? []).filter(k => k !== kind);
+    hooks.nonBlocking = blocking ? nonBlocking : [...nonBlocking, kind];
+}
+
+export interface HookProxyStats {
+    /** Hook functions held by the global hooks, Hooks objects in Python, or tasks */
+    alive: number;
+    /** Their holders added up */
+    references: number;
+}
+
+/**
+ * Counts the holders of each hook function, and destroys the Python proxy behind it once
+ * nobody holds it any more.
+ */
+export class HookProxyRegistry {
+    private counts = new Map<HookFunction | BatchHookFunction, number>();
+    /** Told about a hook function right before it is destroyed */
+    onDestroy?: (hook: HookFunction | BatchHookFunction) => void;
+
+    retain(hooks: Hooks | undefined) {
+        for (const kind of HOOK_KINDS) {
+            this.retainHook(hooks?.[kind]);
+        }
+    }
+
+    release(hooks: Hooks | undefined) {
+        for (const kind of HOOK_KINDS) {
+            this.releaseHook(hooks?.[kind]);
+        }
+    }
+
+    retainHook(hook: HookFunction | BatchHookFunction | undefined) {
+        if (hook !== undefined) {
+            this.counts.set(hook, (this.counts.get(hook) ?? 0) + 1);
+        }
+    }
+
+    releaseHook(hook: HookFunction | BatchHookFunction | undefined) {
+        const count = hook !== undefined ? this.counts.get(hook) : undefined;
+        if (count === undefined) {
+            return;
+        }
+        if (count > 1) {
+            this.counts.set(hook!, count - 1);
+            return;
+        }
+        this.counts.delete(hook!);
+        this.onDestroy?.(hook!);
+        (hook as { destroy?: () => void }).destroy?.();
+    }
+
+    stats(): HookProxyStats {
+        let references = 0;
+        for (const count of this.counts.values()) {
+            references += count;
+        }
+        return { alive: this.counts.size, references };
+    }
+}
+
+export const DEFAULT_BACKGROUND_HOOK_CONCURRENCY = 4;
+export const DEFAULT_HOOK_COMMAND_CONCURRENCY = 4;
+
+/**
+ * Runs background hooks (or hook commands), at most `concurrency` at a time; the others wait
+ * their turn.
+ */
+export class HookPool {
+    private running = 0;
+    private waiting: (() => Promise<void>)[] = [];
+    private idleListeners: (() => void)[] = [];
+
+    constructor(public concurrency: number = DEFAULT_BACKGROUND_HOOK_CONCURRENCY) {}
+
+    run(job: () => Promise<void>) {
+        this.waiting.push(job);
+        this.startWaiting();
+    }
+
+    /** Runs the job when its turn comes, and returns its result */
+    limit<T>(job: () => Promise<T>): Promise<T> {
+        return new Promise<T>((resolve, reject) => this.run(() => job().then(resolve, reject)));
+    }
+
+    get active(): number {
+        return this.running;
+    }
+
+    get queued(): number {
+        return this.waiting.length;
+    }
+
+    /** Resolves once no hook is running or waiting */
+    idle(): Promise<void> {
+        if (this.running === 0 && this.waiting.length === 0) {
+            return Promise.resolve();
+        }
+        return new Promise(resolve => this.idleListeners.push(resolve));
+    }
+
+    private startWaiting() {
+        while (this.running < Math.max(1, this.concurrency) && this.waiting.length > 0) {
+            const job = this.waiting.shift()!;
+            this.running++;
+            job().catch(error => console.error('Background hook failed:', error)).finally(() => {
+                this.running--;
+                this.startWaiting();
+                if (this.running === 0 && this.waiting.length === 0) {
+                    const listeners = this.idleListeners;
+                    this.idleListeners = [];
+                    listeners.forEach(resolve => resolve());
+                }
+            });
+        }
+    }
+}
 
 
 export class HookRun {
-    kind: HookKind;
+    kind: HookRunKind;
     commands: CommandRun[] = [];
     failed: boolean = false;
+    /** Ran in the background, after the worker went on */
+    background: boolean = false;
 
     /// Timestamp when the hook was triggered
     timestamp: number;
 
-    constructor(kind: HookKind) {
+    constructor(kind: HookRunKind) {
         this.kind = kind;
         this.timestamp = Date.now();
     }
 
+    /** Restores a hook run from its JSON form. */
+    static fromJSON(data: any): HookRun {
+        const run = new HookRun(data.kind);
+        run.timestamp = data.timestamp;
+        run.failed = data.failed;
+        run.background = data.background ?? false;
+        run.commands = (data.commands ?? []).map((command: any) => CommandRun.fromJSON(command));
+        return run;
+    }
+
     async command(command: string, options: ExecOptions): Promise<CommandRun> {
         telemetry.hooksCmdStart(this.kind, command);
 
@@ -41,7 +286,7 @@ export class HookRun {
 
     toString(): string {
         return `=== Hook run
-failed: ${this.failed}
+failed: ${this.failed}${this.background ? '\nbackground: true' : ''}
 started: ${new Date(this.timestamp).toString()}
 
 commands:
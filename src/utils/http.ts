@@ -0,0 +1,325 @@
+import * as fs from 'fs';
+import * as http from 'http';
+import * as https from 'https';
+import { Socket } from 'net';
+
+export interface HttpRequestOptions {
+    method: string;
+    url: string;
+    headers?: Record<string, string>;
+    body?: string | Uint8Array;
+    /** Path of a file streamed from disk as the request body (instead of `body`) */
+    bodyFile?: string;
+    /** Called as the body file is sent */
+    onUploadProgress?: (sentBytes: number, totalBytes: number) => void;
+    timeout?: number;
+    /** Socket inactivity timeout while the response body is read (`timeout` by default); 0 for none */
+    idleTimeout?: number;
+}
+
+export interface HttpResult {
+    success: boolean;
+    statusCode?: number;
+    error?: string;
+    response?: string;
+    headers?: Record<string, string>;
+}
+
+export type HttpTransport = (options: HttpRequestOptions) => Promise<HttpResult>;
+
+export interface HttpClientOptions {
+    /** Maximum number of concurrent sockets per origin; further requests wait for a free socket */
+    maxSocketsPerOrigin: number;
+    /** Maximum number of concurrent sockets across all origins */
+    maxTotalSockets: number;
+    /** Idle keep-alive sockets are closed after this many milliseconds */
+    keepAliveMs: number;
+    /** Default socket inactivity timeout of a request */
+    timeoutMs: number;
+}
+
+export const DEFAULT_HTTP_CLIENT_OPTIONS: HttpClientOptions = {
+    maxSocketsPerOrigin: 8,
+    maxTotalSockets: 64,
+    keepAliveMs: 15_000,
+    timeoutMs: 10_000,
+};
+
+const UPLOAD_CHUNK_SIZE = 64 * 1024;
+
+export interface HttpClientStats {
+    requests: number;
+    reusedSockets: number;
+    activeSockets: number;
+    idleSockets: number;
+    queuedRequests: number;
+}
+
+/**
+ * Streaming view of a response body. The body is pulled chunk by chunk with `read()`;
+ * a response that is not read to the end must be closed to release its socket.
+ */
+export class HttpResponseStream {
+    readonly statusCode: number;
+    readonly headers: Record<string, string>;
+    private readonly chunks: AsyncIterator<Buffer>;
+
+    constructor(private readonly response: http.IncomingMessage) {
+        this.statusCode = response.statusCode ?? 0;
+        this.headers = {};
+        for (const [name, value] of Object.entries(response.headers)) {
+            if (value !== undefined) {
+                this.headers[name] = Array.isArray(value) ? value.join(', ') : value;
+            }
+        }
+        this.chunks = response[Symbol.asyncIterator]();
+    }
+
+    get ok(): boolean {
+        return this.statusCode >= 200 && this.statusCode < 300;
+    }
+
+    /** Next chunk of the body, or undefined at the end. */
+    async read(): Promise<Uint8Array | undefined> {
+        const { value, done } = await this.chunks.next();
+        return done ? undefined : value;
+    }
+
+    /** Reads the rest of the body. */
+    async bytes(): Promise<Uint8Array> {
+        const parts: Uint8Array[] = [];
+        let chunk: Uint8Array | undefined;
+        while ((chunk = await this.read()) !== undefined) {
+            parts.push(chunk);
+        }
+        return Buffer.concat(parts);
+    }
+
+    async text(): Promise<string> {
+        return Buffer.from(await this.bytes()).toString('utf8');
+    }
+
+    /** Discards the unread rest of the body. */
+    close() {
+        if (!this.response.complete) {
+            this.response.destroy();
+        }
+    }
+}
+
+/**
+ * HTTP(S) client with keep-alive connection pooling.
+ *
+ * Sockets are pooled per origin by one keep-alive agent per protocol, so consecutive
+ * requests to the same server (ntfy posts, SuperCode status polls) skip TCP and TLS setup.
+ */
+export class HttpClient {
+    private options: HttpClientOptions;
+    private httpAgent!: http.Agent;
+    private httpsAgent!: https.Agent;
+    /** Agents replaced by `configure`, kept until their requests in flight are done */
+    private retiredAgents = new Set<http.Agent>();
+    private requests = 0;
+    private reusedSockets = 0;
+
+    constructor(options: Partial<HttpClientOptions> = {}) {
+        this.options = { ...DEFAULT_HTTP_CLIENT_OPTIONS, ...options };
+        this.createAgents();
+    }
+
+    /**
+     * Change the pool limits. Idle sockets are closed; requests in flight (and queued ones)
+     * complete normally on the previous agents, whose sockets are closed as they are freed.
+     */
+    configure(options: Partial<HttpClientOptions>) {
+        const previous = [this.httpAgent, this.httpsAgent];
+        this.options = { ...this.options, ...options };
+        this.createAgents();
+        for (const agent of previous) {
+            this.retire(agent);
+        }
+    }
+
+    /**
+     * Sends a request and buffers the response body.
+     * Never rejects: network errors and timeouts are reported via `success: false`.
+     */
+    async request(options: HttpRequestOptions): Promise<HttpResult> {
+        try {
+            const response = await this.stream(options);
+            const data = await response.text();
+            const success = response.ok;
+            return {
+                success,
+                statusCode: response.statusCode,
+                response: data,
+                headers: response.headers,
+                error: success ? undefined : `HTTP ${response.statusCode}: ${data}`
+            };
+        } catch (error) {
+            return {
+                success: false,
+                error: error instanceof Error ? error.message : String(error)
+            };
+        }
+    }
+
+    /**
+     * Sends a request and resolves as soon as the response headers arrive.
+     * Rejects on network errors and timeouts before the headers.
+     * A `bodyFile` is uploaded in chunks, so its size does not affect memory use.
+     */
+    async stream(options: HttpRequestOptions): Promise<HttpResponseStream> {
+        const fileSize = options.bodyFile !== undefined ? (await fs.promises.stat(options.bodyFile)).size : undefined;
+
+        return await new Promise((resolve, reject) => {
+            let parsedUrl: URL;
+            try {
+                parsedUrl = new URL(options.url);
+            } catch (error) {
+                reject(new Error(`Invalid URL: ${options.url}`));
+                return;
+            }
+
+            const isHttps = parsedUrl.protocol === 'https:';
+            const client = isHttps ? https : http;
+
+            const headers: Record<string, string | number> = { ...options.headers };
+            const hasHeader = (name: string) => Object.keys(headers).some(key => key.toLowerCase() === name);
+            if (fileSize !== undefined) {
+                if (!hasHeader('content-type')) {
+                    headers['Content-Type'] = 'application/octet-stream';
+                }
+                headers['Content-Length'] = fileSize;
+            } else if (options.body !== undefined) {
+                if (!hasHeader('content-type')) {
+                    headers['Content-Type'] = typeof options.body === 'string' ? 'text/plain; charset=utf-8' : 'application/octet-stream';
+                }
+                if (!hasHeader('content-length')) {
+                    headers['Content-Length'] = typeof options.body === 'string' ? Buffer.byteLength(options.body) : options.body.byteLength;
+                }
+            }
+
+            const requestOptions: http.RequestOptions = {
+                hostname: parsedUrl.hostname,
+                port: parsedUrl.port || (isHttps ? 443 : 80),
+                path: parsedUrl.pathname + parsedUrl.search,
+                method: options.method,
+                headers,
+                agent: isHttps ? this.httpsAgent : this.httpAgent,
+                timeout: options.timeout || this.options.timeoutMs
+            };
+
+            this.requests++;
+            const req = client.request(requestOptions, (res) => {
+                if (req.reusedSocket) {
+                    this.reusedSockets++;
+                }
+                if (options.idleTimeout !== undefined) {
+                    req.setTimeout(options.idleTimeout);
+                }
+                resolve(new HttpResponseStream(res));
+            });
+
+            req.on('error', reject);
+
+            req.on('timeout', () => {
+                req.destroy(new Error('Request timeout'));
+            });
+
+            if (options.bodyFile !== undefined) {
+                const file = fs.createReadStream(options.bodyFile, { highWaterMark: UPLOAD_CHUNK_SIZE });
+                let sent = 0;
+                file.on('data', chunk => {
+                    sent += chunk.length;
+                    options.onUploadProgress?.(sent, fileSize!);
+                });
+                file.on('error', error => req.destroy(error));
+                req.on('close', () => file.destroy());
+                file.pipe(req);
+            } else {
+                req.end(options.body);
+            }
+        });
+    }
+
+    stats(): HttpClientStats {
+        const count = (sockets: NodeJS.ReadOnlyDict<unknown[]>) =>
+            Object.values(sockets).reduce((total, list) => total + (list?.length ?? 0), 0);
+        const agents = [this.httpAgent, this.httpsAgent, ...this.retiredAgents];
+        return {
+            requests: this.requests,
+            reusedSockets: this.reusedSockets,
+            activeSockets: agents.reduce((total, agent) => total + count(agent.sockets), 0),
+            idleSockets: agents.reduce((total, agent) => total + count(agent.freeSockets), 0),
+            queuedRequests: agents.reduce((total, agent) => total + count(agent.requests), 0),
+        };
+    }
+
+    /** Closes all pooled sockets. */
+    dispose() {
+        this.httpAgent.destroy();
+        this.httpsAgent.destroy();
+        for (const agent of this.retiredAgents) {
+            agent.destroy();
+        }
+        this.retiredAgents.clear();
+    }
+
+    /** Lets the agent finish its requests without reusing its sockets, then drops it. */
+    private retire(agent: http.Agent) {
+        const busy = () => [agent.sockets, agent.requests].some(pool => Object.values(pool).some(list => (list?.length ?? 0) > 0));
+        const dropIfDone = () => {
+            if (this.retiredAgents.has(agent) && !busy()) {
+                this.retiredAgents.delete(agent);
+                agent.destroy();
+            }
+        };
+        const watched = new WeakSet<Socket>();
+        const watch = (socket: Socket) => {
+            if (!watched.has(socket)) {
+                watched.add(socket);
+                socket.once('close', dropIfDone);
+            }
+        };
+
+        this.retiredAgents.add(agent);
+        for (const sockets of Object.values(agent.freeSockets)) {
+            sockets?.forEach(socket => socket.destroy());
+        }
+        for (const sockets of Object.values(agent.sockets)) {
+            sockets?.forEach(watch);
+        }
+        // The agent's own listener runs first: it hands the socket to a queued request, or keeps it idle.
+        agent.on('free', (socket: Socket) => {
+            watch(socket);
+            if (Object.values(agent.freeSockets).some(sockets => sockets?.includes(socket))) {
+                socket.destroy();
+            }
+        });
+        dropIfDone();
+    }
+
+    private createAgents() {
+        const agentOptions: http.AgentOptions = {
+            keepAlive: true,
+            maxSockets: this.options.maxSocketsPerOrigin,
+            maxTotalSockets: this.options.maxTotalSockets,
+            timeout: this.options.keepAliveMs,
+            scheduling: 'lifo',
+        };
+        this.httpAgent = new http.Agent(agentOptions);
+        this.httpsAgent = new https.Agent(agentOptions);
+    }
+}
+
+// Shared pooled client for use across the extension
+export const httpClient = new HttpClient();
+
+/**
+ * Sends a single HTTP(S) request through the shared pooled client and buffers the response body.
+ * Never rejects: network errors and timeouts are reported via `success: false`.
+ */
+export function httpRequest(options: HttpRequestOptions): Promise<HttpResult> {
+    return httpClient.request(options);
+}
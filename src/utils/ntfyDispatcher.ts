@@ -0,0 +1,506 @@
+import * as fs from 'fs/promises';
+import * as path from 'path';
+import { HttpRequestOptions, HttpTransport } from './http';
+import { TokenBucket, backoffDelay } from './rateLimit';
+
+/**
+ * A single ntfy publish request.
+ */
+export interface NtfyMessage {
+    /** Full topic URL, e.g. `https://ntfy.sh/my-topic` */
+    url: string;
+    body: string;
+    headers: Record<string, string>;
+    /**
+     * Messages for the same topic sharing this key within the coalescing window
+     * are delivered as one digest titled `"<count> <coalesceKey>"`.
+     */
+    coalesceKey?: string;
+    /**
+     * File uploaded as an ntfy attachment (PUT with the file as body). The file is
+     * streamed from disk; `body` becomes the notification text. Attachments are never coalesced.
+     */
+    attachPath?: string;
+    /** Attachment file name shown by ntfy; defaults to the base name of `attachPath` */
+    filename?: string;
+}
+
+/** Reports attachment upload progress. */
+export type NtfyUploadProgress = (sentBytes: number, totalBytes: number) => void;
+
+export interface NtfyDelivery {
+    success: boolean;
+    statusCode?: number;
+    error?: string;
+    /** Number of HTTP attempts made */
+    attempts: number;
+    /** Number of messages delivered together (1 unless coalesced) */
+    messages: number;
+    /** True when the message could not be delivered and was written to the spool */
+    spooled: boolean;
+    /** True when the message was accepted into a digest that is delivered when the coalescing window ends */
+    queued?: boolean;
+}
+
+export interface NtfyDispatcherOptions {
+    /** Sustained publish rate per topic */
+    ratePerMinute: number;
+    /** Number of messages that can be sent back-to-back before rate limiting kicks in */
+    burst: number;
+    /** Retries after the first failed attempt */
+    maxRetries: number;
+    retryBaseMs: number;
+    retryMaxMs: number;
+    /** How long to collect messages with the same `coalesceKey` before sending a digest */
+    coalesceWindowMs: number;
+    /** Per-request timeout */
+    timeoutMs: number;
+    /** JSONL file for undeliverable messages; spooling is disabled when not set */
+    spoolFile?: string;
+    /** Oldest spooled messages are dropped beyond this count */
+    maxSpooled: number;
+    /** How often to retry delivering spooled messages */
+    replayIntervalMs: number;
+    /** Attachments larger than this are rejected without uploading */
+    maxAttachmentBytes: number;
+    /** Minimum interval between upload progress reports */
+    progressIntervalMs: number;
+}
+
+export const DEFAULT_NTFY_DISPATCHER_OPTIONS: NtfyDispatcherOptions = {
+    ratePerMinute: 12,
+    burst: 10,
+    maxRetries: 4,
+    retryBaseMs: 1000,
+    retryMaxMs: 60_000,
+    coalesceWindowMs: 10_000,
+    timeoutMs: 10_000,
+    maxSpooled: 1000,
+    replayIntervalMs: 60_000,
+    // Default attachment size limit of ntfy.sh
+    maxAttachmentBytes: 15 * 1024 * 1024,
+    progressIntervalMs: 250,
+};
+
+/** ntfy rejects message bodies above 4096 bytes (they become attachments). */
+const MAX_DIGEST_LENGTH = 4000;
+
+interface SpooledMessage {
+    url: string;
+    body: string;
+    headers: Record<string, string>;
+    attachPath?: string;
+    filename?: string;
+    spooledAt: number;
+}
+
+/** A rate of 0 would never refill the buckets, and a burst below 1 never hold a whole token. */
+function checkRateLimit(options: NtfyDispatcherOptions): NtfyDispatcherOptions {
+    if (!(options.ratePerMinute > 0)) {
+        throw new Error(`The ntfy rate limit must be above 0 per minute, got ${options.ratePerMinute}`);
+    }
+    if (!(options.burst >= 1)) {
+        throw new Error(`The ntfy burst must be at least 1, got ${options.burst}`);
+    }
+    return options;
+}
+
+interface PendingDigest {
+    messages: NtfyMessage[];
+    timer: NodeJS.Timeout;
+}
+
+/**
+ * Delivers ntfy notifications with per-topic rate limiting, optional coalescing,
+ * retries with exponential backoff, and an on-disk spool for messages that could
+ * not be delivered. Spooled messages are replayed once the server accepts messages again.
+ */
+export class NtfyDispatcher {
+    private options: NtfyDispatcherOptions;
+    private readonly buckets = new Map<string, TokenBucket>();
+    /** Per-topic chain of token acquisitions, keeps publishing order FIFO */
+    private readonly gates = new Map<string, Promise<void>>();
+    private readonly digests = new Map<string, PendingDigest>();
+    private spoolWrite: Promise<void> = Promise.resolve();
+    /** Whether the spool may contain messages; unknown (true) until it was read once */
+    private spoolDirty: boolean = true;
+    private replaying?: Promise<number>;
+    private replayTimer?: NodeJS.Timeout;
+
+    constructor(private readonly transport: HttpTransport, options: Partial<NtfyDispatcherOptions> = {}) {
+        this.options = checkRateLimit({ ...DEFAULT_NTFY_DISPATCHER_OPTIONS, ...options });
+    }
+
+    configure(options: Partial<NtfyDispatcherOptions>) {
+        this.options = checkRateLimit({ ...this.options, ...options });
+        for (const bucket of this.buckets.values()) {
+            bucket.configure(this.options.ratePerMinute, this.options.burst);
+        }
+    }
+
+    /**
+     * Publish a message. Resolves once the message has been delivered or spooled.
+     * Messages with a `coalesceKey` resolve as soon as they are added to the pending digest
+     * (`queued: true`), so callers such as task hooks do not wait for the coalescing window.
+     * `onProgress` is called (throttled) while an attachment is uploaded.
+     */
+    async publish(message: NtfyMessage, onProgress?: NtfyUploadProgress): Promise<NtfyDelivery> {
+        if (message.attachPath !== undefined) {
+            const error = await this.checkAttachment(message.attachPath);
+            if (error !== undefined) {
+                return { success: false, error, attempts: 0, messages: 1, spooled: false };
+            }
+            return await this.deliver(message, true, onProgress && throttleProgress(onProgress, this.options.progressIntervalMs));
+        }
+        if (message.coalesceKey === undefined || this.options.coalesceWindowMs <= 0) {
+            return await this.deliver(message);
+        }
+
+        const digestKey = `${message.url}\n${message.coalesceKey}`;
+        let pending = this.digests.get(digestKey);
+        if (pending === undefined) {
+            const timer = setTimeout(() => this.flushDigest(digestKey), this.options.coalesceWindowMs);
+            pending = { messages: [], timer };
+            this.digests.set(digestKey, pending);
+        }
+        pending.messages.push(message);
+        return { success: true, attempts: 0, messages: pending.messages.length, spooled: false, queued: true };
+    }
+
+    /** Deliver all pending digests now, without waiting for their coalescing windows. */
+    async flush(): Promise<NtfyDelivery[]> {
+        return await Promise.all([...this.digests.keys()].map(key => this.flushDigest(key)));
+    }
+
+    /**
+     * Try to deliver the spooled messages, oldest first, each with a single attempt.
+     * Stops at the first message that fails in a way worth retrying; it and the
+     * messages after it stay in the spool for the next replay.
+     * @returns Number of messages delivered
+     */
+    replaySpool(): Promise<number> {
+        if (this.replaying === undefined) {
+            this.replaying = this.doReplay().finally(() => { this.replaying = undefined; });
+        }
+        return this.replaying;
+    }
+
+    /** Number of messages waiting in the spool. */
+    async spooledCount(): Promise<number> {
+        return (await this.readSpool()).length;
+    }
+
+    dispose() {
+        this.flush().catch(error => console.error('ntfy: failed to flush pending digests', error));
+        this.stopReplayTimer();
+    }
+
+    private stopReplayTimer() {
+        if (this.replayTimer !== undefined) {
+            clearInterval(this.replayTimer);
+            this.replayTimer = undefined;
+        }
+    }
+
+    private async flushDigest(digestKey: string): Promise<NtfyDelivery> {
+        const pending = this.digests.get(digestKey)!;
+        this.digests.delete(digestKey);
+        clearTimeout(pending.timer);
+
+        const delivery = await this.deliver(buildDigest(pending.messages));
+        delivery.messages = pending.messages.length;
+        if (!delivery.success && !delivery.spooled) {
+            console.error(`ntfy: digest of ${delivery.messages} messages was rejected: ${delivery.error}`);
+        }
+        return delivery;
+    }
+
+    private async deliver(
+        message: NtfyMessage,
+        spoolOnFailure: boolean = true,
+        onProgress?: NtfyUploadProgress,
+        maxRetries: number = this.options.maxRetries,
+    ): Promise<NtfyDelivery> {
+        const { retryBaseMs, retryMaxMs } = this.options;
+        let delivery: NtfyDelivery = { success: false, attempts: 0, messages: 1, spooled: false };
+
+        for (let attempt = 0; attempt <= maxRetries; attempt++) {
+            await this.acquireToken(message.url);
+
+            const result = await this.transport(this.buildRequest(message, onProgress));
+            delivery = { ...delivery, success: result.success, statusCode: result.statusCode, error: result.error, attempts: attempt + 1 };
+
+            if (result.success) {
+                if (spoolOnFailure && this.spoolDirty && this.options.spoolFile !== undefined) {
+                    // The server is reachable again, flush whatever piled up in the meantime.
+                    this.replaySpool().catch(error => console.error('ntfy: failed to replay spool', error));
+                }
+                return delivery;
+            }
+            if (!isRetryable(result.statusCode)) {
+                return delivery;
+            }
+            if (attempt < maxRetries) {
+                await sleep(backoffDelay(attempt, retryBaseMs, retryMaxMs));
+            }
+        }
+
+        if (spoolOnFailure && this.options.spoolFile !== undefined) {
+            await this.appendToSpool([{
+                url: message.url,
+                body: message.body,
+                headers: message.headers,
+                attachPath: message.attachPath,
+                filename: message.filename,
+                spooledAt: Date.now(),
+            }]);
+            delivery.spooled = true;
+        }
+        return delivery;
+    }
+
+    /** Plain messages are POSTed; attachments are PUT with the file as body and the text in a header. */
+    private buildRequest(message: NtfyMessage, onProgress?: NtfyUploadProgress): HttpRequestOptions {
+        if (message.attachPath === undefined) {
+            return { method: 'POST', url: message.url, headers: message.headers, body: message.body, timeout: this.options.timeoutMs };
+        }
+        const headers: Record<string, string> = {
+            ...message.headers,
+            Filename: encodeHeaderValue(message.filename ?? path.basename(message.attachPath)),
+        };
+        if (message.body !== '') {
+            headers['Message'] = encodeHeaderValue(message.body);
+        }
+        return {
+            method: 'PUT',
+            url: message.url,
+            headers,
+            bodyFile: message.attachPath,
+            onUploadProgress: onProgress,
+            timeout: this.options.timeoutMs,
+        };
+    }
+
+    /** Returns why the file cannot be attached, if it cannot. */
+    private async checkAttachment(attachPath: string): Promise<string | undefined> {
+        let stats;
+        try {
+            stats = await fs.stat(attachPath);
+        } catch {
+            return `Attachment not found: ${attachPath}`;
+        }
+        if (!stats.isFile()) {
+            return `Attachment is not a file: ${attachPath}`;
+        }
+        if (stats.size > this.options.maxAttachmentBytes) {
+            return `Attachment ${attachPath} is ${formatBytes(stats.size)}, above the ${formatBytes(this.options.maxAttachmentBytes)} limit`;
+        }
+        return undefined;
+    }
+
+    private acquireToken(url: string): Promise<void> {
+        let bucket = this.buckets.get(url);
+        if (bucket === undefined) {
+            bucket = new TokenBucket(this.options.ratePerMinute, this.options.burst);
+            this.buckets.set(url, bucket);
+        }
+        const topicBucket = bucket;
+        const gate = (this.gates.get(url) ?? Promise.resolve()).then(async () => {
+            while (!topicBucket.tryTake()) {
+                await sleep(topicBucket.msUntilAvailable());
+            }
+        });
+        this.gates.set(url, gate);
+        return gate;
+    }
+
+    private async doReplay(): Promise<number> {
+        // Messages leave the spool file one by one once they are handled, so a reload
+        // during the replay loses none of them.
+        const spooled = await this.afterSpoolWrites(() => this.readSpool());
+        this.spoolDirty = false;
+        let delivered = 0;
+        for (const message of spooled) {
+            if (message.attachPath !== undefined) {
+                const error = await this.checkAttachment(message.attachPath);
+                if (error !== undefined) {
+                    console.warn(`ntfy: dropping spooled message: ${error}`);
+                    await this.removeFromSpool(message);
+                    continue;
+                }
+            }
+            const delivery = await this.deliver(message, false, undefined, 0);
+            if (!delivery.success && isRetryable(delivery.statusCode)) {
+                // Still down: leave the rest for the next replay instead of retrying each message.
+                this.spoolDirty = true;
+                break;
+            }
+            if (delivery.success) {
+                delivered++;
+            }
+            await this.removeFromSpool(message);
+        }
+        return delivered;
+    }
+
+    private appendToSpool(messages: SpooledMessage[]): Promise<void> {
+        const spoolFile = this.options.spoolFile!;
+        this.spoolWrite = this.spoolWrite.then(async () => {
+            await fs.mkdir(path.dirname(spoolFile), { recursive: true });
+            await fs.appendFile(spoolFile, messages.map(m => JSON.stringify(m) + '\n').join(''), 'utf8');
+            this.spoolDirty = true;
+
+            const spooled = await this.readSpool();
+            if (spooled.length > this.options.maxSpooled) {
+                await this.writeSpool(spooled.slice(spooled.length - this.options.maxSpooled));
+            }
+        }).catch(error => console.error('ntfy: failed to write spool', error));
+        this.startReplayTimer();
+        return this.spoolWrite;
+    }
+
+    /** Drops the oldest spooled copy of a replayed message; messages spooled meanwhile are kept. */
+    private removeFromSpool(message: SpooledMessage): Promise<void> {
+        const line = JSON.stringify(message);
+        return this.afterSpoolWrites(async () => {
+            const spooled = await this.readSpool();
+            const index = spooled.findIndex(m => JSON.stringify(m) === line);
+            if (index !== -1) {
+                spooled.splice(index, 1);
+                await this.writeSpool(spooled);
+            }
+        }).catch(error => console.error('ntfy: failed to write spool', error));
+    }
+
+    /** Runs `job` once the pending spool writes are done, and before any later one. */
+    private afterSpoolWrites<T>(job: () => Promise<T>): Promise<T> {
+        const result = this.spoolWrite.then(job);
+        this.spoolWrite = result.then(() => undefined, () => undefined);
+        return result;
+    }
+
+    /** Replaces the spool; written to a temporary file first, so a crash leaves either version. */
+    private async writeSpool(messages: SpooledMessage[]) {
+        const spoolFile = this.options.spoolFile!;
+        const temporary = `${spoolFile}.tmp`;
+        await fs.writeFile(temporary, messages.map(m => JSON.stringify(m) + '\n').join(''), 'utf8');
+        await fs.rename(temporary, spoolFile);
+    }
+
+    private async readSpool(): Promise<SpooledMessage[]> {
+        if (this.options.spoolFile === undefined) {
+            return [];
+        }
+        let content: string;
+        try {
+            content = await fs.readFile(this.options.spoolFile, 'utf8');
+        } catch {
+            return [];
+        }
+        const messages: SpooledMessage[] = [];
+        for (const line of content.split('\n')) {
+            if (line.trim() === '') {
+                continue;
+            }
+            try {
+                messages.push(JSON.parse(line));
+            } catch {
+                // Skip lines damaged by an interrupted write.
+            }
+        }
+        return messages;
+    }
+
+    private startReplayTimer() {
+        if (this.replayTimer !== undefined) {
+            return;
+        }
+        this.replayTimer = setInterval(async () => {
+            if (await this.spooledCount() === 0) {
+                this.stopReplayTimer();
+                return;
+            }
+            this.replaySpool().catch(error => console.error('ntfy: failed to replay spool', error));
+        }, this.options.replayIntervalMs);
+        this.replayTimer.unref?.();
+    }
+}
+
+/**
+ * Merge messages collected during the coalescing window into a single notification.
+ * A lone message is sent unchanged.
+ */
+export function buildDigest(messages: NtfyMessage[]): NtfyMessage {
+    if (messages.length === 1) {
+        return messages[0];
+    }
+
+    const first = messages[0];
+    const headers: Record<string, string> = { ...first.headers };
+
+    const priorities = messages.map(m => Number(m.headers['Priority'] ?? 3)).filter(p => !isNaN(p));
+    if (priorities.length > 0) {
+        headers['Priority'] = String(Math.max(...priorities));
+    }
+
+    const tags = new Set<string>();
+    for (const m of messages) {
+        for (const tag of (m.headers['Tags'] ?? '').split(',')) {
+            if (tag.trim() !== '') {
+                tags.add(tag.trim());
+            }
+        }
+    }
+    if (tags.size > 0) {
+        headers['Tags'] = [...tags].join(',');
+    }
+
+    headers['Title'] = `${messages.length} ${first.coalesceKey}`;
+
+    let body = messages.map(m => `- ${m.body}`).join('\n');
+    if (body.length > MAX_DIGEST_LENGTH) {
+        body = body.slice(0, MAX_DIGEST_LENGTH - 4) + '\n...';
+    }
+
+    return { url: first.url, body, headers };
+}
+
+/**
+ * HTTP header values must be ASCII without line breaks; anything else is sent
+ * RFC 2047 encoded, which ntfy decodes.
+ */
+export function encodeHeaderValue(value: string): string {
+    if (/^[\x20-\x7e]*$/.test(value)) {
+        return value;
+    }
+    return `=?UTF-8?B?${Buffer.from(value, 'utf8').toString('base64')}?=`;
+}
+
+/** Limits progress reports to one per interval; the final report is always passed on. */
+function throttleProgress(onProgress: NtfyUploadProgress, intervalMs: number): NtfyUploadProgress {
+    let lastReport = 0;
+    return (sentBytes, totalBytes) => {
+        const now = Date.now();
+        if (sentBytes >= totalBytes || now - lastReport >= intervalMs) {
+            lastReport = now;
+            try {
+                onProgress(sentBytes, totalBytes);
+            } catch (error) {
+                console.error('ntfy: progress callback failed', error);
+            }
+        }
+    };
+}
+
+function formatBytes(bytes: number): string {
+    return bytes >= 1024 * 1024 ? `${(bytes / (1024 * 1024)).toFixed(1)} MB` : `${Math.ceil(bytes / 1024)} KB`;
+}
+
+/** Network errors, timeouts, rate limiting and server errors are worth retrying. */
+function isRetryable(statusCode: number | undefined): boolean {
+    return statusCode === undefined || statusCode === 0 || statusCode === 408 || statusCode === 429 || statusCode >= 500;
+}
+
+function sleep(ms: number): Promise<void> {
+    return new Promise(resolve => setTimeout(resolve, ms));
+}
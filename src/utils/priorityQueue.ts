@@ -0,0 +1,74 @@
+/**
+ * Binary heap.
+ *
+ * `before(a, b)` tells whether `a` comes out before `b`. Push and pop take O(log n).
+ */
+export class PriorityQueue<T> {
+    private heap: T[] = [];
+
+    constructor(private readonly before: (a: T, b: T) => boolean) {}
+
+    get size(): number {
+        return this.heap.length;
+    }
+
+    peek(): T | undefined {
+        return this.heap[0];
+    }
+
+    push(item: T) {
+        this.heap.push(item);
+        this.siftUp(this.heap.length - 1);
+    }
+
+    pop(): T | undefined {
+        const top = this.heap[0];
+        const last = this.heap.pop();
+        if (this.heap.length > 0) {
+            this.heap[0] = last!;
+            this.siftDown(0);
+        }
+        return top;
+    }
+
+    /** Replaces the contents, in O(n). */
+    reset(items: T[]) {
+        this.heap = [...items];
+        for (let i = (this.heap.length >> 1) - 1; i >= 0; i--) {
+            this.siftDown(i);
+        }
+    }
+
+    private siftUp(index: number) {
+        const item = this.heap[index];
+        while (index > 0) {
+            const parent = (index - 1) >> 1;
+            if (!this.before(item, this.heap[parent])) {
+                break;
+            }
+            this.heap[index] = this.heap[parent];
+            index = parent;
+        }
+        this.heap[index] = item;
+    }
+
+    private siftDown(index: number) {
+        const item = this.heap[index];
+        const length = this.heap.length;
+        while (true) {
+            let child = 2 * index + 1;
+            if (child >= length) {
+                break;
+            }
+            if (child + 1 < length && this.before(this.heap[child + 1], this.heap[child])) {
+                child++;
+            }
+            if (!this.before(this.heap[child], item)) {
+                break;
+            }
+            this.heap[index] = this.heap[child];
+            index = child;
+        }
+        this.heap[index] = item;
+    }
+}
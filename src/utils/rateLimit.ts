@@ -0,0 +1,74 @@
+/**
+ * Token bucket rate limiter.
+ *
+ * The bucket holds up to `capacity` tokens and refills continuously at `ratePerMinute`.
+ * Each operation takes one token; when the bucket is empty, `msUntilAvailable` tells
+ * how long to wait for the next one.
+ */
+export class TokenBucket {
+    private tokens: number;
+    private updatedAt: number;
+
+    constructor(
+        private ratePerMinute: number,
+        private capacity: number,
+        private readonly now: () => number = Date.now,
+    ) {
+        this.tokens = capacity;
+        this.updatedAt = now();
+    }
+
+    /** Change the limits, keeping the tokens that are already available. */
+    configure(ratePerMinute: number, capacity: number) {
+        this.refill();
+        this.ratePerMinute = ratePerMinute;
+        this.capacity = capacity;
+        this.tokens = Math.min(this.tokens, capacity);
+    }
+
+    /** Takes one token if available. */
+    tryTake(): boolean {
+        this.refill();
+        if (this.tokens >= 1) {
+            this.tokens -= 1;
+            return true;
+        }
+        return false;
+    }
+
+    /** Milliseconds until a token can be taken (0 if one is available now). */
+    msUntilAvailable(): number {
+        this.refill();
+        if (this.tokens >= 1) {
+            return 0;
+        }
+        if (this.ratePerMinute <= 0) {
+            return Infinity;
+        }
+        return Math.ceil((1 - this.tokens) * 60_000 / this.ratePerMinute);
+    }
+
+    get available(): number {
+        this.refill();
+        return Math.floor(this.tokens);
+    }
+
+    private refill() {
+        const now = this.now();
+        const elapsed = now - this.updatedAt;
+        this.updatedAt = now;
+        if (elapsed > 0 && this.ratePerMinute > 0) {
+            this.tokens = Math.min(this.capacity, this.tokens + elapsed * this.ratePerMinute / 60_000);
+        }
+    }
+}
+
+/**
+ * Exponential backoff delay for the given (zero-based) attempt.
+ * Half of the delay is fixed and half is random ("equal jitter"), so retries
+ * from many callers spread out without ever retrying immediately.
+ */
+export function backoffDelay(attempt: number, baseMs: number, maxMs: number, random: () => number = Math.random): number {
+    const cap = Math.min(maxMs, baseMs * Math.pow(2, attempt));
+    return Math.round(cap / 2 + random() * cap / 2);
+}
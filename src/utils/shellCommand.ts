@@ -25,6 +25,11 @@ export class CommandRun {
         readonly finishedTimestamp: number,
     ) {}
 
+    /** Restores a command run from its JSON form. */
+    static fromJSON(data: any): CommandRun {
+        return new CommandRun(data.command, data.exitCode, data.stdout, data.stderr, data.startedTimestamp, data.finishedTimestamp);
+    }
+
     toString(): string {
         let stdout = '';
         let stderr = '';
@@ -0,0 +1,39 @@
+/**
+ * Incremental parser for `text/event-stream` bodies (Server-Sent Events).
+ *
+ * Chunks can split lines, events and multi-byte characters at any point; `push`
+ * returns the `data` payloads of the events completed by the chunk.
+ */
+export class ServerSentEventParser {
+    private readonly decoder = new TextDecoder();
+    private buffer = '';
+    private data: string[] = [];
+
+    push(chunk: Uint8Array | string): string[] {
+        this.buffer += typeof chunk === 'string' ? chunk : this.decoder.decode(chunk, { stream: true });
+
+        const events: string[] = [];
+        let newline: number;
+        while ((newline = this.buffer.search(/\r\n|\r|\n/)) !== -1) {
+            const line = this.buffer.slice(0, newline);
+            const separatorLength = this.buffer.startsWith('\r\n', newline) ? 2 : 1;
+            // A trailing \r may be the first half of \r\n; wait for the next chunk.
+            if (this.buffer[newline] === '\r' && separatorLength === 1 && newline === this.buffer.length - 1) {
+                break;
+            }
+            this.buffer = this.buffer.slice(newline + separatorLength);
+
+            if (line === '') {
+                // Blank line: dispatch the event
+                if (this.data.length > 0) {
+                    events.push(this.data.join('\n'));
+                    this.data = [];
+                }
+            } else if (line.startsWith('data:')) {
+                this.data.push(line.slice(line.startsWith('data: ') ? 6 : 5));
+            }
+            // Comments (":") and other fields (event, id, retry) are not used.
+        }
+        return events;
+    }
+}
@@ -1,7 +1,7 @@
 import { PostHog } from "posthog-node";
 import { uuidv7 } from "uuidv7";
 import * as vscode from 'vscode';
-import { HookKind } from './hooks';
+import { HookRunKind } from './hooks';
 import { MessageFromRenderer } from '../renderer/interface';
 import { Tasks, TaskStatus, ALL_TASK_STATUSES } from '../tasks/manager';
 import { CommandRun } from "./shellCommand";
@@ -203,7 +203,7 @@ export function notebookPyodideLoadingFailed(duration: number) {
  *
  * @param hook The hook type that is being executed (onstart, onpause, onresume, oncomplete)
  */
-export function hooksPyStart(hook: HookKind) {
+export function hooksPyStart(hook: HookRunKind) {
     TelemetryCollector.capture(`hooks:${hook}_py_start`, 1, {});
 }
 
@@ -213,7 +213,7 @@ export function hooksPyStart(hook: HookKind) {
  * @param hook The hook type that threw the exception (onstart, onpause, onresume, oncomplete)
  * @param duration The duration in milliseconds from hook start until the exception occurred
  */
-export function hooksPyException(hook: HookKind, duration: number) {
+export function hooksPyException(hook: HookRunKind, duration: number) {
     TelemetryCollector.capture(`hooks:${hook}_py_exception`, 1, {
         duration
     });
@@ -225,7 +225,7 @@ export function hooksPyException(hook: HookKind, duration: number) {
  * @param hook The hook type that completed successfully (onstart, onpause, onresume, oncomplete)
  * @param duration The duration in milliseconds from hook start until completion
  */
-export function hooksPySuccess(hook: HookKind, duration: number) {
+export function hooksPySuccess(hook: HookRunKind, duration: number) {
     TelemetryCollector.capture(`hooks:${hook}_py_success`, 1, {
         duration
     });
@@ -237,7 +237,7 @@ export function hooksPySuccess(hook: HookKind, duration: number) {
  * @param hook The hook type where the command is executed (onstart, onpause, onresume, oncomplete)
  * @param command The command being executed
  */
-export function hooksCmdStart(hook: HookKind, command: string) {
+export function hooksCmdStart(hook: HookRunKind, command: string) {
     // Count the number of commands (split by newline, semicolon)
     const num_commands = command.split(/(?:(?<!\\)\n)|;|&&|\|\|/).filter(cmd => cmd.trim().length > 0).length;
     
@@ -263,7 +263,7 @@ export function hooksCmdStart(hook: HookKind, command: string) {
  * @param stdout The command's stdout output
  * @param stderr The command's stderr output
  */
-export function hooksCmdResult(hook: HookKind, commandRun: CommandRun) {
+export function hooksCmdResult(hook: HookRunKind, commandRun: CommandRun) {
     const eventType = commandRun.exitCode === 0 ? 'success' : 'failure';
     
     TelemetryCollector.capture(`hooks:${hook}_cmd_${eventType}`, 1, {
@@ -349,23 +349,12 @@ export function tasksUnarchive(status: TaskStatus) {
  * @param tasks The Tasks instance containing all tasks
  */
 export function tasksTaskStatusesAfterLastChange(tasks: Tasks) {
-    // Count tasks in each status
+    // Tasks keeps the counts up to date, so this does not walk all tasks
     const counts: Record<string, number> = {};
-    
-    // Initialize all counters to 0
+    const statusCounts = tasks.statusCounts();
     for (const status of ALL_TASK_STATUSES) {
-        counts[`${status}_cnt`] = 0;
-        counts[`arch_${status}_cnt`] = 0;
-    }
-    
-    // Count tasks by status and archived state
-    for (const task of tasks) {
-        const status: TaskStatus = task.status;
-        if (task.archived) {
-            counts[`arch_${status}_cnt`]++;
-        } else {
-            counts[`${status}_cnt`]++;
-        }
+        counts[`${status}_cnt`] = statusCounts[status].total - statusCounts[status].archived;
+        counts[`arch_${status}_cnt`] = statusCounts[status].archived;
     }
     
     TelemetryCollector.capture('tasks:task_statuses_after_last_change', 1, counts);